@@ -0,0 +1,154 @@
+import os
+import sys
+import numpy as np
+from numpy.typing import NDArray
+from itertools import permutations
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from benchmark import Benchmark
+from matrix_based_builder import MatrixBasedLayoutBuilder
+
+n = 4 * 8  # 26
+costs = np.random.rand(n, n)
+freqs = np.random.rand(n, n)
+block_size = 4096
+
+n_fixed: int
+n_opened: int
+
+chars_f: list[int]
+chars_o: list[int]
+all_chars_raw: NDArray = np.array([])
+all_chars_new: NDArray = np.array([])
+
+costs_reduced: NDArray = np.array([])
+score_ff: float
+score_fo_of: NDArray = np.array([])
+costs_oo: NDArray = np.array([])
+freqs_oo: NDArray = np.array([])
+range_opened: NDArray = np.array([])
+
+builder: MatrixBasedLayoutBuilder
+
+
+def setup(n_fixed_: int, n_opened_: int):
+	global n_fixed, n_opened
+	global chars_f, chars_o, all_chars_raw, all_chars_new
+	global costs_reduced, score_ff, score_fo_of, costs_oo, freqs_oo, range_opened
+	global builder
+	n_fixed = n_fixed_
+	n_opened = n_opened_
+	keys_f = list(range(n_fixed))
+	chars_f = list(range(n_fixed))
+	keys_o = list(n_fixed + i for i in range(n_opened))
+	chars_o = list(n_fixed + i for i in range(n_opened))
+	all_chars_new = np.array(list(permutations(range(n_opened))))
+	all_chars_raw = np.array(chars_o)[all_chars_new]
+	# For the full gather
+	keys_r = keys_f + keys_o
+	costs_reduced = costs[keys_r, :][:, keys_r]
+	# For the fixed/open split
+	score_ff = np.sum(costs[keys_f, :][:, keys_f] * freqs[chars_f, :][:, chars_f])
+	costs_fo = costs[keys_f, :][:, keys_o]
+	freqs_fo = freqs[chars_f, :][:, chars_o]
+	costs_of = costs[keys_o, :][:, keys_f]
+	freqs_of = freqs[chars_o, :][:, chars_f]
+	score_fo_of = costs_fo.T @ freqs_fo + costs_of @ freqs_of.T
+	score_fo_of += np.outer(np.diag(costs)[keys_o], np.diag(freqs)[chars_o])
+	costs_oo = costs[keys_o, :][:, keys_o].copy()
+	freqs_oo = freqs[chars_o, :][:, chars_o].copy()
+	np.fill_diagonal(costs_oo, 0)
+	np.fill_diagonal(freqs_oo, 0)
+	range_opened = np.arange(n_opened)
+	# For the builder itself (the split is computed by its first batched call)
+	builder = MatrixBasedLayoutBuilder()
+	builder.add_interkey_costs(costs, freqs)
+	builder.fix(keys_f, chars_f)
+	builder.open(keys_o, chars_o)
+
+
+# Scoring all permutations of opened characters
+
+
+def score_direct_all():
+	"""`score()` for each permutation"""
+	for chars in permutations(chars_o):
+		chars = chars_f + list(chars)
+		np.sum(costs_reduced * freqs[chars, :][:, chars])
+
+
+def score_gather_blocks(chars_raw: NDArray = None):
+	"""Full gather, by blocks"""
+	chars_raw = all_chars_raw if chars_raw is None else chars_raw
+	fixed = np.array(chars_f, dtype=np.intp)
+	scores = np.empty(chars_raw.shape[0])
+	for start in range(0, chars_raw.shape[0], block_size):
+		block = chars_raw[start : start + block_size]
+		chars = np.concatenate(
+			(np.broadcast_to(fixed, (block.shape[0], fixed.size)), block), axis=1
+		)
+		gathered = freqs[chars[:, :, np.newaxis], chars[:, np.newaxis, :]]
+		scores[start : start + block_size] = np.einsum(
+			"pij,ij->p", gathered, costs_reduced
+		)
+	return scores
+
+
+def score_split_blocks(chars_new: NDArray = None):
+	"""Fixed/open split, by blocks"""
+	chars_new = all_chars_new if chars_new is None else chars_new
+	scores = np.empty(chars_new.shape[0])
+	for start in range(0, chars_new.shape[0], block_size):
+		block = chars_new[start : start + block_size]
+		gathered = freqs_oo[block[:, :, np.newaxis], block[:, np.newaxis, :]]
+		scores[start : start + block_size] = (
+			score_ff
+			+ np.sum(score_fo_of[range_opened, block], axis=1)
+			+ np.einsum("pij,ij->p", gathered, costs_oo)
+		)
+	return scores
+
+
+# Scoring all permutations of opened characters, with the builder
+
+
+def builder_score_all():
+	"""`MatrixBasedLayoutBuilder.score()` for each permutation"""
+	for chars in all_chars_raw:
+		builder.score(chars)
+
+
+def builder_score_many():
+	"""`MatrixBasedLayoutBuilder.score_many()`"""
+	return builder.score_many(all_chars_raw, block_size=block_size)
+
+
+def assert_valid_scores():
+	expected = score_gather_blocks()
+	assert np.allclose(score_split_blocks(), expected)
+	assert np.allclose(builder_score_many(), expected)
+	assert np.isclose(builder.score(all_chars_raw[-1]), expected[-1])
+
+
+if __name__ == "__main__":
+	for k in [0, 8, 16]:
+		setup(k, 5)
+		assert_valid_scores()
+
+	cases = dict((f"f {k}, o 8", eval(f"lambda: setup({k},8)")) for k in [0, 8, 16, 24])
+
+	bm = Benchmark(sets_per_test=1, runs_per_set=1)
+	bm.set_cases(cases)
+	bm.set_functions(
+		[
+			score_direct_all,
+			score_gather_blocks,
+			score_split_blocks,
+			builder_score_all,
+			builder_score_many,
+		]
+	)
+	print()
+	bm.report()
+	print()
+	bm.report_html(normalize_with=0, use_doc_as_name=True)
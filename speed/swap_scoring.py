@@ -0,0 +1,91 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from benchmark import Benchmark
+from matrix_based_builder import MatrixBasedLayoutBuilder
+from swap_scorer import SwapScorer
+
+n = 24
+n_opened = 8
+opened = list(range(n - n_opened, n))
+
+builder: MatrixBasedLayoutBuilder
+scorer: SwapScorer
+
+
+def setup(m: int):
+	"""Builder with key costs and `m` interkey costs matrices, 8 keys opened among 24"""
+	global builder, scorer
+	rng = np.random.default_rng(0)
+	builder = MatrixBasedLayoutBuilder()
+	builder.add_key_costs(rng.random(n), rng.random(n))
+	for _ in range(m):
+		builder.add_interkey_costs(rng.random((n, n)), rng.random((n, n)))
+	builder.fix(range(n - n_opened), range(n - n_opened))
+	builder.open(opened, opened)
+	scorer = builder.swap_scorer(opened)
+
+
+# Scoring one layout
+
+
+def score():
+	"""`score()`"""
+	builder.score(opened)
+
+
+def swap_delta():
+	"""`SwapScorer.delta()`"""
+	scorer.delta(n - 3, n - 1)
+
+
+def swap():
+	"""`SwapScorer.swap()`"""
+	scorer.swap(n - 3, n - 1)
+
+
+# Finding the best permutation of opened characters
+
+
+def best_heap():
+	"""Heap sweep"""
+	builder.best_opened_permutation(method="heap")
+
+
+def best_blocks():
+	"""Blocks sweep"""
+	builder.best_opened_permutation()
+
+
+def assert_valid_deltas():
+	before = scorer.full_score()
+	delta = scorer.delta(n - 3, n - 1)
+	scorer.swap(n - 3, n - 1)
+	assert np.isclose(delta, scorer.full_score() - before)
+	heap_order = builder.best_opened_permutation(method="heap")[1]
+	assert heap_order == builder.best_opened_permutation()[1]
+
+
+if __name__ == "__main__":
+	cases = dict((f"m = {m}", eval(f"lambda: setup({m})")) for m in [1, 2, 4])
+	for setup_case in cases.values():
+		setup_case()
+		assert_valid_deltas()
+
+	bm = Benchmark(sets_per_test=20, runs_per_set=1000)
+	bm.set_cases(cases)
+	bm.set_functions([score, swap_delta, swap])
+	print()
+	bm.report()
+	print()
+	bm.report_html(normalize_with=0, use_doc_as_name=True)
+
+	bm = Benchmark(sets_per_test=1, runs_per_set=1)
+	bm.set_cases(cases)
+	bm.set_functions([best_heap, best_blocks])
+	print()
+	bm.report()
+	print()
+	bm.report_html(normalize_with=0, use_doc_as_name=True)
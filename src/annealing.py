@@ -0,0 +1,119 @@
+from typing import Literal
+from time import perf_counter
+from local_types import NpVector
+from swap_scorer import SwapScorer
+import numpy as np
+
+
+class SimulatedAnnealing:
+	"""
+	Simulated annealing over a layout, by random swaps of characters between positions.\n
+	Each step draws a random swap, whose score variation is given by a `SwapScorer` in O(*n*).
+	An improving swap is always applied; a worsening one is applied with probability
+	exp(*delta* / *T*), the temperature *T* decreasing from `initial_temperature`
+	to `final_temperature` as the run progresses (in steps, or in time with a time budget).
+	The best layout met is kept.
+	Random draws come from a generator seeded with `seed`, so that runs without a time budget
+	are reproducible. With a time budget, the temperature follows the elapsed time,
+	so that any run depends on timings, even one completing all its steps.
+	"""
+
+	steps: int
+	"""Number of steps of the last run."""
+	best_score: float
+	best_chars: NpVector
+	__scorer: SwapScorer
+	__positions: NpVector
+	__rng: np.random.Generator
+
+	def __init__(
+		self,
+		scorer: SwapScorer,
+		positions: list[int] | None = None,
+		seed: int | None = None,
+	) -> None:
+		"""
+		Prepare an annealing from the current layout of `scorer`,
+		only swapping the characters among `positions` (default: all).
+		"""
+		self.__scorer = scorer
+		if positions is None:
+			positions = range(scorer.chars.size)
+		self.__positions = np.array(positions, dtype=np.intp)
+		self.__rng = np.random.default_rng(seed)
+		self.steps = 0
+		self.best_score = scorer.score
+		self.best_chars = scorer.chars.copy()
+
+	def run(
+		self,
+		max_steps: int = 100_000,
+		time_budget: float | None = None,
+		initial_temperature: float | None = None,
+		final_temperature: float | None = None,
+		schedule: Literal["geometric", "linear"] = "geometric",
+		batch_size: int = 1024,
+	) -> float:
+		"""
+		Run the annealing for `max_steps` steps, or until `time_budget` seconds have elapsed,
+		and return the best score met. The scorer is then left on the best layout met.
+		- `initial_temperature`: By default, the standard deviation of the variations
+		  of `batch_size` random swaps.
+		- `final_temperature`: By default, a thousandth of the initial temperature.
+		- `schedule`: The temperature decreases geometrically (default) or linearly
+		  with the progress of the run: the fraction of `max_steps` done or, with a `time_budget`,
+		  the fraction of the steps or of the budget elapsed, whichever is larger.
+		- `batch_size`: Random draws are made, and time is checked, by batches of that many steps.
+		"""
+		if schedule not in ("geometric", "linear"):
+			raise ValueError(f"Unknown schedule “{schedule}”.")
+		scorer = self.__scorer
+		start = perf_counter()
+		if initial_temperature is None:
+			initial_temperature = self.__typical_delta(batch_size)
+		if final_temperature is None:
+			final_temperature = initial_temperature / 1000
+		self.steps = 0
+		while self.steps < max_steps:
+			elapsed = perf_counter() - start
+			if time_budget is not None and elapsed >= time_budget:
+				break
+			progress = self.steps / max_steps
+			if time_budget is not None:
+				progress = max(progress, elapsed / time_budget)
+			if schedule == "geometric":
+				temperature = (
+					initial_temperature
+					* (final_temperature / initial_temperature) ** progress
+				)
+			else:
+				temperature = initial_temperature + progress * (
+					final_temperature - initial_temperature
+				)
+			n_steps = min(batch_size, max_steps - self.steps)
+			pairs = self.__positions[
+				self.__rng.integers(0, self.__positions.size, (n_steps, 2))
+			]
+			thresholds = temperature * np.log(self.__rng.random(n_steps))
+			for (a, b), threshold in zip(pairs.tolist(), thresholds.tolist()):
+				delta = scorer.delta(a, b)
+				# Accepted with probability exp(delta / T) ⇔ delta ≥ T ln(u)
+				if delta >= threshold:
+					scorer.swap(a, b, delta)
+					if scorer.score > self.best_score:
+						self.best_score = scorer.score
+						self.best_chars[:] = scorer.chars
+			self.steps += n_steps
+		# Back to the best layout, rescored from scratch as updates accumulate rounding errors
+		scorer.set_chars(self.best_chars)
+		self.best_score = scorer.score
+		return self.best_score
+
+	def __typical_delta(self, n_samples: int) -> float:
+		if self.__positions.size < 2:
+			return 1.0
+		pairs = self.__positions[
+			self.__rng.integers(0, self.__positions.size, (n_samples, 2))
+		]
+		deltas = [self.__scorer.delta(a, b) for a, b in pairs.tolist()]
+		return float(np.std(deltas)) or 1.0
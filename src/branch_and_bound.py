@@ -0,0 +1,119 @@
+from local_types import NpVector, NpArray, NpArray2D
+from fixed_open_split import FixedOpenSplit
+import numpy as np
+
+
+class BranchAndBound:
+	"""
+	Exact search of the best assignment of opened characters to opened keys,
+	by branch-and-bound.\n
+	The opened keys are assigned one at a time.
+	For each partial assignment, an upper bound of the score of any completion is computed
+	(in the spirit of the Gilmore–Lawler bound):
+	- The score of assigned keys is exactly known, and so is the interaction of each
+	  unassigned key *k* with them if it receives character *c*.
+	  Those form a linear cost *l(k, c)*.
+	- The interactions between unassigned keys are bounded, for each *(k, c)*, by pairing
+	  the sorted costs of *k* with the sorted frequencies of *c* (rearrangement inequality).
+	- The bound is then the partial score plus the smallest of the sums of the
+	  row-wise or column-wise maxima of those *(k, c)* bounds (a relaxation of the linear
+	  assignment problem they define).
+	Subtrees whose bound cannot beat the best score found so far are pruned.
+	"""
+
+	nodes: int
+	"""Number of explored nodes during the last `.solve()`."""
+	__opened_chars: NpVector
+	__constant: float
+	__linear: NpArray2D
+	__open_costs: NpArray
+	__open_freqs: NpArray
+	__sorted_costs: list[NpArray]
+	__best_score: float
+	__best_assignment: list[int] | None
+
+	def __init__(self, split: FixedOpenSplit, opened_chars: list[int]) -> None:
+		"""
+		Prepare the search of the best assignment of `opened_chars` to the opened keys,
+		given the `split` score of such assignments (see `split_fixed_opened(…)`).
+		"""
+		self.__opened_chars = np.array(opened_chars, dtype=np.intp)
+		self.__constant = split.constant
+		self.__linear = split.linear
+		self.__open_costs = split.open_costs
+		self.__open_freqs = split.open_freqs
+		# Sorted off-diagonal costs of the unassigned keys, for each depth
+		self.__sorted_costs = [
+			self.__sorted_off_diagonal(self.__open_costs[:, d:, d:])
+			for d in range(len(opened_chars))
+		]
+
+	def solve(self) -> tuple[float, tuple[int, ...]]:
+		"""
+		Find the best assignment of opened characters.
+		Returns its score and the characters assigned to the opened keys, in order.
+		"""
+		self.nodes = 0
+		self.__best_score = -np.inf
+		self.__best_assignment = None
+		n_opened = self.__opened_chars.size
+		self.__explore(self.__constant, self.__linear, list(range(n_opened)), [])
+		chars = tuple(int(self.__opened_chars[i]) for i in self.__best_assignment)
+		return self.__best_score, chars
+
+	def __explore(
+		self,
+		partial: float,
+		linear: NpArray2D,
+		chars_left: list[int],
+		assignment: list[int],
+	) -> None:
+		self.nodes += 1
+		depth = len(assignment)
+		if not chars_left:
+			if partial > self.__best_score:
+				self.__best_score = partial
+				self.__best_assignment = assignment
+			return
+		bounds = linear[depth:, chars_left] + self.__completion_bounds(
+			depth, chars_left
+		)
+		bound = min(np.sum(np.max(bounds, axis=1)), np.sum(np.max(bounds, axis=0)))
+		if partial + bound <= self.__best_score:
+			return
+		# Most promising characters first, to quickly raise the best score
+		for i in np.argsort(-bounds[0], kind="stable"):
+			char = chars_left[i]
+			self.__explore(
+				partial + linear[depth, char],
+				self.__assign(linear, depth, char),
+				chars_left[:i] + chars_left[i + 1 :],
+				assignment + [char],
+			)
+
+	def __assign(self, linear: NpArray2D, depth: int, char: int) -> NpArray2D:
+		open_costs = self.__open_costs
+		open_freqs = self.__open_freqs
+		linear = linear + np.einsum(
+			"mk,mc->kc", open_costs[:, :, depth], open_freqs[:, :, char]
+		)
+		linear += np.einsum(
+			"mk,mc->kc", open_costs[:, depth, :], open_freqs[:, char, :]
+		)
+		return linear
+
+	def __completion_bounds(
+		self, depth: int, chars_left: list[int]
+	) -> NpArray2D | float:
+		if len(chars_left) < 2:
+			return 0.0
+		sorted_freqs = self.__sorted_off_diagonal(
+			self.__open_freqs[:, chars_left, :][:, :, chars_left]
+		)
+		return np.einsum("mkx,mcx->kc", self.__sorted_costs[depth], sorted_freqs)
+
+	@staticmethod
+	def __sorted_off_diagonal(matrices: NpArray) -> NpArray:
+		m, n, _ = matrices.shape
+		off_diagonal = matrices[:, ~np.eye(n, dtype=bool)].reshape(m, n, n - 1)
+		return np.sort(off_diagonal, axis=2)
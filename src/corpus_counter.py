@@ -0,0 +1,159 @@
+from typing import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from local_types import NpVector, NpArray, NpArray2D
+import numpy as np
+import os
+
+
+class CorpusCounter:
+	"""
+	Count the characters, character pairs (bigrams) and skip-grams of texts,
+	as frequency arrays ready to be added to a builder (e.g. `.add_key_costs(…)`).\n
+	Texts are encoded as arrays of code points, translated to character indices
+	through a lookup table, and counted with `np.bincount`, chunk by chunk,
+	so that counting does not involve a Python loop over characters.
+	Pairs involving a character that is not translated are not counted.
+	"""
+
+	chars: dict[str, int]
+	"""Index of each counted character (several characters may share an index)."""
+	gaps: tuple[int, ...]
+	"""Numbers of characters between the characters of each counted skip-gram."""
+	unigrams: NpVector
+	"""Count of each character (*c*)."""
+	bigrams: NpArray2D
+	"""Count of each pair of successive characters (*c* × *c*)."""
+	skipgrams: NpArray
+	"""Count of each pair of characters separated by each of the `gaps` (*g* × *c* × *c*)."""
+	__table: NpVector
+	"""Character index of each code point, *c* for those not counted (and beyond the table)."""
+	__tail: NpVector
+	"""Last character indices of the current text, to count pairs across chunks."""
+
+	def __init__(self, chars: str | dict[str, int], gaps: Iterable[int] = (1,)) -> None:
+		"""
+		Prepare to count the characters of `chars`, either a string (each character being
+		indexed by its position) or a translation table `{character: index}`,
+		and the skip-grams with each of the given `gaps`.
+		"""
+		if isinstance(chars, str):
+			chars = {char: i for i, char in enumerate(chars)}
+		self.chars = dict(chars)
+		self.gaps = tuple(gaps)
+		if any(gap < 1 for gap in self.gaps):
+			raise ValueError("Expected skip-gram gaps of at least one character.")
+		n_chars = max(self.chars.values(), default=-1) + 1
+		self.__table = np.full(
+			max(map(ord, self.chars), default=-1) + 2, n_chars, dtype=np.intp
+		)
+		for char, index in self.chars.items():
+			self.__table[ord(char)] = index
+		self.unigrams = np.zeros(n_chars, dtype=np.int64)
+		self.bigrams = np.zeros((n_chars, n_chars), dtype=np.int64)
+		self.skipgrams = np.zeros((len(self.gaps), n_chars, n_chars), dtype=np.int64)
+		self.__tail = np.zeros(0, dtype=np.intp)
+
+	def count(self, text: str) -> None:
+		"""
+		Count the n-grams of `text`, as following the text counted last
+		(if any, since `.end_text()`), so that a text can be counted chunk by chunk.
+		"""
+		codes = np.frombuffer(text.encode("utf-32-le"), dtype="<u4")
+		indices = self.__table[np.minimum(codes, self.__table.size - 1)]
+		n_chars = self.unigrams.size
+		sequence = np.concatenate((self.__tail, indices))
+		start = self.__tail.size
+		bigrams = self.__count_pairs(sequence, start, 1)
+		self.bigrams += bigrams[:n_chars, :n_chars]
+		# Each new character is the second one of a bigram, but the first one of the text
+		self.unigrams += bigrams.sum(axis=0)[:n_chars]
+		if start == 0 and sequence.size > 0 and sequence[0] < n_chars:
+			self.unigrams[sequence[0]] += 1
+		for i, gap in enumerate(self.gaps):
+			self.skipgrams[i] += self.__count_pairs(sequence, start, gap + 1)[
+				:n_chars, :n_chars
+			]
+		self.__tail = sequence[-(max(self.gaps, default=0) + 1) :]
+
+	def end_text(self) -> None:
+		"""
+		End the current text: pairs are not counted across texts.
+		"""
+		self.__tail = np.zeros(0, dtype=np.intp)
+
+	def count_file(
+		self, path: str, encoding: str = "utf-8", chunk_size: int = 1 << 16
+	) -> None:
+		"""
+		Count the n-grams of the text file at `path`, read by chunks of `chunk_size` characters
+		(by default, small enough for the intermediate arrays to stay in cache).
+		"""
+		with open(path, encoding=encoding) as file:
+			while chunk := file.read(chunk_size):
+				self.count(chunk)
+		self.end_text()
+
+	def count_files(
+		self, paths: Iterable[str], workers: int | None = 1, **options
+	) -> None:
+		"""
+		Count the n-grams of the text files at `paths` (see `.count_file(…)` for `options`).\n
+		If `workers` is more than 1 (or `None`, to use all processors),
+		files are counted in parallel by a pool of processes.
+		"""
+		paths = list(paths)
+		if workers is None:
+			workers = os.cpu_count() or 1
+		if workers <= 1 or not paths:
+			for path in paths:
+				self.count_file(path, **options)
+			return
+		with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+			for unigrams, bigrams, skipgrams in executor.map(
+				_count_file,
+				repeat(self.chars),
+				repeat(self.gaps),
+				paths,
+				repeat(options),
+			):
+				self.unigrams += unigrams
+				self.bigrams += bigrams
+				self.skipgrams += skipgrams
+
+	def char_frequencies(self) -> NpVector:
+		"""
+		Relative frequency of each character.
+		"""
+		return _normalized(self.unigrams)
+
+	def pair_frequencies(self, gap: int = 0) -> NpArray2D:
+		"""
+		Relative frequency of each pair of characters separated by `gap` characters:
+		successive characters by default, otherwise one of the skip-gram `gaps`.
+		"""
+		if gap == 0:
+			return _normalized(self.bigrams)
+		return _normalized(self.skipgrams[self.gaps.index(gap)])
+
+	def __count_pairs(self, sequence: NpVector, start: int, distance: int) -> NpArray2D:
+		# Pairs (sequence[i], sequence[i + distance]) whose second character is new,
+		# including the characters not counted (to be dropped, rather than masked)
+		size = self.unigrams.size + 1
+		firsts = sequence[max(start - distance, 0) : max(sequence.size - distance, 0)]
+		seconds = sequence[max(start, distance) :]
+		counts = np.bincount(firsts * size + seconds, minlength=size * size)
+		return counts.reshape(size, size)
+
+
+def _count_file(
+	chars: dict[str, int], gaps: tuple[int, ...], path: str, options: dict
+) -> tuple[NpVector, NpArray2D, NpArray]:
+	counter = CorpusCounter(chars, gaps)
+	counter.count_file(path, **options)
+	return counter.unigrams, counter.bigrams, counter.skipgrams
+
+
+def _normalized(counts: NpArray) -> NpArray:
+	total = counts.sum()
+	return counts / total if total > 0 else counts.astype(float)
@@ -0,0 +1,250 @@
+from typing import Iterable, NamedTuple
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from matrix_based_builder import MatrixBasedLayoutBuilder
+from sweep_progress import SweepProgress
+import json
+import os
+import time
+
+# Version of the checkpoint files written by `EngramPipeline.run_seed(…)`
+_CHECKPOINT_FORMAT = 1
+
+
+class SeedResult(NamedTuple):
+	seed: int
+	"""Index of the seed the layout was built from."""
+	layout: dict[int, int]
+	"""Final assignment, as `{key: char}`."""
+	score: float
+	timings: dict[str, float]
+	"""Duration of each stage, in seconds."""
+
+
+class EngramPipeline:
+	"""
+	Build layouts following the Engram flow (see `notes.md`):
+	1. Start from each seed, i.e. an initial assignment of a few keys.
+	2. Optimally fill successive sets of keys (e.g. the next 7, then the next 8 keys).
+	3. Try all permutations of the characters within groups of keys
+	   (e.g. the 8 top keys, then the 8 bottom keys, etc.).
+	4. Keep the best layout across seeds.
+	"""
+
+	builder: MatrixBasedLayoutBuilder
+	"""Builder holding the scoring data. It is forked for each seed, and never modified
+	(except for its search cache, if any, shared by the forks)."""
+	seeds: list[dict[int, int]]
+	fill_steps: list[tuple[Iterable[int] | int, Iterable[int] | None]]
+	swap_groups: list[list[int]]
+	search_options: dict
+	checkpoints: str | None
+	"""Directory of the checkpoint files, if any (see `.__init__(…)`)."""
+	checkpoint_interval: float
+	"""Minimal duration between two checkpoints of a seed within a stage, in seconds."""
+	results: list[SeedResult]
+	"""Results of the last run, for each seed."""
+
+	def __init__(
+		self,
+		builder: MatrixBasedLayoutBuilder,
+		seeds: Iterable[dict[int, int]],
+		fill_steps: Iterable[tuple[Iterable[int] | int, Iterable[int] | None]] = (
+			(7, None),
+			(8, None),
+		),
+		swap_groups: Iterable[Iterable[int]] = (),
+		checkpoints: str | None = None,
+		checkpoint_interval: float = 5.0,
+		**search_options,
+	) -> None:
+		"""
+		Define the pipeline.
+		- `builder`: Builder holding the scoring data. Its current assignment is ignored.
+		- `seeds`: Initial assignments, as `{key: char}`.
+		- `fill_steps`: Successive `(keys_to_fill, fill_with)` optimal fills,
+		  as defined by `LayoutBuilder.optimal_fill(…)`.
+		- `swap_groups`: Groups of keys, whose characters are optimally permuted in turn.
+		- `checkpoints`: Directory where the progress of each seed is saved, to be resumed
+		  by a later run (with the same pipeline definition) with identical results:
+		  after each stage and, at most every `checkpoint_interval` seconds, during the sweeps
+		  of permutations (see `SweepProgress`, sequential sweeps only).
+		  A checkpoint is written aside then renamed, so that it is never partial.
+		- `search_options`: Passed to `.best_opened_permutation(…)` for each step.
+		"""
+		self.builder = builder
+		self.seeds = [dict(seed) for seed in seeds]
+		self.fill_steps = [(keys, chars) for keys, chars in fill_steps]
+		self.swap_groups = [list(group) for group in swap_groups]
+		self.search_options = search_options
+		self.checkpoints = checkpoints
+		self.checkpoint_interval = checkpoint_interval
+		self.results = []
+
+	def run(self, workers: int | None = 1) -> SeedResult:
+		"""
+		Run the pipeline for each seed, and return the best result
+		(the one of the first seed, in case of ties).\n
+		If `workers` is more than 1 (or `None`, to use all processors),
+		seeds are handled in parallel by a pool of processes.
+		"""
+		if workers is None:
+			workers = os.cpu_count() or 1
+		indices = range(len(self.seeds))
+		if workers <= 1:
+			self.results = [self.run_seed(i) for i in indices]
+		else:
+			with ProcessPoolExecutor(max_workers=workers) as executor:
+				self.results = list(executor.map(_run_seed, repeat(self), indices))
+		best = None
+		for result in self.results:
+			if best is None or result.score > best.score:
+				best = result
+		return best
+
+	def run_seed(self, seed: int) -> SeedResult:
+		"""
+		Run the pipeline for the seed of index `seed`,
+		resuming it from its checkpoint, if any (see `.__init__(…)`).
+		"""
+		# The scoring data and any search cache are shared by the seeds (within a process)
+		builder = self.builder.fork()
+		builder.clear()
+		checkpoint = None
+		if self.checkpoints is not None:
+			checkpoint = _SeedCheckpoint(
+				os.path.join(self.checkpoints, f"seed_{seed}.json"),
+				self.seeds[seed],
+				self.checkpoint_interval,
+			)
+		layout = self.seeds[seed] if checkpoint is None else checkpoint.layout
+		builder.fix(layout.keys(), layout.values())
+		timings = {} if checkpoint is None else checkpoint.timings
+		n_fills = len(self.fill_steps)
+		start = 0 if checkpoint is None else checkpoint.stage
+		for stage in range(start, n_fills + len(self.swap_groups)):
+			options = self.search_options
+			if checkpoint is not None:
+				options = dict(options, progress=checkpoint.progress)
+			t = time.perf_counter()
+			if stage < n_fills:
+				keys, chars = self.fill_steps[stage]
+				builder.optimal_fill(keys, chars, **options)
+				timings[f"fill {stage + 1}"] = time.perf_counter() - t
+			else:
+				keys = self.swap_groups[stage - n_fills]
+				layout = builder.layout()
+				chars = [layout[k] for k in keys]
+				builder.optimal_fill(keys, chars, remap=True, **options)
+				timings[f"swap {stage - n_fills + 1}"] = time.perf_counter() - t
+			if checkpoint is not None:
+				checkpoint.next_stage(builder.layout(), timings)
+		return SeedResult(seed, builder.layout(), builder.score(), timings)
+
+	def stage_timings(self) -> dict[str, float]:
+		"""
+		Total duration of each stage over all seeds of the last run, in seconds.
+		"""
+		totals = {}
+		for result in self.results:
+			for stage, duration in result.timings.items():
+				totals[stage] = totals.get(stage, 0.0) + duration
+		return totals
+
+
+class _SeedCheckpoint:
+	"""
+	Checkpoint file of a seed: the stage reached, with the layout and timings
+	at its start, and the progress of its current sweep.
+	"""
+
+	__slots__ = (
+		"path",
+		"seed",
+		"interval",
+		"stage",
+		"layout",
+		"timings",
+		"progress",
+		"__written",
+	)
+
+	path: str
+	seed: dict[int, int]
+	interval: float
+	stage: int
+	layout: dict[int, int]
+	timings: dict[str, float]
+	progress: SweepProgress
+	"""Progress of the sweep of the current stage, written when it reports a block."""
+	__written: float
+	"""Time of the last write, to write at most every `interval` seconds within a stage."""
+
+	def __init__(self, path: str, seed: dict[int, int], interval: float) -> None:
+		"""
+		Load the checkpoint at `path`, if any, or start from the `seed` assignment.
+		"""
+		self.path = path
+		self.seed = seed
+		self.interval = interval
+		self.stage = 0
+		self.layout = dict(seed)
+		self.timings = {}
+		sweep = {}
+		if os.path.exists(path):
+			with open(path) as file:
+				state = json.load(file)
+			if state["format"] != _CHECKPOINT_FORMAT:
+				raise ValueError(f"Unknown checkpoint format “{state['format']}”.")
+			if dict(map(tuple, state["seed"])) != seed:
+				raise ValueError(f"Checkpoint of another seed at “{path}”.")
+			self.stage = state["stage"]
+			self.layout = dict(map(tuple, state["layout"]))
+			self.timings = state["timings"]
+			sweep = state["sweep"]
+		self.progress = SweepProgress(**sweep, on_block=self.__on_block)
+		self.__written = time.monotonic()
+
+	def next_stage(self, layout: dict[int, int], timings: dict[str, float]) -> None:
+		"""
+		Record the end of the current stage, with the resulting `layout` and `timings`.
+		"""
+		self.stage += 1
+		self.layout = dict(layout)
+		self.timings = dict(timings)
+		self.progress = SweepProgress(on_block=self.__on_block)
+		self.write()
+
+	def write(self) -> None:
+		"""
+		Write the checkpoint, aside then renamed, so that it is never partial
+		(the temporary file being removed if the write fails).
+		"""
+		# Python numbers, as seeds and layouts may hold numpy integers
+		state = {
+			"format": _CHECKPOINT_FORMAT,
+			"seed": [[int(k), int(c)] for k, c in self.seed.items()],
+			"stage": self.stage,
+			"layout": [[int(k), int(c)] for k, c in self.layout.items()],
+			"timings": {stage: float(t) for stage, t in self.timings.items()},
+			"sweep": self.progress.state(),
+		}
+		os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+		temporary_path = f"{self.path}.{os.getpid()}.tmp"
+		try:
+			with open(temporary_path, "w") as file:
+				json.dump(state, file)
+			os.replace(temporary_path, self.path)
+		except BaseException:
+			if os.path.exists(temporary_path):
+				os.remove(temporary_path)
+			raise
+		self.__written = time.monotonic()
+
+	def __on_block(self, progress: SweepProgress) -> None:
+		if time.monotonic() - self.__written >= self.interval:
+			self.write()
+
+
+def _run_seed(pipeline: EngramPipeline, seed: int) -> SeedResult:
+	return pipeline.run_seed(seed)
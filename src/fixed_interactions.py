@@ -0,0 +1,104 @@
+from typing import Self
+from local_types import NpArray, NpArray2D
+import numpy as np
+import copy
+
+
+class FixedInteractions:
+	"""
+	Interkey scores involving the fixed assignment, kept up to date incrementally
+	as keys are fixed, unfixed, or given other characters:
+	- `constant`: Score of the fixed keys among themselves.
+	- `cross`: For any unfixed key *k* and character *c*, score of the interactions of *k*
+	  with the fixed keys, if *k* were given *c*.\n
+	Fixing (or unfixing) a key only adds (or subtracts) its rows and columns,
+	in O(*m* × *n* × *c*) operations, whatever the number of fixed keys.
+	"""
+
+	constant: float
+	cross: NpArray2D
+	fixed: dict[int, int]
+	"""Fixed assignment accounted for, as `{key: char}`."""
+	__costs: NpArray
+	__freqs: NpArray
+
+	def __init__(self, costs_2d: NpArray, freqs_2d: NpArray) -> None:
+		"""
+		Prepare the interactions for the stacked interkey costs `costs_2d` (*m* × *n* × *n*)
+		and pair frequencies `freqs_2d` (*m* × *c* × *c*), with no fixed key.
+		"""
+		self.__costs = costs_2d
+		self.__freqs = freqs_2d
+		self.constant = 0.0
+		self.cross = np.zeros((costs_2d.shape[1], freqs_2d.shape[1]))
+		self.fixed = {}
+
+	def update(self, fixed: dict[int, int]) -> None:
+		"""
+		Account for the `fixed` assignment instead of the current one, by only
+		removing and adding the keys that differ (or from scratch, if that is cheaper).
+		"""
+		removed = [k for k, c in self.fixed.items() if fixed.get(k) != c]
+		added = [k for k, c in fixed.items() if self.fixed.get(k) != c]
+		if len(removed) + len(added) > len(fixed):
+			self.__rebuild(fixed)
+			return
+		for k in removed:
+			self.remove(k)
+		for k in added:
+			self.add(k, fixed[k])
+
+	def add(self, key: int, char: int) -> None:
+		"""
+		Fix the character `char` to the (unfixed) key `key`.
+		"""
+		costs = self.__costs
+		freqs = self.__freqs
+		self.constant += float(self.cross[key, char])
+		self.constant += float(costs[:, key, key] @ freqs[:, char, char])
+		self.cross = self.cross + self.__outer(key, char)
+		self.fixed[key] = char
+
+	def remove(self, key: int) -> None:
+		"""
+		Unfix the (fixed) key `key`.
+		"""
+		costs = self.__costs
+		freqs = self.__freqs
+		char = self.fixed.pop(key)
+		self.cross = self.cross - self.__outer(key, char)
+		self.constant -= float(self.cross[key, char])
+		self.constant -= float(costs[:, key, key] @ freqs[:, char, char])
+
+	def fork(self) -> Self:
+		"""
+		Provide a copy, to be updated independently.
+		The stacked data is shared, and `cross` is never modified in place.
+		"""
+		forked = copy.copy(self)
+		forked.fixed = dict(self.fixed)
+		return forked
+
+	def __outer(self, key: int, char: int) -> NpArray2D:
+		costs = self.__costs
+		freqs = self.__freqs
+		return np.einsum("mk,mc->kc", costs[:, :, key], freqs[:, :, char]) + np.einsum(
+			"mk,mc->kc", costs[:, key, :], freqs[:, char, :]
+		)
+
+	def __rebuild(self, fixed: dict[int, int]) -> None:
+		keys = np.array(list(fixed.keys()), dtype=np.intp)
+		chars = np.array(list(fixed.values()), dtype=np.intp)
+		costs = self.__costs
+		freqs = self.__freqs
+		self.constant = float(
+			np.einsum(
+				"mij,mij->",
+				costs[:, keys, :][:, :, keys],
+				freqs[:, chars, :][:, :, chars],
+			)
+		)
+		self.cross = np.einsum(
+			"mkf,mcf->kc", costs[:, :, keys], freqs[:, :, chars]
+		) + np.einsum("mfk,mfc->kc", costs[:, keys, :], freqs[:, chars, :])
+		self.fixed = dict(fixed)
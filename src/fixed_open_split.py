@@ -0,0 +1,69 @@
+from typing import NamedTuple
+from local_types import NpArray, NpArray2D
+from scoring_stacks import ScoringStacks
+import numpy as np
+
+
+class FixedOpenSplit(NamedTuple):
+	"""
+	Score of layouts made of fixed keys and permuted opened keys, split as
+	(see “Splitting constant and variable during partial optimization” in `notes.md`):\n
+	`constant + Σ_k linear[k, p_k] + Σ_m Σ_{k≠h} open_costs[m, k, h] · open_freqs[m, p_k, p_h]`\n
+	where *p_k* is the index (within the opened characters) of the character assigned to the
+	*k*-th opened key.
+	"""
+
+	constant: float
+	"""Score of the fixed keys alone."""
+	linear: NpArray2D
+	"""Score of each opened key with each opened character, alone and with the fixed keys."""
+	open_costs: NpArray
+	"""Stacked interkey costs among opened keys, with null diagonals
+	(already accounted for in `linear`)."""
+	open_freqs: NpArray
+	"""Stacked pair frequencies among opened characters, with null diagonals."""
+
+
+def split_fixed_opened(
+	stacks: ScoringStacks,
+	fixed_chars: list[int],
+	opened_chars: list[int],
+	fixed_interactions: tuple[float, NpArray2D] | None = None,
+) -> FixedOpenSplit:
+	"""
+	Split the scores of the layouts assigning `fixed_chars` to the fixed keys,
+	and any permutation of `opened_chars` to the opened keys.
+	The costs of `stacks` are indexed by positions: first the fixed keys, then the opened keys.\n
+	The interkey scores involving fixed keys can be provided as `fixed_interactions`:
+	the score of the fixed keys among themselves, and the score of each opened key with
+	the fixed keys for each opened character (see `FixedInteractions`).
+	Otherwise, they are computed from `stacks`.
+	"""
+	costs_1d, freqs_1d, costs_2d, freqs_2d = stacks
+	n_fixed = len(fixed_chars)
+	fixed = np.array(fixed_chars, dtype=np.intp)
+	opened = np.array(opened_chars, dtype=np.intp)
+	constant = np.einsum("mi,mi->", costs_1d[:, :n_fixed], freqs_1d[:, fixed])
+	linear = np.zeros((len(opened_chars), len(opened_chars)))
+	linear += np.einsum("mk,mc->kc", costs_1d[:, n_fixed:], freqs_1d[:, opened])
+	linear += np.einsum(
+		"mk,mc->kc",
+		np.diagonal(costs_2d, axis1=1, axis2=2)[:, n_fixed:],
+		np.diagonal(freqs_2d, axis1=1, axis2=2)[:, opened],
+	)
+	if fixed_interactions is None:
+		freqs_ff = freqs_2d[:, fixed, :][:, :, fixed]
+		freqs_fo = freqs_2d[:, fixed, :][:, :, opened]
+		freqs_of = freqs_2d[:, opened, :][:, :, fixed]
+		constant += np.einsum("mij,mij->", costs_2d[:, :n_fixed, :n_fixed], freqs_ff)
+		linear += np.einsum("mkf,mcf->kc", costs_2d[:, n_fixed:, :n_fixed], freqs_of)
+		linear += np.einsum("mfk,mfc->kc", costs_2d[:, :n_fixed, n_fixed:], freqs_fo)
+	else:
+		constant += fixed_interactions[0]
+		linear += fixed_interactions[1]
+	open_costs = np.array(costs_2d[:, n_fixed:, n_fixed:], dtype=float)
+	open_freqs = np.array(freqs_2d[:, opened, :][:, :, opened], dtype=float)
+	diagonal = np.arange(len(opened_chars))
+	open_costs[:, diagonal, diagonal] = 0
+	open_freqs[:, diagonal, diagonal] = 0
+	return FixedOpenSplit(float(constant), linear, open_costs, open_freqs)
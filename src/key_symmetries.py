@@ -0,0 +1,121 @@
+from local_types import NpVector, NpArray, NpArray2D
+from scoring_stacks import ScoringStacks
+import numpy as np
+
+
+def is_key_automorphism(
+	stacks: ScoringStacks, n_fixed: int, permutation: NpVector
+) -> bool:
+	"""
+	Tell whether moving the character of the opened position `k` to the opened position
+	`permutation[k]` leaves the costs of `stacks` unchanged, and hence any score.
+	The positions of `stacks` are the `n_fixed` fixed keys, then the opened keys.
+	"""
+	positions = np.concatenate(
+		(np.arange(n_fixed), n_fixed + np.asarray(permutation, dtype=np.intp))
+	)
+	return np.array_equal(
+		stacks.costs_1d[:, positions], stacks.costs_1d
+	) and np.array_equal(
+		stacks.costs_2d[:, positions, :][:, :, positions], stacks.costs_2d
+	)
+
+
+def is_trikey_automorphism(
+	costs_3d: NpArray, n_fixed: int, permutation: NpVector
+) -> bool:
+	"""
+	Tell whether a key automorphism (see `is_key_automorphism(…)`) also leaves the stacked
+	trikey costs `costs_3d` (*m* × *n* × *n* × *n*, with the same positions) unchanged.
+	"""
+	positions = np.concatenate(
+		(np.arange(n_fixed), n_fixed + np.asarray(permutation, dtype=np.intp))
+	)
+	return np.array_equal(
+		costs_3d[np.ix_(range(costs_3d.shape[0]), positions, positions, positions)],
+		costs_3d,
+	)
+
+
+def key_automorphisms(
+	stacks: ScoringStacks, n_fixed: int, limit: int = 64
+) -> list[NpVector]:
+	"""
+	Find the permutations of the opened positions that are key automorphisms
+	(see `is_key_automorphism(…)`), the identity excepted.\n
+	They are searched by backtracking, one opened position at a time,
+	and the search stops once `limit` of them are found.
+	(Any subset of the automorphisms can be used by `symmetry_representatives(…)`.)
+	Costs must be exactly equal, as when built symmetrically.
+	"""
+	opened_1d = stacks.costs_1d[:, n_fixed:]
+	opened_2d = stacks.costs_2d[:, n_fixed:, n_fixed:]
+	n_opened = opened_2d.shape[1]
+	if n_opened < 2:
+		return []
+	# Costs of each opened key alone and with the fixed keys, which its image must share
+	signatures = np.concatenate(
+		(
+			opened_1d.T,
+			np.diagonal(opened_2d, axis1=1, axis2=2).T,
+			stacks.costs_2d[:, n_fixed:, :n_fixed]
+			.transpose(1, 0, 2)
+			.reshape(n_opened, -1),
+			stacks.costs_2d[:, :n_fixed, n_fixed:]
+			.transpose(2, 0, 1)
+			.reshape(n_opened, -1),
+		),
+		axis=1,
+	)
+	compatible = np.all(
+		signatures[:, np.newaxis, :] == signatures[np.newaxis, :, :], axis=2
+	)
+	found = []
+	_extend(opened_2d, compatible, [], found, limit)
+	return found
+
+
+def symmetry_representatives(
+	permutations: NpArray2D, automorphisms: list[NpVector]
+) -> NpVector:
+	"""
+	Select the rows of `permutations` (indices of the opened characters, by opened position)
+	that are lexicographically minimal among their images by `automorphisms`, as a mask.\n
+	All the images of a permutation have the same score,
+	and the smallest one of each class is always selected.
+	Hence, the first best permutation in lexicographic order is always selected.
+	"""
+	rows = np.arange(permutations.shape[0])
+	selected = np.ones(permutations.shape[0], dtype=bool)
+	for automorphism in automorphisms:
+		# The character of position k moves to position automorphism[k]
+		images = permutations[:, np.argsort(automorphism)]
+		first_difference = np.argmax(images != permutations, axis=1)
+		selected &= (
+			images[rows, first_difference] >= permutations[rows, first_difference]
+		)
+	return selected
+
+
+def _extend(
+	opened_2d: NpArray2D,
+	compatible: NpArray2D,
+	images: list[int],
+	found: list[NpVector],
+	limit: int,
+) -> None:
+	k = len(images)
+	if k == compatible.shape[0]:
+		if images != sorted(images):
+			found.append(np.array(images, dtype=np.intp))
+		return
+	for image in np.flatnonzero(compatible[k]):
+		if len(found) >= limit:
+			return
+		if image in images:
+			continue
+		# Costs between k and the previous positions, which their images must share
+		if np.array_equal(
+			opened_2d[:, k, :k], opened_2d[:, image, images]
+		) and np.array_equal(opened_2d[:, :k, k], opened_2d[:, images, image]):
+			_extend(opened_2d, compatible, images + [int(image)], found, limit)
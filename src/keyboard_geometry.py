@@ -0,0 +1,160 @@
+from typing import NamedTuple
+import hashlib
+import os
+from local_types import NpArray2D, NpVector
+import numpy as np
+
+# Version of the cost computation, part of the hashes so that stale files are not reused
+_FORMAT = 1
+
+_costs: dict[tuple[str, str | None], tuple[NpVector, NpArray2D]] = {}
+
+
+class KeyboardGeometry(NamedTuple):
+	"""
+	Physical layout of *n* keys, in the order of the builder positions.
+	"""
+
+	positions: NpArray2D
+	"""Center of each key (*n* × 2), in key widths, `x` to the right and `y` downwards."""
+	fingers: NpVector
+	"""Finger typing each key, from 0 (thumb) to 4 (little finger)."""
+	hands: NpVector
+	"""Hand typing each key, 0 (left) or 1 (right)."""
+	homes: NpVector
+	"""Whether each key is the resting key of its finger (one per finger used)."""
+
+
+class EffortRules(NamedTuple):
+	"""
+	Weights of the effort rules turning a geometry into key and interkey costs.
+	Builders keep the highest scores, so penalties are given as negative weights.
+	"""
+
+	finger_costs: tuple[float, ...] = ()
+	"""Cost of a key typed by each finger (from the thumb), none if empty."""
+	distance: float = 0.0
+	"""Cost per key width between a key and the resting key of its finger."""
+	same_key: float = 0.0
+	"""Cost of typing a key twice."""
+	same_finger: float = 0.0
+	"""Cost of typing two different keys with the same finger."""
+	same_finger_distance: float = 0.0
+	"""Additional cost per key width between two keys typed with the same finger."""
+	alternation: float = 0.0
+	"""Cost of typing two keys with different hands."""
+	inward_roll: float = 0.0
+	"""Cost of typing two keys with fingers of the same hand, towards the thumb."""
+	outward_roll: float = 0.0
+	"""Cost of typing two keys with fingers of the same hand, away from the thumb."""
+	row_jump: float = 0.0
+	"""Cost per key height between two keys typed with different fingers of the same hand."""
+
+
+def key_costs(geometry: KeyboardGeometry, rules: EffortRules) -> NpVector:
+	"""
+	Compute the cost of each key of `geometry` (*n*) with the effort `rules`.
+	"""
+	positions, fingers, hands, homes = _arrays(geometry)
+	costs = np.zeros(fingers.size)
+	if rules.finger_costs:
+		costs += np.asarray(rules.finger_costs, dtype=float)[fingers]
+	if rules.distance:
+		# Resting position of each (hand, finger), indexed as `hand * 5 + finger`
+		finger_ids = hands * 5 + fingers
+		home_positions = np.full((10, 2), np.nan)
+		home_positions[finger_ids[homes]] = positions[homes]
+		offsets = positions - home_positions[finger_ids]
+		if np.isnan(offsets).any():
+			raise ValueError("Expected a resting key for each finger used.")
+		costs += rules.distance * np.hypot(offsets[:, 0], offsets[:, 1])
+	return costs
+
+
+def interkey_costs(geometry: KeyboardGeometry, rules: EffortRules) -> NpArray2D:
+	"""
+	Compute the cost of each pair of keys of `geometry` (*n* × *n*, first key by row)
+	with the effort `rules`, for all pairs at once.
+	"""
+	positions, fingers, hands, _ = _arrays(geometry)
+	offsets = positions[np.newaxis, :, :] - positions[:, np.newaxis, :]
+	distances = np.hypot(offsets[:, :, 0], offsets[:, :, 1])
+	same_key = np.eye(fingers.size, dtype=bool)
+	same_hand = hands[:, np.newaxis] == hands[np.newaxis, :]
+	same_finger = same_hand & (fingers[:, np.newaxis] == fingers[np.newaxis, :])
+	rolls = same_hand & ~same_finger
+	same_finger &= ~same_key
+	costs = rules.same_key * same_key
+	costs += same_finger * (rules.same_finger + rules.same_finger_distance * distances)
+	costs += rules.alternation * ~same_hand
+	inward = fingers[np.newaxis, :] < fingers[:, np.newaxis]
+	costs += rolls * np.where(inward, rules.inward_roll, rules.outward_roll)
+	costs += rolls * (rules.row_jump * np.abs(offsets[:, :, 1]))
+	return costs
+
+
+def geometry_hash(geometry: KeyboardGeometry, rules: EffortRules) -> str:
+	"""
+	Hash of `geometry` and `rules`, identifying the costs they produce.
+	"""
+	digest = hashlib.sha256(f"{_FORMAT}:{tuple(map(float, rules[0]))!r}".encode())
+	digest.update(repr(tuple(map(float, rules[1:]))).encode())
+	for array in _arrays(geometry):
+		digest.update(repr(array.shape).encode())
+		digest.update(np.ascontiguousarray(array).tobytes())
+	return digest.hexdigest()
+
+
+def geometry_costs(
+	geometry: KeyboardGeometry, rules: EffortRules, directory: str | None = None
+) -> tuple[NpVector, NpArray2D]:
+	"""
+	Provide the key costs and interkey costs of `geometry` with the effort `rules`,
+	as read-only arrays (see `key_costs(…)` and `interkey_costs(…)`).\n
+	The costs are computed once per process for each hash of the geometry and rules.
+	If a `directory` is provided, they are also stored there as a `.npz` file on first use,
+	and later loaded rather than computed, so that sweeps over many geometry variants
+	(possibly across runs and processes) only compute the costs of new variants.
+	"""
+	key = (geometry_hash(geometry, rules), directory)
+	costs = _costs.get(key)
+	if costs is None:
+		if directory is None:
+			costs = key_costs(geometry, rules), interkey_costs(geometry, rules)
+		else:
+			costs = _load_or_store(geometry, rules, key[0], directory)
+		for array in costs:
+			array.flags.writeable = False
+		_costs[key] = costs
+	return costs
+
+
+def _arrays(
+	geometry: KeyboardGeometry,
+) -> tuple[NpArray2D, NpVector, NpVector, NpVector]:
+	positions, fingers, hands, homes = geometry
+	return (
+		np.asarray(positions, dtype=float).reshape(-1, 2),
+		np.asarray(fingers, dtype=np.int64),
+		np.asarray(hands, dtype=np.int64),
+		np.asarray(homes, dtype=bool),
+	)
+
+
+def _load_or_store(
+	geometry: KeyboardGeometry, rules: EffortRules, digest: str, directory: str
+) -> tuple[NpVector, NpArray2D]:
+	path = os.path.join(directory, f"costs_{digest}.npz")
+	if not os.path.exists(path):
+		os.makedirs(directory, exist_ok=True)
+		# Written aside then renamed, so that concurrent processes never read a partial file
+		temporary_path = f"{path}.{os.getpid()}.tmp"
+		with open(temporary_path, "wb") as file:
+			np.savez(
+				file,
+				key_costs=key_costs(geometry, rules),
+				interkey_costs=interkey_costs(geometry, rules),
+			)
+		os.replace(temporary_path, path)
+	with np.load(path) as stored:
+		return stored["key_costs"], stored["interkey_costs"]
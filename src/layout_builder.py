@@ -1,18 +1,50 @@
-from typing import Iterable
-from itertools import permutations
+from typing import Callable, Iterable, Iterator, Literal, Self, Sequence, TypeVar
+from itertools import permutations, islice, repeat
+from concurrent.futures import ProcessPoolExecutor
+from heapq import heappush, heapreplace
+import copy
+import os
+from local_types import NpVector
+from search_cache import SearchCache
+from sweep_progress import SweepProgress
+import numpy as np
+
+T = TypeVar("T")
 
 
 class LayoutBuilder:
+	__slots__ = (
+		"_fixed",
+		"_opened_keys",
+		"_opened_chars",
+		"_config_changed",
+		"cache",
+		"__opened_keys_mask",
+		"__opened_chars_mask",
+	)
+
 	_fixed: dict[int, int]
 	_opened_keys: list[int]
 	_opened_chars: list[int]
 	_config_changed: bool
+	cache: SearchCache | None
+	"""Cache of search results (see `.__init__(…)`), if any."""
+	__opened_keys_mask: int
+	"""Bitmask of `._opened_keys`, for constant-time membership checks."""
+	__opened_chars_mask: int
+	"""Bitmask of `._opened_chars`."""
 
-	def __init__(self) -> None:
+	def __init__(self, cache_size: int = 0) -> None:
+		"""
+		If `cache_size` is positive, the results of `.best_opened_permutation(…)`
+		and `.top_opened_permutations(…)` are cached for the `cache_size` most recently
+		searched configurations (fixed assignment, opened keys and characters, search options),
+		so that searching again the same configuration is a mere lookup (see `SearchCache`).
+		"""
 		self._fixed = {}
-		self._opened_keys = []
-		self._opened_chars = []
+		self.__set_opened([], [])
 		self._config_changed = True
+		self.cache = SearchCache(cache_size) if cache_size > 0 else None
 
 	def fix(self, keys: Iterable[int], chars: Iterable[int]):
 		"""
@@ -31,20 +63,58 @@ class LayoutBuilder:
 		Open the keys `keys` to the possible characters `chars`.
 		Characters and keys are given as identifying indices.
 		"""
-		for k in keys:
-			if k not in self._opened_keys:
+		# Python integers, as shifts of fixed-width numpy integers overflow beyond 63
+		for k in map(int, keys):
+			if not self.__opened_keys_mask >> k & 1:
 				self._opened_keys.append(k)
-		for c in chars:
-			if c not in self._opened_chars:
+				self.__opened_keys_mask |= 1 << k
+		for c in map(int, chars):
+			if not self.__opened_chars_mask >> c & 1:
 				self._opened_chars.append(c)
+				self.__opened_chars_mask |= 1 << c
 		self.__remove_opened_from_fixed()
 		self._config_changed = True
 
+	def clear(self):
+		"""
+		Remove all fixed assignments, and close all opened keys and characters.
+		"""
+		self._fixed = {}
+		self.close()
+
+	def close(self):
+		"""
+		Close all opened keys and characters.
+		"""
+		self.__set_opened([], [])
+		self._config_changed = True
+
+	def fork(self) -> Self:
+		"""
+		Provide a copy of the builder, to be modified independently.
+		Only the assignment state (fixed assignment, opened keys and characters) is copied:
+		the scoring data, any precomputation and the search cache are shared,
+		as they are never modified in place (but replaced when changed).
+		"""
+		forked = copy.copy(self)
+		forked._fixed = dict(self._fixed)
+		forked._opened_keys = list(self._opened_keys)
+		forked._opened_chars = list(self._opened_chars)
+		return forked
+
+	def layout(self) -> dict[int, int]:
+		"""
+		Provide the fixed assignment, as `{key: char}`.
+		"""
+		return dict(self._fixed)
+
 	def optimal_fill(
+		self,
 		keys_to_fill: Iterable[int] | int,
 		fill_with: Iterable[int] | None = None,
 		remap: bool = False,
-	):
+		**search_options,
+	) -> float:
 		"""
 		Optimally fills a given set of keys with a given set of characters.
 		“Optimally” is defined by the highest score, as given by the `.score(…)` method.
@@ -58,9 +128,145 @@ class LayoutBuilder:
 		(by increasing index) are used.
 		(“Usable” ⇔ “unmapped” if `remap = False` (default), “any” else.)
 		- `remap`: If `False` (default), already set keys and characters are ignored/untouched.
+		If `True`, the keys and characters to use are first removed from the fixed assignment.
+		- `search_options`: Passed to `.best_opened_permutation(…)`.\n
+		Any previously opened key or character is closed.
+		The best permutation is then fixed, and its score returned.
+		"""
+		keys = self.__usable_keys(keys_to_fill, remap)
+		chars = self.__usable_chars(fill_with, len(keys), remap)
+		if len(chars) != len(keys):
+			raise ValueError(
+				"Mismatch between the numbers of keys and characters to fill."
+			)
+		if remap:
+			self.__unfix(keys, chars)
+		self.close()
+		self.open(keys, chars)
+		score, chars_order = self.best_opened_permutation(**search_options)
+		self.fix(list(self._opened_keys), self._chars_of(chars_order))
+		return score
+
+	def best_opened_permutation(
+		self,
+		block_size: int = 4096,
+		workers: int | None = 1,
+		prefix: tuple[int, ...] = (),
+		progress: SweepProgress | None = None,
+	) -> tuple[float, tuple[int, ...]]:
+		"""
+		Find the permutation of the opened characters with the highest score.
+		Returns the score and the permutation (in the format of `.opened_permutations()`).\n
+		The permutations are streamed by blocks of `block_size` permutations
+		(see `.opened_permutation_blocks(…)`), each one scored at once with `.score_many(…)`.
+		Only the best permutation met so far is kept (the first one, in case of ties).\n
+		- `workers`: If more than 1 (or `None`, to use all processors), the permutations are split
+		  by their first characters into shards, swept in parallel by a pool of processes,
+		  each one working on its own copy of the builder.
+		  The result does not depend on the number of workers.
+		- `prefix`: Only consider the permutations starting with the characters of `prefix`.
+		- `progress`: Progress of a sequential sweep, updated after each block, and from which
+		  the sweep is resumed (see `SweepProgress`). Parallel sweeps are not tracked.
+		"""
+		return self._cached_search(
+			("best", prefix),
+			lambda: self.__best_opened_permutation(
+				block_size, workers, prefix, progress
+			),
+		)
+
+	def __best_opened_permutation(
+		self,
+		block_size: int,
+		workers: int | None,
+		prefix: tuple[int, ...],
+		progress: SweepProgress | None,
+	) -> tuple[float, tuple[int, ...]]:
+		if workers is None:
+			workers = os.cpu_count() or 1
+		if workers <= 1:
+			return self.__best_in_blocks(
+				self.opened_permutation_blocks(block_size, prefix), progress
+			)
+		best_score = -np.inf
+		best_order = None
+		for score, order in self.__in_shards(
+			_best_opened_permutation_in_shard, prefix, workers, block_size
+		):
+			if best_order is None or score > best_score:
+				best_score, best_order = score, order
+		return best_score, best_order
+
+	def top_opened_permutations(
+		self,
+		k: int,
+		block_size: int = 4096,
+		workers: int | None = 1,
+		prefix: tuple[int, ...] = (),
+		progress: SweepProgress | None = None,
+	) -> list[tuple[float, tuple[int, ...]]]:
+		"""
+		Find the `k` permutations of the opened characters with the highest scores.
+		Returns them as `(score, permutation)` records, by decreasing score
+		(and in the order of `.opened_permutations()` in case of ties).\n
+		The permutations are swept as by `.best_opened_permutation(…)`, with the same
+		`block_size`, `workers`, `prefix` and `progress` options.
+		Only the candidates of each block that can enter the current top `k`
+		(found by partial selection) are merged into a heap of `k` records,
+		so that memory does not depend on the number of permutations.
 		"""
-		# TODO Is it needed? This would be a shorthand for various step, but is it really useful?
-		pass
+		if k < 1:
+			raise ValueError("Expected a positive number of permutations to keep.")
+		records = self._cached_search(
+			("top", k, prefix),
+			lambda: tuple(
+				self.__top_opened_permutations(k, block_size, workers, prefix, progress)
+			),
+		)
+		return list(records)
+
+	def __top_opened_permutations(
+		self,
+		k: int,
+		block_size: int,
+		workers: int | None,
+		prefix: tuple[int, ...],
+		progress: SweepProgress | None,
+	) -> list[tuple[float, tuple[int, ...]]]:
+		if workers is None:
+			workers = os.cpu_count() or 1
+		if workers <= 1:
+			return self.__top_in_blocks(
+				self.opened_permutation_blocks(block_size, prefix), k, progress
+			)
+		records = []
+		for shard_records in self.__in_shards(
+			_top_opened_permutations_in_shard, prefix, workers, k, block_size
+		):
+			records += shard_records
+		# Stable sort: shards come in order, so ties stay in the order of the sweep
+		records.sort(key=lambda record: -record[0])
+		return records[:k]
+
+	def _cached_search(self, search: tuple, compute: Callable[[], T]) -> T:
+		"""
+		Provide the result of `compute()` for the `search` (a tuple identifying the search
+		and its options) in the current configuration, from the cache if any.
+		"""
+		if self.cache is None:
+			return compute()
+		return self.cache.get(self._cache_key(search), compute)
+
+	def _cache_key(self, search: tuple) -> tuple:
+		"""
+		Identify the `search` in the current configuration.
+		A subclass should extend it with any setting affecting its results.
+		"""
+		return (
+			tuple(sorted(self._fixed.items())),
+			tuple(self._opened_keys),
+			tuple(self._opened_chars),
+		) + search
 
 	def score(self, open_chars_order: tuple[int, ...] = []) -> float:
 		"""
@@ -73,7 +279,7 @@ class LayoutBuilder:
 		By default, `open_chars_order` is given as raw identifying indices.
 		However, the `score` method can use something else
 		(typically, indices for `._opened_chars` as defined through `open(…)`),
-		provided that `.opened_permutations()` is overwritten accordingly.\n
+		provided that `.opened_permutations()` and `._chars_of(…)` are overwritten accordingly.\n
 		If precomputation should be done once for a given set of fixed and opened keys and characters,
 		the method can use `self._config_changed` to know when such precomputation is needed,
 		as `._config_changed` is set to `True` by `.fix(…)`/`.assign(…)` and `.open(…)`. Typically:
@@ -87,23 +293,254 @@ class LayoutBuilder:
 		"""
 		raise NotImplementedError()
 
-	def opened_permutations(self) -> Iterable[tuple[int, ...]]:
+	def __best_in_blocks(
+		self,
+		blocks: Iterable[Sequence[tuple[int, ...]]],
+		progress: SweepProgress | None,
+	) -> tuple[float, tuple[int, ...]]:
+		if progress is None:
+			progress = SweepProgress()
+		# Blocks swept before an interruption are skipped
+		for block in islice(blocks, progress.blocks, None):
+			scores = self.score_many(block)
+			i = int(np.argmax(scores))
+			if not progress.records or scores[i] > progress.records[0][0]:
+				progress.records = [
+					(
+						float(scores[i]),
+						-(progress.rank + i),
+						tuple(int(c) for c in block[i]),
+					)
+				]
+			progress.advance(scores.size)
+		if not progress.records:
+			return -np.inf, None
+		best_score, _, best_order = progress.records[0]
+		return best_score, best_order
+
+	def __top_in_blocks(
+		self,
+		blocks: Iterable[Sequence[tuple[int, ...]]],
+		k: int,
+		progress: SweepProgress | None,
+	) -> list[tuple[float, tuple[int, ...]]]:
+		if progress is None:
+			progress = SweepProgress()
+		# Min-heap of (score, -rank, permutation): its root is the worst record kept,
+		# the later permutation losing ties. It is updated in place as the progress records.
+		heap = progress.records
+		for block in islice(blocks, progress.blocks, None):
+			scores = self.score_many(block)
+			candidates = np.arange(scores.size)
+			if scores.size > k:
+				kth_score = scores[np.argpartition(scores, -k)[-k]]
+				candidates = np.flatnonzero(scores >= kth_score)
+			if len(heap) == k:
+				candidates = candidates[scores[candidates] >= heap[0][0]]
+			for i in candidates:
+				record = (
+					float(scores[i]),
+					-(progress.rank + int(i)),
+					tuple(int(c) for c in block[i]),
+				)
+				if len(heap) < k:
+					heappush(heap, record)
+				elif record > heap[0]:
+					heapreplace(heap, record)
+			progress.advance(scores.size)
+		return [(score, order) for score, _, order in sorted(heap, reverse=True)]
+
+	def __in_shards(
+		self, function, prefix: tuple[int, ...], workers: int, *arguments
+	) -> Iterator:
+		# Results of `function(builder, shard_prefix, *arguments)` for each shard, in order
+		prefixes = self.__shard_prefixes(prefix, 4 * workers)
+		with ProcessPoolExecutor(max_workers=workers) as executor:
+			yield from executor.map(
+				function,
+				repeat(self),
+				prefixes,
+				*(repeat(argument) for argument in arguments),
+			)
+
+	def __shard_prefixes(
+		self, prefix: tuple[int, ...], min_shards: int
+	) -> list[tuple[int, ...]]:
+		# Longer and longer prefixes, until there are at least `min_shards` of them
+		chars_left = [c for c in self._opened_chars if c not in prefix]
+		length = 0
+		n_shards = 1
+		while n_shards < min_shards and length < len(chars_left) - 1:
+			n_shards *= len(chars_left) - length
+			length += 1
+		return [prefix + p for p in permutations(chars_left, length)]
+
+	def score_many(self, open_chars_orders: Iterable[tuple[int, ...]]) -> NpVector:
+		"""
+		Score many layouts at once, returning the vector of their scores.
+		Each element of `open_chars_orders` is provided as it would be to `.score(…)`.\n
+		By default, `.score(…)` is simply called for each layout.
+		A subclass should overwrite this method if it can score many layouts faster.
+		"""
+		return np.array([self.score(order) for order in open_chars_orders], dtype=float)
+
+	def key_count(self) -> int:
+		"""
+		Provide the number of keys, identified by the indices in `[0 .. key_count[`.\n
+		⚠ This method must be implemented by a subclass.
+		(It is only needed when keys are not explicitly provided, e.g. by `.optimal_fill(…)`.)
+		"""
+		raise NotImplementedError()
+
+	def char_count(self) -> int:
+		"""
+		Provide the number of characters, identified by the indices in `[0 .. char_count[`.\n
+		⚠ This method must be implemented by a subclass.
+		(It is only needed when characters are not explicitly provided, e.g. by `.optimal_fill(…)`.)
+		"""
+		raise NotImplementedError()
+
+	def opened_permutations(
+		self,
+		order: Literal["lexicographic", "heap"] = "lexicographic",
+		prefix: tuple[int, ...] = (),
+	) -> Iterable[tuple[int, ...]]:
 		"""
 		Provide all the permutations of opened characters,
 		in a format compatible with the `.score(…)` method.\n
 		(By default, each permutation is given as the ordered tuple of the character identifying indices.
 		If instead for example, the `.score(…)` method uses the indices of the characters within
 		`self._opened_chars`, `.opened_permutations()` should be overwritten to:
-		`return permutations(range(self._opened_chars))`.)
+		`return permutations(range(len(self._opened_chars)))`,
+		and `._chars_of(…)` to map such permutations back to the characters.)\n
+		An overwriting method may take no arguments, as the other methods only give them
+		to this implementation (see `.opened_permutation_blocks(…)`).\n
+		With `order = "heap"`, the permutations are given in the order of Heap's algorithm,
+		each one differing from the previous one by a single swap (see `heap_swaps(…)`).\n
+		With `prefix`, only the permutations starting with the characters of `prefix` are given.
+		"""
+		chars_left = [c for c in self._opened_chars if c not in prefix]
+		if order == "heap":
+			permutations_left = self.__heap_permutations(chars_left)
+		else:
+			permutations_left = permutations(chars_left)
+		if prefix:
+			return (prefix + p for p in permutations_left)
+		return permutations_left
+
+	def _chars_of(self, order: Sequence[int]) -> tuple[int, ...]:
 		"""
-		return permutations(self._opened_chars)
+		Provide the characters of `order`, a permutation (or its beginning) in the format of
+		`.opened_permutations()`, i.e. the characters themselves by default.\n
+		A subclass providing the permutations in another format should overwrite it accordingly.
+		"""
+		return tuple(order)
+
+	def opened_permutation_blocks(
+		self, block_size: int = 4096, prefix: tuple[int, ...] = ()
+	) -> Iterable[Sequence[tuple[int, ...]]]:
+		"""
+		Provide all the permutations of opened characters, as given by `.opened_permutations()`,
+		grouped in blocks of (at most) `block_size` permutations that can be given to `.score_many(…)`.\n
+		If `.opened_permutations()` is overwritten, it is called without arguments,
+		and the permutations starting with `prefix` are kept from all of them.\n
+		A subclass can overwrite this method to provide the blocks in a more efficient format.
+		"""
+		if not prefix:
+			all_permutations = iter(self.opened_permutations())
+		elif type(self).opened_permutations is LayoutBuilder.opened_permutations:
+			all_permutations = iter(self.opened_permutations(prefix=prefix))
+		else:
+			n = len(prefix)
+			all_permutations = (
+				p for p in self.opened_permutations() if self._chars_of(p[:n]) == prefix
+			)
+		while block := list(islice(all_permutations, block_size)):
+			yield block
+
+	@staticmethod
+	def __heap_permutations(chars: list[int]) -> Iterator[tuple[int, ...]]:
+		chars = list(chars)
+		yield tuple(chars)
+		for i, j in heap_swaps(len(chars)):
+			chars[i], chars[j] = chars[j], chars[i]
+			yield tuple(chars)
+
+	def __usable_keys(self, keys: Iterable[int] | int, remap: bool) -> list[int]:
+		if isinstance(keys, int):
+			n = keys
+			keys = [k for k in range(self.key_count()) if remap or k not in self._fixed]
+			if len(keys) < n:
+				raise ValueError(f"Less than {n} usable keys.")
+			return keys[:n]
+		return [k for k in keys if remap or k not in self._fixed]
+
+	def __usable_chars(
+		self, chars: Iterable[int] | None, n: int, remap: bool
+	) -> list[int]:
+		set_chars = set() if remap else set(self._fixed.values())
+		if chars is None:
+			chars = [c for c in range(self.char_count()) if c not in set_chars]
+			if len(chars) < n:
+				raise ValueError(f"Less than {n} usable characters.")
+			return chars[:n]
+		return [c for c in chars if c not in set_chars]
+
+	def __unfix(self, keys: list[int], chars: list[int]):
+		set_keys = set(keys)
+		set_chars = set(chars)
+		self._fixed = {
+			k: c
+			for k, c in self._fixed.items()
+			if k not in set_keys and c not in set_chars
+		}
+		self._config_changed = True
+
+	def __set_opened(self, keys: list[int], chars: list[int]):
+		self._opened_keys = keys
+		self._opened_chars = chars
+		self.__opened_keys_mask = sum(1 << int(k) for k in keys)
+		self.__opened_chars_mask = sum(1 << int(c) for c in chars)
 
 	def __remove_fixed_from_opened(self):
-		self._opened_keys = [k for k in self._opened_keys if k not in self._fixed]
 		set_chars = set(self._fixed.values())
-		self._opened_chars = [k for k in self._opened_chars if k not in set_chars]
+		self.__set_opened(
+			[k for k in self._opened_keys if k not in self._fixed],
+			[c for c in self._opened_chars if c not in set_chars],
+		)
 
 	def __remove_opened_from_fixed(self):
 		for k in self._opened_keys:
 			if k in self._fixed:
 				del self._fixed[k]
+
+
+def _best_opened_permutation_in_shard(
+	builder: LayoutBuilder, prefix: tuple[int, ...], block_size: int
+) -> tuple[float, tuple[int, ...]]:
+	return builder.best_opened_permutation(block_size, prefix=prefix)
+
+
+def _top_opened_permutations_in_shard(
+	builder: LayoutBuilder, prefix: tuple[int, ...], k: int, block_size: int
+) -> list[tuple[float, tuple[int, ...]]]:
+	return builder.top_opened_permutations(k, block_size, prefix=prefix)
+
+
+def heap_swaps(n: int) -> Iterator[tuple[int, int]]:
+	"""
+	Provide the successive swaps of Heap's algorithm on *n* elements,
+	as pairs of indices `(i, j)`.
+	Starting from any order of the *n* elements and applying each swap in turn
+	goes through all their *n*! permutations (the starting one included).
+	"""
+	counters = [0] * n
+	i = 1
+	while i < n:
+		if counters[i] < i:
+			yield (0, i) if i % 2 == 0 else (counters[i], i)
+			counters[i] += 1
+			i = 1
+		else:
+			counters[i] = 0
+			i += 1
@@ -0,0 +1,159 @@
+from typing import Literal
+from local_types import NpVector, NpArray, NpArray2D
+from scoring_stacks import ScoringStacks
+import numpy as np
+
+
+class LocalSearch:
+	"""
+	Local search over a complete layout, by swaps of characters between positions.\n
+	The layout is described by `chars`, the characters assigned to the positions `[0 .. n[`,
+	where the positions are the indices used by the (reduced) costs (as for `SwapScorer`).
+	For each interkey costs matrix *C*, with *G* the frequencies gathered for the current layout
+	(*G[i, j] = F[chars[i], chars[j]]*), the tables *Cᵀ G* and *C Gᵀ* are maintained.
+	The score variations of all the *n*² swaps can then be derived at once
+	in O(*n*²) operations, and applying a swap updates the tables in O(*n*²) operations,
+	instead of O(*n*) for each swap variation (O(*n*³) for all of them).
+	"""
+
+	chars: NpVector
+	score: float
+	swaps: int
+	"""Number of swaps applied since the creation of the search."""
+	__stacks: ScoringStacks
+	__gathered: NpArray
+	__costs_t_gathered: NpArray
+	__costs_gathered_t: NpArray
+
+	def __init__(self, stacks: ScoringStacks, chars: NpVector | list[int]) -> None:
+		"""
+		Prepare a local search from the layout assigning `chars[k]` to position `k`,
+		the costs of `stacks` being indexed by positions.
+		"""
+		self.__stacks = stacks
+		self.chars = np.array(chars, dtype=np.intp)
+		self.score = stacks.score(self.chars)
+		self.swaps = 0
+		costs = stacks.costs_2d
+		self.__gathered = stacks.freqs_2d[:, self.chars, :][:, :, self.chars]
+		self.__costs_t_gathered = costs.transpose(0, 2, 1) @ self.__gathered
+		self.__costs_gathered_t = costs @ self.__gathered.transpose(0, 2, 1)
+
+	def deltas(self) -> NpArray2D:
+		"""
+		Score variations caused by swapping the characters of positions `a` and `b`,
+		as a matrix indexed by `[a, b]`.
+		"""
+		costs_1d, freqs_1d, costs, _ = self.__stacks
+		freqs_1d = freqs_1d[:, self.chars]
+		deltas = np.einsum(
+			"mab,mab->ab",
+			costs_1d[:, :, np.newaxis] - costs_1d[:, np.newaxis, :],
+			freqs_1d[:, np.newaxis, :] - freqs_1d[:, :, np.newaxis],
+		)
+		gathered = self.__gathered
+		# Σ_k of the variations on rows and columns a and b, for all k ...
+		tables = self.__costs_t_gathered + self.__costs_gathered_t
+		tables_diag = np.diagonal(tables, axis1=1, axis2=2)
+		variations = tables + tables.transpose(0, 2, 1)
+		variations -= tables_diag[:, :, np.newaxis] + tables_diag[:, np.newaxis, :]
+		# ... minus the terms for k = a and k = b, then the 4 intersections
+		costs_diag = np.diagonal(costs, axis1=1, axis2=2)
+		gathered_diag = np.diagonal(gathered, axis1=1, axis2=2)
+		c_aa = costs_diag[:, :, np.newaxis]
+		c_bb = costs_diag[:, np.newaxis, :]
+		g_aa = gathered_diag[:, :, np.newaxis]
+		g_bb = gathered_diag[:, np.newaxis, :]
+		c_ab = costs
+		c_ba = costs.transpose(0, 2, 1)
+		g_ab = gathered
+		g_ba = gathered.transpose(0, 2, 1)
+		variations -= (c_aa - c_ab) * (g_ab - g_aa) + (c_aa - c_ba) * (g_ba - g_aa)
+		variations -= (c_ba - c_bb) * (g_bb - g_ba) + (c_ab - c_bb) * (g_bb - g_ab)
+		variations += (c_aa - c_bb) * (g_bb - g_aa) + (c_ab - c_ba) * (g_ba - g_ab)
+		deltas += np.sum(variations, axis=0)
+		np.fill_diagonal(deltas, 0)
+		return deltas
+
+	def swap(self, a: int, b: int) -> float:
+		"""
+		Swap the characters of positions `a` and `b`, and return the updated score.
+		"""
+		if a == b:
+			return self.score
+		self.score += float(self.deltas()[a, b])
+		self.__apply_swap(a, b)
+		return self.score
+
+	def run(
+		self,
+		strategy: Literal["best", "first"] = "best",
+		positions: list[int] | None = None,
+		max_swaps: int | None = None,
+		tolerance: float = 1e-9,
+	) -> float:
+		"""
+		Apply improving swaps until none is left (a local optimum), and return the final score.
+		- `strategy`: Apply the swap with the highest improvement (`"best"`, default),
+		  or the first improving one, in the order of positions (`"first"`).
+		- `positions`: Only swap characters among those positions (default: all).
+		- `max_swaps`: Stop after that many swaps, even if improvements are left.
+		- `tolerance`: Minimum improvement of a swap, so that rounding errors cannot cause cycles.
+		"""
+		if strategy not in ("best", "first"):
+			raise ValueError(f"Unknown strategy “{strategy}”.")
+		allowed = np.zeros((self.chars.size, self.chars.size), dtype=bool)
+		if positions is None:
+			positions = range(self.chars.size)
+		allowed[np.ix_(positions, positions)] = True
+		allowed &= np.triu(allowed, 1)
+		swaps = 0
+		while max_swaps is None or swaps < max_swaps:
+			deltas = np.where(allowed, self.deltas(), -np.inf)
+			if strategy == "best":
+				i = int(np.argmax(deltas))
+			else:
+				i = int(np.argmax(deltas > tolerance))
+			if deltas.flat[i] <= tolerance:
+				break
+			a, b = divmod(i, self.chars.size)
+			self.score += float(deltas.flat[i])
+			self.__apply_swap(a, b)
+			swaps += 1
+		# Rescore from scratch, as successive updates can accumulate rounding errors
+		self.score = self.__stacks.score(self.chars)
+		return self.score
+
+	def __apply_swap(self, a: int, b: int) -> None:
+		chars = self.chars
+		chars[a], chars[b] = chars[b], chars[a]
+		costs = self.__stacks.costs_2d
+		freqs = self.__stacks.freqs_2d
+		swapped = [a, b]
+		gathered = self.__gathered
+		# Rows a and b change entirely, as do columns a and b
+		rows = freqs[:, chars[swapped], :][:, :, chars]
+		cols = freqs[:, chars, :][:, :, chars[swapped]]
+		rows_change = rows - gathered[:, swapped, :]
+		cols_change = cols - gathered[:, :, swapped]
+		rows_change[:, :, swapped] = 0
+		gathered[:, swapped, :] = rows
+		gathered[:, :, swapped] = cols
+		# Cᵀ G: rank-2 update for the changes on rows a and b (outside columns a and b),
+		# then columns a and b from scratch
+		self.__costs_t_gathered += np.einsum(
+			"mki,mkj->mij", costs[:, swapped, :], rows_change
+		)
+		self.__costs_t_gathered[:, :, swapped] = (
+			costs.transpose(0, 2, 1) @ gathered[:, :, swapped]
+		)
+		# C Gᵀ: rank-2 update for the changes on columns a and b (outside rows a and b),
+		# then columns a and b (the rows of G) from scratch
+		cols_change[:, swapped, :] = 0
+		self.__costs_gathered_t += np.einsum(
+			"mik,mjk->mij", costs[:, :, swapped], cols_change
+		)
+		self.__costs_gathered_t[:, :, swapped] = costs @ gathered[
+			:, swapped, :
+		].transpose(0, 2, 1)
+		self.swaps += 1
@@ -1,58 +1,772 @@
-from layout_builder import LayoutBuilder
-from local_types import NpVector, NpArray1D, NpArray2D, T_NpData
+from typing import Iterable, Iterator, Literal, Self
+from itertools import count
+from layout_builder import LayoutBuilder, heap_swaps
+from swap_scorer import SwapScorer
+from local_search import LocalSearch
+from annealing import SimulatedAnnealing
+from scoring_stacks import ScoringStacks, stack_costs_freqs
+from branch_and_bound import BranchAndBound
+from permutation_tables import permutation_table, prefix_range
+from fixed_open_split import FixedOpenSplit, split_fixed_opened
+from fixed_interactions import FixedInteractions
+from pair_sweep import PairSweep, Precision, pair_sweep
+from sparse_pairs import SparsePairs, sparse_pairs
+from trikey_split import TrikeySplit, split_trikey
+from sweep_progress import SweepProgress
+from key_symmetries import (
+	is_key_automorphism,
+	is_trikey_automorphism,
+	key_automorphisms,
+	symmetry_representatives,
+)
+from local_types import NpVector, NpArray, NpArray1D, NpArray2D, T_NpData
 import numpy as np
+import json
+import os
+import re
+import uuid
+
+# Version of the snapshot layout written by `.save(…)`
+_SNAPSHOT_FORMAT = 1
+
+# Array files of a snapshot, with the token of the `.save(…)` that wrote them (if any)
+_SNAPSHOT_ARRAY = re.compile(r"(costs|freqs)_[123]d_\d+(_[0-9a-f]+)?\.npy")
+
+# Unique versions of the scoring data, across builders and their forks
+_data_versions = count()
 
 
 class MatrixBasedLayoutBuilder(LayoutBuilder):
+	__slots__ = (
+		"_costs_freqs_1d",
+		"_costs_freqs_2d",
+		"_corpora_1d",
+		"_costs_freqs_3d",
+		"_corpora_2d",
+		"_corpora_3d",
+		"corpus_weights",
+		"__anticipative",
+		"permutation_tables",
+		"__key_symmetries",
+		"__precision",
+		"rescore",
+		"__sparse_threshold",
+		"__data",
+		"__data_version",
+		"__weights",
+		"__trikey_data",
+		"__trikey_costs",
+		"__trikey",
+		"__fixed_interactions",
+		"__stacks",
+		"__fixed_chars",
+		"__split",
+		"__sweep",
+		"__sparse",
+		"__opened_index",
+		"__key_automorphisms",
+	)
+
 	_costs_freqs_1d: list[tuple[NpVector, NpVector]]
 	"""[(key costs, char frequencies), …]"""
 	_costs_freqs_2d: list[tuple[NpArray2D, NpArray2D]]
 	"""[(interkey costs, char pair frequencies), …]"""
+	_costs_freqs_3d: list[tuple[NpArray, NpArray]]
+	"""[(trikey costs, trigram frequencies), …]"""
+	_corpora_1d: list[str | None]
+	"""Corpus of the frequencies of each item of `._costs_freqs_1d`."""
+	_corpora_2d: list[str | None]
+	"""Corpus of the frequencies of each item of `._costs_freqs_2d`."""
+	_corpora_3d: list[str | None]
+	"""Corpus of the frequencies of each item of `._costs_freqs_3d`."""
+	corpus_weights: dict[str | None, float]
+	"""Weight of each corpus in the score (1 for unlisted ones), see `.set_corpus_weights(…)`."""
 
-	__costs_freqs_1d_current: list[tuple[NpVector, NpVector]]
-	__costs_freqs_2d_current: list[tuple[NpArray2D, NpArray2D]]
+	__anticipative: bool
+	permutation_tables: str | None
+	"""Directory where permutation tables are cached (see `permutation_table(…)`)."""
+	__key_symmetries: Literal["detect"] | list[dict[int, int]] | None
+	__precision: Precision
+	rescore: int
+	"""Number of candidates re-scored exactly after a reduced-precision search."""
+	__sparse_threshold: float | None
+
+	__data: ScoringStacks | None
+	__data_version: int
+	"""Version of the data and corpus weights, identifying them in the search cache keys,
+	as forks share the cache (a changed fork has a version of its own)."""
+	__weights: tuple[NpVector, NpVector, NpVector] | None
+	"""Weights of the stacked key, interkey and trikey costs, unless they are all 1."""
+	__trikey_data: tuple[NpArray, NpArray] | None
+	"""Stacked trikey costs and trigram frequencies, if any."""
+	__trikey_costs: NpArray
+	"""Stacked trikey costs among assigned keys, by position (see `.__precompute()`)."""
+	__trikey: TrikeySplit | None
+	__fixed_interactions: FixedInteractions | None
+	__stacks: ScoringStacks
 	__fixed_chars: list[int]
+	__split: FixedOpenSplit | None
+	__sweep: PairSweep
+	__sparse: tuple[float, SparsePairs] | None
+	"""Sparse pair frequencies of the data, with the threshold used."""
+	__opened_index: NpVector
+	__key_automorphisms: list[NpVector] | None
 
-	def __init__(self):
-		super().__init__()
+	def __init__(
+		self,
+		anticipative: bool = False,
+		permutation_tables: str | None = None,
+		key_symmetries: Literal["detect"] | list[dict[int, int]] | None = None,
+		cache_size: int = 0,
+		precision: Precision = "float64",
+		rescore: int = 0,
+		sparse_threshold: float | None = None,
+	):
+		"""
+		If `anticipative` is `True`, layouts are scored with “anticipative scoring”
+		rather than “restricted scoring” (see `notes.md`):
+		each unassigned key is considered as simultaneously assigned to all unassigned characters.
+		The resulting interkey costs between assigned and unassigned keys
+		are precomputed as additional key costs, so that scoring is not slower.
+		(Constant terms, which do not depend on the assigned keys, are ignored.)\n
+		If a `permutation_tables` directory is provided, the permutation tables used by
+		`.opened_permutation_blocks(…)` are stored there, and memory-mapped by later runs
+		and by parallel workers.\n
+		With `key_symmetries`, `.opened_permutation_blocks(…)` only provides one permutation
+		per class of permutations that are equivalent through symmetries of the keys
+		(typically, mirroring both hands), as they have the same score.
+		Those symmetries are either found among the opened keys (`"detect"`),
+		or declared as mappings `{key: symmetric key}` (unlisted keys being left in place).
+		Only the symmetries leaving the current costs unchanged are used
+		(see `key_automorphisms(…)`).\n
+		With a positive `cache_size`, search results are cached (see `LayoutBuilder.__init__(…)`).
+		Adding costs clears the cache.\n
+		With a `precision` of `"float32"` or `"int32"` (fixed-point), `.score_many(…)`,
+		and thus the block sweeps of `.best_opened_permutation(…)`
+		and `.top_opened_permutations(…)`, use reduced-precision copies of the data
+		(see `PairSweep`), for less memory traffic per permutation.
+		Costs and frequencies are still stored in full precision, and `.score(…)` is exact:
+		the records of `.top_opened_permutations(…)` are re-scored with it, and with
+		a positive `rescore`, the block sweep of `.best_opened_permutation(…)` keeps that many
+		candidates, and returns the best of them once re-scored exactly.\n
+		With a `sparse_threshold`, `.score(…)` only visits the character pairs whose frequency
+		exceeds it in magnitude (see `SparsePairs`), rather than gathering all the pairs
+		of assigned characters: with large alphabets where most pairs are never observed,
+		scoring then depends on the number of observed pairs, rather than on *n*².
+		The pairs below a positive threshold are ignored by `.score(…)` only.
+		"""
+		super().__init__(cache_size)
 		self._costs_freqs_1d = []
 		self._costs_freqs_2d = []
+		self._costs_freqs_3d = []
+		self._corpora_1d = []
+		self._corpora_2d = []
+		self._corpora_3d = []
+		self.corpus_weights = {}
+		self.__data = None
+		self.__data_version = next(_data_versions)
+		self.__fixed_interactions = None
+		self.anticipative = anticipative
+		self.permutation_tables = permutation_tables
+		self.key_symmetries = key_symmetries
+		self.precision = precision
+		self.rescore = rescore
+		self.sparse_threshold = sparse_threshold
+		self.__sparse = None
+
+	@property
+	def anticipative(self) -> bool:
+		"""
+		Whether to use anticipative scoring rather than restricted scoring (see `notes.md`).
+		Changing it is taken into account by the next scoring.
+		"""
+		return self.__anticipative
+
+	@anticipative.setter
+	def anticipative(self, anticipative: bool) -> None:
+		self.__anticipative = anticipative
+		self._config_changed = True
+
+	@property
+	def key_symmetries(self) -> Literal["detect"] | list[dict[int, int]] | None:
+		"""
+		Key symmetries used to skip equivalent permutations (see `.__init__(…)`).
+		Changing it is taken into account by the next sweep.
+		"""
+		return self.__key_symmetries
+
+	@key_symmetries.setter
+	def key_symmetries(
+		self, key_symmetries: Literal["detect"] | list[dict[int, int]] | None
+	) -> None:
+		self.__key_symmetries = key_symmetries
+		self._config_changed = True
+
+	@property
+	def precision(self) -> Precision:
+		"""
+		Precision of the batched scoring of permutations (see `.__init__(…)`).
+		Changing it is taken into account by the next sweep.
+		"""
+		return self.__precision
+
+	@precision.setter
+	def precision(self, precision: Precision) -> None:
+		self.__precision = precision
+		self._config_changed = True
+
+	@property
+	def sparse_threshold(self) -> float | None:
+		"""
+		Threshold of the sparse scoring of pair frequencies, if used (see `.__init__(…)`).
+		Changing it is taken into account by the next scoring.
+		"""
+		return self.__sparse_threshold
+
+	@sparse_threshold.setter
+	def sparse_threshold(self, sparse_threshold: float | None) -> None:
+		self.__sparse_threshold = sparse_threshold
+		self._config_changed = True
 
 	def add_key_costs(
 		self,
 		key_costs: NpVector | NpArray1D | list[float],
 		char_frequencies: NpVector | NpArray1D | list[float],
+		corpus: str | None = None,
 	):
 		"""
-		Add a key costs matrix and its associated character frequencies.
+		Add a key costs matrix and its associated character frequencies,
+		possibly from a named `corpus` (see `.set_corpus_weights(…)`).
 		"""
 		key_costs = self.__as_vector(key_costs)
 		char_frequencies = self.__as_vector(char_frequencies)
-		self.__add_to_data(self._costs_freqs_1d, key_costs, char_frequencies)
+		self._costs_freqs_1d, self._corpora_1d = self.__add_to_data(
+			self._costs_freqs_1d, self._corpora_1d, key_costs, char_frequencies, corpus
+		)
 		self.__assert_compatible_sizes()
+		self.__data_changed()
 
 	def add_interkey_costs(
 		self,
 		interkey_costs: NpArray2D | list[list[float]],
-		char_pair_frequencies: NpArray2D | list[list[float]],
+		char_pair_frequencies: NpArray2D | list[list[float]] | SparsePairs,
+		corpus: str | None = None,
 	):
 		"""
-		Add an interkey costs matrix and its associated bigram frequencies.
+		Add an interkey costs matrix and its associated bigram frequencies,
+		which can be provided as sparse pairs of a single component (see `coo_pairs(…)`),
+		possibly from a named `corpus` (see `.set_corpus_weights(…)`).
 		"""
 		interkey_costs = self.__as_array(interkey_costs)
+		if isinstance(char_pair_frequencies, SparsePairs):
+			if char_pair_frequencies.shape[0] != 1:
+				raise ValueError("Expected the sparse pairs of a single component")
+			char_pair_frequencies = char_pair_frequencies.dense()[0]
 		char_pair_frequencies = self.__as_array(char_pair_frequencies)
-		self.__add_to_data(self._costs_freqs_2d, interkey_costs, char_pair_frequencies)
+		self._costs_freqs_2d, self._corpora_2d = self.__add_to_data(
+			self._costs_freqs_2d,
+			self._corpora_2d,
+			interkey_costs,
+			char_pair_frequencies,
+			corpus,
+		)
+		self.__assert_compatible_sizes()
+		self.__data_changed()
+
+	def add_trikey_costs(
+		self,
+		trikey_costs: NpArray | list[list[list[float]]],
+		trigram_frequencies: NpArray | list[list[list[float]]],
+		corpus: str | None = None,
+	):
+		"""
+		Add a trikey costs tensor (*n* × *n* × *n*) and its associated trigram frequencies
+		(*c* × *c* × *c*), possibly from a named `corpus` (see `.set_corpus_weights(…)`).\n
+		Trikey scores are split by the number of opened keys among the three keys
+		(see `TrikeySplit`), once per assignment change: only the trikey costs among
+		opened keys are gathered for each permutation.
+		They are not supported by the searches updating scores by swaps (the `"heap"`
+		and `"branch_and_bound"` methods, `.swap_scorer(…)`, `.local_search(…)`, and what
+		relies on them), and they are scored with restricted scoring, even if `anticipative`.
+		"""
+		trikey_costs = self.__as_array(trikey_costs, 3)
+		trigram_frequencies = self.__as_array(trigram_frequencies, 3)
+		self._costs_freqs_3d, self._corpora_3d = self.__add_to_data(
+			self._costs_freqs_3d,
+			self._corpora_3d,
+			trikey_costs,
+			trigram_frequencies,
+			corpus,
+		)
 		self.__assert_compatible_sizes()
+		self.__data_changed()
 
 	def score(self, open_chars_order: tuple[int, ...] = []) -> float:
 		self.__precompute_if_needed()
-		score = 0
 		chars = self.__fixed_chars + list(open_chars_order)
-		for costs, freqs in self.__costs_freqs_1d_current:
-			score += np.sum(costs * freqs[chars])
-		for costs, freqs in self.__costs_freqs_2d_current:
-			score += np.sum(costs * freqs[chars, :][:, chars])
-		return float(score)
+		if self.sparse_threshold is None:
+			score = self.__stacks.score(chars)
+		else:
+			sparse = self.__sparse_pairs()
+			score = self.__stacks.score_1d(chars) + sparse.score(
+				self.__stacks.costs_2d, chars
+			)
+		if self.__trikey_data is not None:
+			order = np.array(open_chars_order, dtype=np.intp).reshape(1, -1)
+			score += float(self.__trikey_split().score(self.__opened_index[order])[0])
+		return score
+
+	def set_corpus_weights(self, weights: dict[str | None, float]) -> None:
+		"""
+		Weight the frequencies of each corpus in the scores, without adding the data again:
+		`weights` gives the weight of each corpus (1 for unlisted ones, and for the frequencies
+		added without corpus, unless `None` is listed). The cache is cleared.
+		"""
+		self.corpus_weights = dict(weights)
+		self.__data_changed()
+
+	def corpus_scores(
+		self, open_chars_order: tuple[int, ...] = ()
+	) -> tuple[float, dict[str | None, float]]:
+		"""
+		Score the layout of `.score(…)` for each corpus (with restricted scoring),
+		all components of each order being scored by a single vectorized operation.
+		Returns the weighted total, and the unweighted score of each corpus.
+		"""
+		self.__precompute_if_needed()
+		keys = list(self._fixed.keys()) + self._opened_keys
+		data = self.__data
+		stacks = ScoringStacks(
+			data.costs_1d[:, keys],
+			data.freqs_1d,
+			data.costs_2d[:, keys, :][:, :, keys],
+			data.freqs_2d,
+		)
+		chars = self.__fixed_chars + list(open_chars_order)
+		scores_1d, scores_2d = stacks.component_scores(chars)
+		scores_3d = np.zeros(0)
+		if self.__trikey_data is not None:
+			costs_3d, freqs_3d = self.__trikey_data
+			layers = np.arange(costs_3d.shape[0])
+			scores_3d = np.einsum(
+				"mijk,mijk->m",
+				costs_3d[np.ix_(layers, keys, keys, keys)],
+				freqs_3d[np.ix_(layers, chars, chars, chars)],
+			)
+		scores = {}
+		for corpus, score in zip(
+			self._corpora_1d + self._corpora_2d + self._corpora_3d,
+			scores_1d.tolist() + scores_2d.tolist() + scores_3d.tolist(),
+		):
+			scores[corpus] = scores.get(corpus, 0.0) + score
+		total = sum(
+			self.corpus_weights.get(corpus, 1.0) * score
+			for corpus, score in scores.items()
+		)
+		return total, scores
+
+	def score_many(
+		self,
+		open_chars_orders: NpArray2D | list[tuple[int, ...]],
+		block_size: int = 4096,
+	) -> NpVector:
+		"""
+		Score many layouts at once, returning the vector of their scores.\n
+		Each row of `open_chars_orders` must be a permutation of the opened characters,
+		as it would be provided to `.score(…)` (otherwise, a `ValueError` is raised).
+		The score is split between a constant part for the fixed keys,
+		a linear part for each opened key with its character (including its interactions
+		with fixed keys), and the interactions among opened keys (see `FixedOpenSplit`).
+		Only the latter requires gathering frequency matrices, for the opened characters only.
+		The layouts are scored by blocks of (at most) `block_size` rows,
+		so that the gathered frequency matrices never exceed *m* × `block_size` × *n* × *n* values
+		(*m* interkey costs matrices being scored at once).
+		"""
+		split = self.__fixed_open_split()
+		trikey = self.__trikey_split() if self.__trikey_data is not None else None
+		orders = np.asarray(open_chars_orders, dtype=np.intp)
+		if orders.ndim != 2 or orders.shape[1] != len(self._opened_chars):
+			raise ValueError("Expected a 2D array of opened characters permutations")
+		n_opened = orders.shape[1]
+		positions = np.arange(n_opened)
+		# Indices within the opened characters, checked once as permutations of them
+		# (the split ignores repeated characters, and others would index from the end)
+		if orders.size and (orders.min() < 0 or orders.max() >= self.char_count()):
+			raise ValueError("Expected permutations of the opened characters")
+		indices = self.__opened_index[orders]
+		if n_opened < 63:
+			# Indices within `[0 .. n_opened[` are distinct ⇔ their bits sum to all bits set
+			valid = indices.min(initial=0) >= 0 and np.all(
+				np.sum(1 << indices, axis=1) == (1 << n_opened) - 1
+			)
+		else:
+			valid = np.all(np.sort(indices, axis=1) == positions)
+		if not valid:
+			raise ValueError("Expected permutations of the opened characters")
+		scores = np.full(orders.shape[0], split.constant)
+		for start in range(0, orders.shape[0], block_size):
+			block = indices[start : start + block_size]
+			block_scores = scores[start : start + block_size]
+			block_scores += np.sum(split.linear[positions, block], axis=1)
+			# Flat indices of the character pairs, for a single gather along one axis
+			pairs = block[:, :, np.newaxis] * n_opened + block[:, np.newaxis, :]
+			block_scores += self.__sweep.score(
+				pairs.reshape(block.shape[0], n_opened * n_opened)
+			)
+			if trikey is not None:
+				block_scores += trikey.score(block)
+		return scores
+
+	def best_opened_permutation(
+		self,
+		block_size: int = 4096,
+		workers: int | None = 1,
+		prefix: tuple[int, ...] = (),
+		method: Literal["blocks", "heap", "branch_and_bound"] = "blocks",
+		progress: SweepProgress | None = None,
+	) -> tuple[float, tuple[int, ...]]:
+		"""
+		Find the permutation of the opened characters with the highest score.
+		Returns the score and the permutation (in the format of `.opened_permutations()`).\n
+		The `method` used to go through the permutations can be:
+		- `"blocks"` (default): Permutations are scored by blocks of `block_size`,
+		  possibly by parallel `workers`, and only those starting with `prefix` are considered
+		  (see `LayoutBuilder.best_opened_permutation(…)`, also for `progress`).
+		- `"heap"`: Permutations are visited in the order of Heap's algorithm,
+		  each score being updated from the previous one (see `.scored_opened_permutations()`),
+		  for a fraction of the cost of `.score(…)` (see `SwapScorer`). Exhaustive sweeps
+		  are still faster by `"blocks"`, which amortize the Python overhead over whole blocks.
+		- `"branch_and_bound"`: Opened keys are assigned one at a time, pruning the partial
+		  assignments that cannot beat the best score found so far (see `BranchAndBound`).
+		  The best score is the same as with other methods, but in case of ties,
+		  the returned permutation can differ.\n
+		Only the `"blocks"` method tracks its `progress`: other methods are run from the start.
+		"""
+		if method == "blocks":
+			if self.precision != "float64" and self.rescore > 0:
+				return self.top_opened_permutations(
+					1, block_size, workers, prefix, progress
+				)[0]
+			return super().best_opened_permutation(
+				block_size, workers, prefix, progress
+			)
+		if method == "heap":
+			return self._cached_search(("heap",), self.__best_heap_permutation)
+		if method == "branch_and_bound":
+			return self._cached_search(
+				("branch_and_bound",), self.__best_branch_and_bound_permutation
+			)
+		raise ValueError(f"Unknown method “{method}”.")
+
+	def top_opened_permutations(
+		self,
+		k: int,
+		block_size: int = 4096,
+		workers: int | None = 1,
+		prefix: tuple[int, ...] = (),
+		progress: SweepProgress | None = None,
+	) -> list[tuple[float, tuple[int, ...]]]:
+		"""
+		Find the `k` permutations of the opened characters with the highest scores
+		(see `LayoutBuilder.top_opened_permutations(…)`).\n
+		With a reduced `precision`, the (at least `rescore`) best candidates of the sweep
+		are re-scored exactly, and the `k` best of them are returned.
+		"""
+		if self.precision == "float64":
+			return super().top_opened_permutations(
+				k, block_size, workers, prefix, progress
+			)
+		candidates = super().top_opened_permutations(
+			max(k, self.rescore), block_size, workers, prefix, progress
+		)
+		rescored = [(self.score(perm), perm) for _, perm in candidates]
+		return sorted(rescored, key=lambda record: -record[0])[:k]
+
+	def _cache_key(self, search: tuple) -> tuple:
+		return super()._cache_key(search) + (
+			self.anticipative,
+			repr(self.key_symmetries),
+			self.precision,
+			self.rescore,
+			self.sparse_threshold,
+			self.__data_version,
+		)
+
+	def fork(self) -> Self:
+		"""
+		Provide a copy of the builder, to be modified independently
+		(see `LayoutBuilder.fork()`). The scoring data and the stacked data are shared,
+		only the interactions with the fixed keys, updated as keys are fixed, are copied.
+		"""
+		forked = super().fork()
+		if self.__fixed_interactions is not None:
+			forked.__fixed_interactions = self.__fixed_interactions.fork()
+		return forked
+
+	def save(self, directory: str) -> None:
+		"""
+		Save a snapshot of the builder in `directory`, to be restored by `.load(…)`:
+		each costs and frequencies array as a `.npy` file, and the options, the corpora
+		and the assignment state (fixed assignment, opened keys and characters) in
+		`manifest.json`. The search cache is not saved.\n
+		The array files are named with a token unique to each save, and the manifest
+		referencing them is written last (aside then renamed), so that an interrupted save
+		leaves the previous snapshot whole. A save failing with an exception removes
+		the files it wrote. Once the new manifest is in place, the array files
+		it does not reference (from previous or interrupted saves) are removed.
+		"""
+		os.makedirs(directory, exist_ok=True)
+		token = uuid.uuid4().hex
+		path = os.path.join(directory, "manifest.json")
+		temporary_path = f"{path}.{os.getpid()}.tmp"
+		written = set()
+		try:
+			data = {}
+			for ndim, costs_freqs, corpora in (
+				(1, self._costs_freqs_1d, self._corpora_1d),
+				(2, self._costs_freqs_2d, self._corpora_2d),
+				(3, self._costs_freqs_3d, self._corpora_3d),
+			):
+				data[ndim] = []
+				for i, ((costs, freqs), corpus) in enumerate(zip(costs_freqs, corpora)):
+					files = {}
+					for kind, array in (("costs", costs), ("freqs", freqs)):
+						files[kind] = f"{kind}_{ndim}d_{i}_{token}.npy"
+						written.add(files[kind])
+						np.save(os.path.join(directory, files[kind]), array)
+					data[ndim].append({**files, "corpus": corpus})
+			with open(temporary_path, "w") as file:
+				json.dump(self.__manifest(data), file)
+			os.replace(temporary_path, path)
+		except BaseException:
+			# The previous snapshot is left as it was, without the files of this save
+			for name in written | {os.path.basename(temporary_path)}:
+				if os.path.exists(os.path.join(directory, name)):
+					os.remove(os.path.join(directory, name))
+			raise
+		for name in os.listdir(directory):
+			if _SNAPSHOT_ARRAY.fullmatch(name) and name not in written:
+				os.remove(os.path.join(directory, name))
+
+	def __manifest(self, data: dict[int, list[dict]]) -> dict:
+		# JSON-serializable, the assignment and options possibly holding numpy integers
+		key_symmetries = self.key_symmetries
+		if isinstance(key_symmetries, list):
+			key_symmetries = [
+				[[int(k), int(image)] for k, image in mapping.items()]
+				for mapping in key_symmetries
+			]
+		return {
+			"format": _SNAPSHOT_FORMAT,
+			"options": {
+				"anticipative": self.anticipative,
+				"permutation_tables": self.permutation_tables,
+				"key_symmetries": key_symmetries,
+				"cache_size": self.cache.size if self.cache is not None else 0,
+				"precision": self.precision,
+				"rescore": self.rescore,
+				"sparse_threshold": self.sparse_threshold,
+			},
+			"data": data,
+			"corpus_weights": [
+				[corpus, float(weight)]
+				for corpus, weight in self.corpus_weights.items()
+			],
+			"fixed": [[int(k), int(c)] for k, c in self._fixed.items()],
+			"opened_keys": [int(k) for k in self._opened_keys],
+			"opened_chars": [int(c) for c in self._opened_chars],
+		}
+
+	@classmethod
+	def load(cls, directory: str, mmap: bool = False) -> Self:
+		"""
+		Restore a builder from the snapshot saved in `directory` by `.save(…)`,
+		without validating nor merging the data again.
+		If `mmap` is `True`, the arrays are memory-mapped (read-only) rather than read,
+		so that parallel workers share the same pages.
+		"""
+		with open(os.path.join(directory, "manifest.json")) as file:
+			manifest = json.load(file)
+		if manifest["format"] != _SNAPSHOT_FORMAT:
+			raise ValueError(f"Unknown snapshot format “{manifest['format']}”.")
+		options = manifest["options"]
+		if isinstance(options["key_symmetries"], list):
+			options["key_symmetries"] = [
+				dict(mapping) for mapping in options["key_symmetries"]
+			]
+		builder = cls(**options)
+		mmap_mode = "r" if mmap else None
+		# JSON object keys being strings, the data is indexed by "1", "2" and "3"
+		data = {}
+		for ndim, items in manifest["data"].items():
+			costs_freqs = [
+				(
+					np.load(
+						os.path.join(directory, item["costs"]), mmap_mode=mmap_mode
+					),
+					np.load(
+						os.path.join(directory, item["freqs"]), mmap_mode=mmap_mode
+					),
+				)
+				for item in items
+			]
+			data[ndim] = costs_freqs, [item["corpus"] for item in items]
+		builder._costs_freqs_1d, builder._corpora_1d = data["1"]
+		builder._costs_freqs_2d, builder._corpora_2d = data["2"]
+		builder._costs_freqs_3d, builder._corpora_3d = data["3"]
+		builder.corpus_weights = dict(map(tuple, manifest["corpus_weights"]))
+		builder.fix(
+			[key for key, _ in manifest["fixed"]],
+			[char for _, char in manifest["fixed"]],
+		)
+		builder.open(manifest["opened_keys"], manifest["opened_chars"])
+		builder.__data_changed()
+		return builder
+
+	def swap_scorer(self, open_chars_order: tuple[int, ...] = ()) -> SwapScorer:
+		"""
+		Provide a `SwapScorer` for the layout defined by the fixed assignment
+		and by `open_chars_order` for the opened keys, as it would be scored by `.score(…)`.
+		Its positions are the fixed keys (in the order of `._fixed`), then the opened keys.
+		"""
+		self.__assert_no_trikey_costs("Swap scoring")
+		self.__precompute_if_needed()
+		return SwapScorer(self.__stacks, self.__fixed_chars + list(open_chars_order))
+
+	def local_search(self, open_chars_order: tuple[int, ...] = ()) -> LocalSearch:
+		"""
+		Provide a `LocalSearch` from the layout defined by the fixed assignment
+		and by `open_chars_order` for the opened keys, as it would be scored by `.score(…)`.
+		Its positions are the fixed keys (in the order of `._fixed`), then the opened keys.
+		"""
+		self.__assert_no_trikey_costs("Local search")
+		self.__precompute_if_needed()
+		return LocalSearch(self.__stacks, self.__fixed_chars + list(open_chars_order))
+
+	def improve_by_swaps(
+		self,
+		keys: Iterable[int] | None = None,
+		strategy: Literal["best", "first"] = "best",
+		max_swaps: int | None = None,
+	) -> float:
+		"""
+		Improve the fixed assignment by swapping characters between keys,
+		until no swap improves the score (see `LocalSearch.run(…)`), and return the final score.\n
+		Only the characters of the fixed `keys` are swapped (default: all fixed keys).
+		Any previously opened key or character is closed.
+		Compared with the optimal fill of groups of keys, each step considers all the swaps
+		of the layout at once, for O(*n*²) operations.
+		"""
+		self.close()
+		search = self.local_search()
+		fixed_keys = list(self._fixed)
+		positions = None
+		if keys is not None:
+			positions = [fixed_keys.index(k) for k in keys if k in self._fixed]
+		score = search.run(strategy, positions, max_swaps)
+		self.fix(fixed_keys, [int(c) for c in search.chars])
+		return score
+
+	def anneal(
+		self,
+		keys: Iterable[int] | None = None,
+		max_steps: int = 100_000,
+		time_budget: float | None = None,
+		seed: int | None = None,
+		**schedule_options,
+	) -> float:
+		"""
+		Improve the fixed assignment by simulated annealing (see `SimulatedAnnealing`),
+		fix the best layout met, and return its score.\n
+		Only the characters of the fixed `keys` are swapped (default: all fixed keys).
+		The run lasts `max_steps` steps, or `time_budget` seconds,
+		with random draws seeded by `seed`.
+		`schedule_options` are passed to `SimulatedAnnealing.run(…)`.
+		Any previously opened key or character is closed.
+		"""
+		self.close()
+		fixed_keys = list(self._fixed)
+		positions = None
+		if keys is not None:
+			positions = [fixed_keys.index(k) for k in keys if k in self._fixed]
+		annealing = SimulatedAnnealing(self.swap_scorer(), positions, seed)
+		score = annealing.run(max_steps, time_budget, **schedule_options)
+		self.fix(fixed_keys, [int(c) for c in annealing.best_chars])
+		return score
+
+	def scored_opened_permutations(self) -> Iterator[tuple[float, tuple[int, ...]]]:
+		"""
+		Provide all the permutations of opened characters with their scores, as `(score, permutation)`,
+		in the order of `.opened_permutations("heap")`.
+		As successive permutations differ by a single swap, each score is obtained by updating
+		the previous one, which only involves the rows and columns of the swapped keys.
+		"""
+		scorer = self.swap_scorer(self._opened_chars)
+		offset = len(self._fixed)
+		yield scorer.score, tuple(self._opened_chars)
+		for i, j in heap_swaps(len(self._opened_chars)):
+			scorer.swap(offset + i, offset + j)
+			yield scorer.score, tuple(int(c) for c in scorer.chars[offset:])
+
+	def key_count(self) -> int:
+		for costs, _ in (
+			self._costs_freqs_1d + self._costs_freqs_2d + self._costs_freqs_3d
+		):
+			return costs.shape[0]
+		return 0
+
+	def char_count(self) -> int:
+		for _, freqs in (
+			self._costs_freqs_1d + self._costs_freqs_2d + self._costs_freqs_3d
+		):
+			return freqs.shape[0]
+		return 0
+
+	def opened_permutation_blocks(
+		self, block_size: int = 4096, prefix: tuple[int, ...] = ()
+	) -> Iterable[NpArray2D]:
+		"""
+		Provide all the permutations of opened characters, as given by `.opened_permutations()`,
+		grouped in 2D arrays of (at most) `block_size` rows.\n
+		The blocks are gathered from slices of a cached table of index permutations
+		(see `permutation_table(…)`), rather than built from tuples.
+		With `key_symmetries`, only the lexicographically smallest permutation of each class
+		of equivalent permutations is kept (see `symmetry_representatives(…)`),
+		so that blocks can be smaller.
+		"""
+		automorphisms = self.__symmetries()
+		n_opened = len(self._opened_chars)
+		table = permutation_table(n_opened, self.permutation_tables)
+		start, stop = prefix_range(
+			n_opened, tuple(self._opened_chars.index(c) for c in prefix)
+		)
+		chars = np.array(self._opened_chars, dtype=np.intp)
+		for block_start in range(start, stop, block_size):
+			block = table[block_start : min(block_start + block_size, stop)]
+			if automorphisms:
+				block = block[symmetry_representatives(block, automorphisms)]
+				if block.shape[0] == 0:
+					continue
+			yield chars[block]
+
+	def __best_heap_permutation(self) -> tuple[float, tuple[int, ...]]:
+		scorer = self.swap_scorer(self._opened_chars)
+		offset = len(self._fixed)
+		best_score = scorer.score
+		best_chars = scorer.chars.copy()
+		for i, j in heap_swaps(len(self._opened_chars)):
+			if scorer.swap(offset + i, offset + j) > best_score:
+				best_score = scorer.score
+				best_chars[:] = scorer.chars
+		best_order = tuple(int(c) for c in best_chars[offset:])
+		# Rescore from scratch, as successive updates can accumulate rounding errors
+		return self.score(best_order), best_order
+
+	def __best_branch_and_bound_permutation(self) -> tuple[float, tuple[int, ...]]:
+		self.__assert_no_trikey_costs("Branch and bound")
+		search = BranchAndBound(self.__fixed_open_split(), self._opened_chars)
+		_, best_order = search.solve()
+		return self.score(best_order), best_order
 
 	@staticmethod
 	def __as_vector(data: NpVector | NpArray1D | list[float]) -> NpVector:
@@ -69,27 +783,36 @@ class MatrixBasedLayoutBuilder(LayoutBuilder):
 		return data
 
 	@staticmethod
-	def __as_array(data: NpArray2D | list[list[float]]) -> NpVector:
+	def __as_array(data: NpArray | list, ndim: int = 2) -> NpArray:
 		original = True
 		if not isinstance(data, np.ndarray):
 			data = np.array(data)
 			original = False
-		if data.ndim == 2:
+		if data.ndim == ndim:
 			return np.copy(data) if original else data
-		raise ValueError("Expected a 2D array")
+		raise ValueError(f"Expected a {ndim}D array")
 
 	@staticmethod
 	def __add_to_data(
-		data: list[tuple[T_NpData, T_NpData]], costs: T_NpData, frequencies: T_NpData
-	):
-		for d_costs, d_freqs in data:
+		data: list[tuple[T_NpData, T_NpData]],
+		corpora: list[str | None],
+		costs: T_NpData,
+		frequencies: T_NpData,
+		corpus: str | None,
+	) -> tuple[list[tuple[T_NpData, T_NpData]], list[str | None]]:
+		# New lists and arrays rather than in-place updates, as forks share the data.
+		# Only items of the same corpus are merged, so that corpora can be weighted.
+		for i, (d_costs, d_freqs) in enumerate(data):
+			if corpora[i] != corpus:
+				continue
 			if np.array_equal(d_freqs, frequencies):
-				d_costs += costs
-				return
+				return data[:i] + [(d_costs + costs, d_freqs)] + data[i + 1 :], corpora
 			if np.array_equal(d_costs, costs):
-				d_freqs += frequencies
-				return
-		data.append((np.copy(costs), np.copy(frequencies)))
+				return (
+					data[:i] + [(d_costs, d_freqs + frequencies)] + data[i + 1 :],
+					corpora,
+				)
+		return data + [(np.copy(costs), np.copy(frequencies))], corpora + [corpus]
 
 	def __assert_compatible_sizes(self) -> None:
 		n_costs: None | int = None
@@ -110,6 +833,26 @@ class MatrixBasedLayoutBuilder(LayoutBuilder):
 				raise ValueError("Mismatch in cost matrix sizes.")
 			if freqs.shape != (n_freqs, n_freqs):
 				raise ValueError("Mismatch in frequency n_freqs sizes.")
+		for costs, freqs in self._costs_freqs_3d:
+			if n_costs is None:
+				n_costs = costs.shape[0]
+				n_freqs = freqs.shape[0]
+			if costs.shape != (n_costs,) * 3:
+				raise ValueError("Mismatch in cost tensor sizes.")
+			if freqs.shape != (n_freqs,) * 3:
+				raise ValueError("Mismatch in frequency tensor sizes.")
+
+	def __assert_no_trikey_costs(self, feature: str) -> None:
+		if self._costs_freqs_3d:
+			raise ValueError(f"{feature} does not support trikey costs.")
+
+	def __data_changed(self) -> None:
+		self.__data = None
+		self.__data_version = next(_data_versions)
+		self.__sparse = None
+		self._config_changed = True
+		if self.cache is not None:
+			self.cache.clear()
 
 	def __precompute_if_needed(self) -> None:
 		if self._config_changed:
@@ -117,11 +860,169 @@ class MatrixBasedLayoutBuilder(LayoutBuilder):
 			self._config_changed = False
 
 	def __precompute(self) -> None:
+		if self.__data is None:
+			# All pairs stacked (once per data change),
+			# so that each scoring is a single vectorized operation
+			self.__data = stack_costs_freqs(
+				self._costs_freqs_1d,
+				self._costs_freqs_2d,
+				self.key_count(),
+				self.char_count(),
+			)
+			self.__weights = self.__component_weights()
+			costs_2d = self.__data.costs_2d
+			if self.__weights is not None:
+				costs_2d = costs_2d * self.__weights[1][:, np.newaxis, np.newaxis]
+			self.__fixed_interactions = FixedInteractions(
+				costs_2d, self.__data.freqs_2d
+			)
+			self.__trikey_data = None
+			if self._costs_freqs_3d:
+				self.__trikey_data = (
+					np.stack([costs for costs, _ in self._costs_freqs_3d]),
+					np.stack([freqs for _, freqs in self._costs_freqs_3d]),
+				)
 		keys = list(self._fixed.keys()) + self._opened_keys
-		self.__costs_freqs_1d_current = [
-			(costs[keys], freqs) for costs, freqs in self._costs_freqs_1d
-		]
-		self.__costs_freqs_2d_current = [
-			(costs[keys, :][:, keys], freqs) for costs, freqs in self._costs_freqs_2d
-		]
 		self.__fixed_chars = list(self._fixed.values())
+		costs_1d = self.__data.costs_1d[:, keys]
+		freqs_1d = self.__data.freqs_1d
+		costs_2d = self.__data.costs_2d[:, keys, :][:, :, keys]
+		if self.__weights is not None:
+			# Corpus weights applied to the (reduced) costs, the frequencies being shared
+			costs_1d = costs_1d * self.__weights[0][:, np.newaxis]
+			costs_2d = costs_2d * self.__weights[1][:, np.newaxis, np.newaxis]
+		if self.anticipative and (extra := self.__anticipative_costs_freqs(keys)):
+			costs_1d = np.concatenate((costs_1d, [costs for costs, _ in extra]))
+			freqs_1d = np.concatenate((freqs_1d, [freqs for _, freqs in extra]))
+		if self.sparse_threshold is not None:
+			# Chained fancy indexing leaves the components axis innermost,
+			# which suits the dense gathers, but not the flat indices of sparse scoring
+			costs_2d = np.ascontiguousarray(costs_2d)
+		self.__stacks = ScoringStacks(
+			costs_1d, freqs_1d, costs_2d, self.__data.freqs_2d
+		)
+		if self.__trikey_data is not None:
+			costs_3d = self.__trikey_data[0]
+			layers = np.arange(costs_3d.shape[0])
+			costs_3d = costs_3d[np.ix_(layers, keys, keys, keys)]
+			if self.__weights is not None:
+				costs_3d = (
+					costs_3d * self.__weights[2][:, np.newaxis, np.newaxis, np.newaxis]
+				)
+			self.__trikey_costs = costs_3d
+		self.__opened_index = np.full(self.char_count(), -1, dtype=np.intp)
+		self.__opened_index[self._opened_chars] = np.arange(len(self._opened_chars))
+		self.__split = None
+		self.__trikey = None
+		self.__key_automorphisms = None
+
+	def __component_weights(self) -> tuple[NpVector, NpVector, NpVector] | None:
+		weights = [
+			[self.corpus_weights.get(corpus, 1.0) for corpus in corpora]
+			for corpora in (self._corpora_1d, self._corpora_2d, self._corpora_3d)
+		]
+		if all(
+			weight == 1.0
+			for component_weights in weights
+			for weight in component_weights
+		):
+			return None
+		return tuple(
+			np.array(component_weights, dtype=float) for component_weights in weights
+		)
+
+	def __trikey_split(self) -> TrikeySplit:
+		if self.__trikey is None:
+			self.__trikey = split_trikey(
+				self.__trikey_costs,
+				self.__trikey_data[1],
+				self.__fixed_chars,
+				self._opened_chars,
+			)
+		return self.__trikey
+
+	def __sparse_pairs(self) -> SparsePairs:
+		# Once per data change and threshold
+		if self.__sparse is None or self.__sparse[0] != self.sparse_threshold:
+			self.__sparse = (
+				self.sparse_threshold,
+				sparse_pairs(self.__data.freqs_2d, self.sparse_threshold),
+			)
+		return self.__sparse[1]
+
+	def __fixed_open_split(self) -> FixedOpenSplit:
+		self.__precompute_if_needed()
+		if self.__split is None:
+			# Interactions with the fixed keys, only updated for the keys fixed or unfixed
+			# since the last split
+			interactions = self.__fixed_interactions
+			interactions.update(self._fixed)
+			cross = interactions.cross[np.ix_(self._opened_keys, self._opened_chars)]
+			self.__split = split_fixed_opened(
+				self.__stacks,
+				self.__fixed_chars,
+				self._opened_chars,
+				(interactions.constant, cross),
+			)
+			self.__sweep = pair_sweep(self.__split, self.precision)
+		return self.__split
+
+	def __symmetries(self) -> list[NpVector]:
+		if self.key_symmetries is None:
+			return []
+		self.__precompute_if_needed()
+		if self.__key_automorphisms is None:
+			n_fixed = len(self._fixed)
+			if self.key_symmetries == "detect":
+				automorphisms = key_automorphisms(self.__stacks, n_fixed)
+			else:
+				automorphisms = [
+					permutation
+					for permutation in map(
+						self.__opened_permutation, self.key_symmetries
+					)
+					if permutation is not None
+					and is_key_automorphism(self.__stacks, n_fixed, permutation)
+				]
+			if self.__trikey_data is not None:
+				automorphisms = [
+					permutation
+					for permutation in automorphisms
+					if is_trikey_automorphism(self.__trikey_costs, n_fixed, permutation)
+				]
+			self.__key_automorphisms = automorphisms
+		return self.__key_automorphisms
+
+	def __opened_permutation(self, key_mapping: dict[int, int]) -> NpVector | None:
+		# Declared key mapping, as a permutation of the opened positions (if it is one)
+		if any(key_mapping.get(k, k) != k for k in self._fixed):
+			return None
+		images = [key_mapping.get(k, k) for k in self._opened_keys]
+		if sorted(images) != sorted(self._opened_keys):
+			return None
+		return np.array([self._opened_keys.index(k) for k in images], dtype=np.intp)
+
+	def __anticipative_costs_freqs(
+		self, keys: list[int]
+	) -> list[tuple[NpVector, NpVector]]:
+		# Interkey costs between assigned keys (`keys`) and unassigned keys, as key costs:
+		# c⁰_k = Σ_{h unassigned} c_{k,h} with f⁰_i = mean_{j unassigned} f_{i,j},
+		# c¹_h = Σ_{k unassigned} c_{k,h} with f¹_j = mean_{i unassigned} f_{i,j}.
+		unassigned_keys = np.ones(self.key_count(), dtype=bool)
+		unassigned_keys[keys] = False
+		unassigned_chars = np.ones(self.char_count(), dtype=bool)
+		unassigned_chars[self.__fixed_chars + self._opened_chars] = False
+		if not np.any(unassigned_keys) or not np.any(unassigned_chars):
+			return []
+		costs_freqs = []
+		weights = [self.corpus_weights.get(corpus, 1.0) for corpus in self._corpora_2d]
+		for (costs, freqs), weight in zip(self._costs_freqs_2d, weights):
+			if weight != 1.0:
+				costs = costs * weight
+			costs_0 = np.sum(costs[keys, :][:, unassigned_keys], axis=1)
+			freqs_0 = np.mean(freqs[:, unassigned_chars], axis=1)
+			costs_1 = np.sum(costs[unassigned_keys, :][:, keys], axis=0)
+			freqs_1 = np.mean(freqs[unassigned_chars, :], axis=0)
+			costs_freqs.append((costs_0, freqs_0))
+			costs_freqs.append((costs_1, freqs_1))
+		return costs_freqs
@@ -0,0 +1,60 @@
+from typing import Literal, NamedTuple
+from local_types import NpArray, NpArray2D, NpVector
+from fixed_open_split import FixedOpenSplit
+import numpy as np
+
+Precision = Literal["float64", "float32", "int32"]
+
+
+class PairSweep(NamedTuple):
+	"""
+	Interactions among opened keys (see `FixedOpenSplit`), flattened to *m* × *u*² arrays
+	(*u* opened keys) and stored in the precision used to score many permutations at once:
+	- `"float64"`: As is.
+	- `"float32"`: Half the bytes gathered and summed per permutation, for about 7 significant digits.
+	- `"int32"`: Fixed-point values, each component being scaled so that its largest magnitude
+	  is 2**`bits` - 1. Products are summed as 64-bit integers, then scaled back by `weights`.
+	"""
+
+	costs: NpArray2D
+	freqs: NpArray2D
+	weights: NpVector | None
+	"""For fixed-point values, factor turning the summed products of each component into scores."""
+
+	def score(self, pairs: NpArray2D) -> NpVector:
+		"""
+		Score the interactions among opened keys of *p* permutations, given by the flat indices
+		`pairs` (*p* × *u*²) of the frequencies of their character pairs,
+		i.e. `i * u + j` for the characters (indices within the opened characters) of keys *k*, *h*.
+		"""
+		gathered = np.take(self.freqs, pairs, axis=1)
+		if self.weights is None:
+			return np.einsum("mpk,mk->p", gathered, self.costs)
+		summed = np.einsum("mpk,mk->mp", gathered, self.costs, dtype=np.int64)
+		return self.weights @ summed
+
+
+def pair_sweep(
+	split: FixedOpenSplit, precision: Precision = "float64", bits: int = 20
+) -> PairSweep:
+	"""
+	Provide the interactions among opened keys of `split` in the given `precision`.
+	"""
+	m, n_opened = split.open_costs.shape[:2]
+	costs = split.open_costs.reshape(m, n_opened * n_opened)
+	freqs = split.open_freqs.reshape(m, n_opened * n_opened)
+	if precision == "float64":
+		return PairSweep(costs, freqs, None)
+	if precision == "float32":
+		return PairSweep(costs.astype(np.float32), freqs.astype(np.float32), None)
+	if precision == "int32":
+		costs, costs_scales = _quantize(costs, bits)
+		freqs, freqs_scales = _quantize(freqs, bits)
+		return PairSweep(costs, freqs, 1 / (costs_scales * freqs_scales))
+	raise ValueError(f"Unknown precision “{precision}”.")
+
+
+def _quantize(array: NpArray2D, bits: int) -> tuple[NpArray, NpVector]:
+	peaks = np.max(np.abs(array), axis=1, initial=0.0)
+	scales = (2**bits - 1) / np.where(peaks > 0, peaks, 2**bits - 1)
+	return np.rint(array * scales[:, np.newaxis]).astype(np.int32), scales
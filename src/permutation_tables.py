@@ -0,0 +1,66 @@
+from math import factorial
+import os
+from local_types import NpArray2D
+import numpy as np
+
+_tables: dict[tuple[int, str | None], NpArray2D] = {}
+
+
+def permutation_table(k: int, directory: str | None = None) -> NpArray2D:
+	"""
+	Provide all the permutations of `[0 .. k[`, in lexicographic order
+	(as given by `itertools.permutations(range(k))`), as a read-only *k*! × *k* array of `uint8`.\n
+	The table is generated once per process.
+	If a `directory` is provided, the table is also stored there as a `.npy` file on first use,
+	and later memory-mapped rather than generated, so that processes share the same pages.
+	(For scale: 40 320 × 8 bytes for *k* = 8, 3 628 800 × 10 bytes for *k* = 10.)
+	"""
+	table = _tables.get((k, directory))
+	if table is None:
+		if directory is None:
+			table = _generate(k)
+			table.flags.writeable = False
+		else:
+			table = _load_or_store(k, directory)
+		_tables[(k, directory)] = table
+	return table
+
+
+def prefix_range(k: int, prefix: tuple[int, ...]) -> tuple[int, int]:
+	"""
+	Provide the range `[start .. stop[` of the rows of `permutation_table(k)`
+	starting with the elements of `prefix`.
+	(In lexicographic order, those permutations are contiguous.)
+	"""
+	start = 0
+	left = list(range(k))
+	for i, element in enumerate(prefix):
+		start += left.index(element) * factorial(k - 1 - i)
+		left.remove(element)
+	return start, start + factorial(k - len(prefix))
+
+
+def _generate(k: int) -> NpArray2D:
+	# Permutations of [0 .. n[ from those of [0 .. n-1[: for each first element,
+	# the others are shifted above it, which keeps the lexicographic order.
+	table = np.zeros((1, 0), dtype=np.uint8)
+	for n in range(1, k + 1):
+		sub = table
+		table = np.empty((factorial(n), n), dtype=np.uint8)
+		for first in range(n):
+			block = table[first * sub.shape[0] : (first + 1) * sub.shape[0]]
+			block[:, 0] = first
+			block[:, 1:] = sub + (sub >= first)
+	return table
+
+
+def _load_or_store(k: int, directory: str) -> NpArray2D:
+	path = os.path.join(directory, f"permutations_{k}.npy")
+	if not os.path.exists(path):
+		os.makedirs(directory, exist_ok=True)
+		# Written aside then renamed, so that concurrent processes never read a partial file
+		temporary_path = f"{path}.{os.getpid()}.tmp"
+		with open(temporary_path, "wb") as file:
+			np.save(file, _generate(k))
+		os.replace(temporary_path, path)
+	return np.load(path, mmap_mode="r")
@@ -0,0 +1,71 @@
+from typing import NamedTuple
+from local_types import NpVector, NpArray, NpArray2D
+import numpy as np
+
+
+class ScoringStacks(NamedTuple):
+	"""
+	Costs and frequencies of all scoring components, stacked along a first axis,
+	so that all components are scored at once.
+	"""
+
+	costs_1d: NpArray2D
+	"""Key costs, sized *m₁* × *n* (*n* keys)."""
+	freqs_1d: NpArray2D
+	"""Character frequencies, sized *m₁* × *c* (*c* characters)."""
+	costs_2d: NpArray
+	"""Interkey costs, sized *m₂* × *n* × *n*."""
+	freqs_2d: NpArray
+	"""Character pair frequencies, sized *m₂* × *c* × *c*."""
+
+	def score(self, chars: NpVector | list[int]) -> float:
+		"""
+		Score the layout assigning `chars[k]` to key `k`.
+		"""
+		score = np.einsum(
+			"mij,mij->", self.costs_2d, self.freqs_2d[:, chars, :][:, :, chars]
+		)
+		return self.score_1d(chars) + float(score)
+
+	def component_scores(
+		self, chars: NpVector | list[int]
+	) -> tuple[NpVector, NpVector]:
+		"""
+		Score each component separately, for the layout assigning `chars[k]` to key `k`.
+		Returns the scores of the *m₁* key costs, and of the *m₂* interkey costs.
+		"""
+		scores_1d = np.einsum("mi,mi->m", self.costs_1d, self.freqs_1d[:, chars])
+		scores_2d = np.einsum(
+			"mij,mij->m", self.costs_2d, self.freqs_2d[:, chars, :][:, :, chars]
+		)
+		return scores_1d, scores_2d
+
+	def score_1d(self, chars: NpVector | list[int]) -> float:
+		"""
+		Score the key costs only, for the layout assigning `chars[k]` to key `k`.
+		"""
+		return float(np.einsum("mi,mi->", self.costs_1d, self.freqs_1d[:, chars]))
+
+
+def stack_costs_freqs(
+	costs_freqs_1d: list[tuple[NpVector, NpVector]],
+	costs_freqs_2d: list[tuple[NpArray2D, NpArray2D]],
+	n_keys: int,
+	n_chars: int,
+) -> ScoringStacks:
+	"""
+	Stack pairs of (key costs, char frequencies) and of (interkey costs, char pair frequencies),
+	for `n_keys` keys and `n_chars` characters.
+	"""
+	return ScoringStacks(
+		_stack([costs for costs, _ in costs_freqs_1d], (n_keys,)),
+		_stack([freqs for _, freqs in costs_freqs_1d], (n_chars,)),
+		_stack([costs for costs, _ in costs_freqs_2d], (n_keys, n_keys)),
+		_stack([freqs for _, freqs in costs_freqs_2d], (n_chars, n_chars)),
+	)
+
+
+def _stack(arrays: list[NpArray], shape: tuple[int, ...]) -> NpArray:
+	if not arrays:
+		return np.zeros((0,) + shape)
+	return np.stack(arrays)
@@ -0,0 +1,48 @@
+from typing import Callable, Hashable, TypeVar
+from collections import OrderedDict
+
+T = TypeVar("T")
+
+
+class SearchCache:
+	"""
+	Cache of search results, keyed by the configuration searched,
+	keeping only the `size` most recently used ones (LRU eviction).
+	"""
+
+	size: int
+	hits: int
+	"""Number of results found in the cache."""
+	misses: int
+	"""Number of results computed, as not found in the cache."""
+	__entries: OrderedDict[Hashable, object]
+
+	def __init__(self, size: int = 128) -> None:
+		self.size = size
+		self.hits = 0
+		self.misses = 0
+		self.__entries = OrderedDict()
+
+	def get(self, key: Hashable, compute: Callable[[], T]) -> T:
+		"""
+		Provide the result cached for `key`, or compute it with `compute()` and cache it.
+		"""
+		if key in self.__entries:
+			self.__entries.move_to_end(key)
+			self.hits += 1
+			return self.__entries[key]
+		self.misses += 1
+		result = compute()
+		self.__entries[key] = result
+		if len(self.__entries) > self.size:
+			self.__entries.popitem(last=False)
+		return result
+
+	def clear(self) -> None:
+		"""
+		Remove all cached results (counters are kept).
+		"""
+		self.__entries.clear()
+
+	def __len__(self) -> int:
+		return len(self.__entries)
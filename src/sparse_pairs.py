@@ -0,0 +1,83 @@
+from typing import NamedTuple
+from local_types import NpArray, NpVector
+import numpy as np
+
+
+class SparsePairs(NamedTuple):
+	"""
+	Stacked character pair frequencies in coordinate (COO) format:
+	the *i*-th stored pair has the frequency `values[i]` for the characters
+	`firsts[i]`, `seconds[i]` in the component `layers[i]`. Unstored pairs have null frequencies.
+	"""
+
+	layers: NpVector
+	firsts: NpVector
+	seconds: NpVector
+	values: NpVector
+	shape: tuple[int, int, int]
+	"""Shape of the dense frequencies, *m* × *c* × *c*."""
+
+	def dense(self) -> NpArray:
+		"""
+		Provide the dense frequencies, sized *m* × *c* × *c*.
+		"""
+		frequencies = np.zeros(self.shape)
+		np.add.at(frequencies, (self.layers, self.firsts, self.seconds), self.values)
+		return frequencies
+
+	def score(self, costs_2d: NpArray, chars: NpVector | list[int]) -> float:
+		"""
+		Score the interactions of the layout assigning `chars[k]` to key `k`,
+		for the stacked interkey costs `costs_2d` (*m* × *n* × *n*).
+		Only the stored pairs are visited, in O(*nnz* + *c*) operations
+		(*nnz* stored pairs over all components, among *c* characters).
+		"""
+		n_keys = costs_2d.shape[1]
+		positions = np.full(self.shape[1], -1, dtype=np.intp)
+		positions[chars] = np.arange(n_keys)
+		firsts = positions[self.firsts]
+		seconds = positions[self.seconds]
+		# Flat indices within the costs, for a single gather
+		indices = (self.layers * n_keys + firsts) * n_keys + seconds
+		assigned = np.minimum(firsts, seconds) >= 0
+		return float(np.take(costs_2d, indices[assigned]) @ self.values[assigned])
+
+
+def sparse_pairs(frequencies: NpArray, threshold: float = 0.0) -> SparsePairs:
+	"""
+	Provide the sparse version of the pair `frequencies`, of one (*c* × *c*)
+	or several stacked (*m* × *c* × *c*) components,
+	only storing the pairs whose frequency exceeds `threshold` in magnitude.
+	"""
+	frequencies = np.asarray(frequencies, dtype=float)
+	if frequencies.ndim == 2:
+		frequencies = frequencies[np.newaxis]
+	layers, firsts, seconds = np.nonzero(np.abs(frequencies) > threshold)
+	return SparsePairs(
+		layers,
+		firsts,
+		seconds,
+		frequencies[layers, firsts, seconds],
+		frequencies.shape,
+	)
+
+
+def coo_pairs(
+	firsts: list[int] | NpVector,
+	seconds: list[int] | NpVector,
+	values: list[float] | NpVector,
+	n_chars: int,
+) -> SparsePairs:
+	"""
+	Provide the frequencies of a single component from observed pairs:
+	`values[i]` for the characters `firsts[i]`, `seconds[i]` (repeated pairs are summed),
+	among `n_chars` characters.
+	"""
+	firsts = np.asarray(firsts, dtype=np.intp)
+	return SparsePairs(
+		np.zeros(firsts.size, dtype=np.intp),
+		firsts,
+		np.asarray(seconds, dtype=np.intp),
+		np.asarray(values, dtype=float),
+		(1, n_chars, n_chars),
+	)
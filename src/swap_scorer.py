@@ -0,0 +1,112 @@
+from local_types import NpVector, NpArray
+from scoring_stacks import ScoringStacks
+import numpy as np
+
+
+class SwapScorer:
+	"""
+	Score of a layout, kept up to date as characters are swapped between its keys.\n
+	The layout is described by `chars`, the characters assigned to the positions `[0 .. n[`,
+	where the positions are the indices used by the (reduced) costs.
+	Evaluating a swap only involves the rows and columns of the swapped positions:
+	it takes O(*m* × *n*) operations (*m* interkey costs matrices),
+	instead of the O(*m* × *n*²) needed to score the whole layout.\n
+	For that, the differences between the cost rows and columns of each pair of positions
+	(*n* × *n* × 2*m* × *n* values) and the frequency rows and columns of each character
+	are precomputed, so that a swap delta is a single gather and dot product, whatever *m*,
+	and applying a swap only exchanges two characters.
+	Key costs are combined into a single *n* × *c* table of scores of each character on each key.
+	"""
+
+	chars: NpVector
+	score: float
+	__stacks: ScoringStacks
+	__costs: NpArray
+	"""Cost differences of the rows then columns of each pair of positions `[a, b]`,
+	flattened to *n* × *n* × (*n* × 2*m*) (see `.__init__(…)`)."""
+	__freqs: NpArray
+	"""Frequency rows then columns of each character, sized *c* × *c* × 2*m*."""
+	__keys: list[list[float]]
+	"""Key score of each character on each position, as nested lists for scalar lookups."""
+
+	def __init__(self, stacks: ScoringStacks, chars: NpVector | list[int]) -> None:
+		"""
+		Build a scorer for the layout assigning `chars[k]` to position `k`,
+		the costs of `stacks` being indexed by positions.
+		"""
+		self.__stacks = stacks
+		costs_1d, freqs_1d, costs_2d, freqs_2d = stacks
+		n = costs_2d.shape[1]
+		positions = np.arange(n)
+		# Swapping a and b changes row a of the gathered frequencies by the difference
+		# of the frequency rows of their characters (same for row b, and for columns),
+		# weighted by the cost differences of rows (and columns) a and b
+		rows = costs_2d.transpose(1, 0, 2)
+		columns = costs_2d.transpose(2, 0, 1)
+		costs_rows = rows[:, np.newaxis] - rows[np.newaxis, :]
+		costs_columns = columns[:, np.newaxis] - columns[np.newaxis, :]
+		# The 4 intersections of rows and columns a and b are weighted instead
+		# so that the same dot product includes their variations
+		diagonals = costs_2d[:, positions, positions].T
+		same = diagonals[:, np.newaxis] - diagonals[np.newaxis, :]
+		crossed = (costs_2d - costs_2d.transpose(0, 2, 1)).transpose(1, 2, 0)
+		a, b = np.meshgrid(positions, positions, indexing="ij")
+		costs_rows[a, b, :, b] = same
+		costs_rows[a, b, :, a] = crossed
+		costs_columns[a, b, :, a] = same - crossed
+		costs_columns[a, b, :, b] = 0
+		# Components last, so that a swap gathers contiguous rows of frequencies
+		costs = np.concatenate((costs_rows, costs_columns), axis=2)
+		self.__costs = np.ascontiguousarray(costs.transpose(0, 1, 3, 2)).reshape(
+			n, n, -1
+		)
+		self.__freqs = np.ascontiguousarray(
+			np.concatenate(
+				(freqs_2d.transpose(1, 2, 0), freqs_2d.transpose(2, 1, 0)), axis=2
+			)
+		)
+		self.__keys = (costs_1d.T @ freqs_1d).tolist()
+		self.set_chars(chars)
+
+	def set_chars(self, chars: NpVector | list[int]) -> None:
+		"""
+		Set the layout assigning `chars[k]` to position `k`, and score it from scratch.
+		"""
+		self.chars = np.array(chars, dtype=np.intp)
+		self.score = self.full_score()
+
+	def full_score(self) -> float:
+		"""
+		Score the current layout from scratch.
+		"""
+		return self.__stacks.score(self.chars)
+
+	def delta(self, a: int, b: int) -> float:
+		"""
+		Score variation caused by swapping the characters of positions `a` and `b`.
+		"""
+		if a == b:
+			return 0.0
+		chars = self.chars
+		char_a = chars[a]
+		char_b = chars[b]
+		keys = self.__keys
+		# (Array methods, as the function call overheads dominate at this size)
+		freqs = (self.__freqs[char_b] - self.__freqs[char_a]).take(chars, axis=0)
+		return (
+			float(self.__costs[a, b].dot(freqs.ravel()))
+			+ keys[a][char_b]
+			+ keys[b][char_a]
+			- keys[a][char_a]
+			- keys[b][char_b]
+		)
+
+	def swap(self, a: int, b: int, delta: float | None = None) -> float:
+		"""
+		Swap the characters of positions `a` and `b`, and return the updated score.
+		If already known, the `delta` of the swap (see `.delta(…)`) is not computed again.
+		"""
+		self.score += self.delta(a, b) if delta is None else delta
+		chars = self.chars
+		chars[a], chars[b] = chars[b], chars[a]
+		return self.score
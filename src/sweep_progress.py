@@ -0,0 +1,56 @@
+from typing import Callable, Iterable
+
+
+class SweepProgress:
+	"""
+	Progress of a sequential sweep of permutation blocks, by `.best_opened_permutation(…)`
+	or `.top_opened_permutations(…)` (see `LayoutBuilder`), updated after each block,
+	so that an interrupted sweep can be resumed where it stopped (with the same builder
+	configuration and search options), with identical results.
+	"""
+
+	__slots__ = ("blocks", "rank", "records", "on_block")
+
+	blocks: int
+	"""Number of blocks swept (skipped when the sweep is resumed)."""
+	rank: int
+	"""Number of permutations scored, i.e. rank of the next one in the sweep."""
+	records: list[tuple[float, int, tuple[int, ...]]]
+	"""Best records so far, as `(score, -rank, permutation)`."""
+	on_block: Callable[["SweepProgress"], None] | None
+	"""Called after each block, e.g. to write a checkpoint."""
+
+	def __init__(
+		self,
+		blocks: int = 0,
+		rank: int = 0,
+		records: Iterable[tuple[float, int, Iterable[int]]] = (),
+		on_block: Callable[["SweepProgress"], None] | None = None,
+	) -> None:
+		self.blocks = blocks
+		self.rank = rank
+		self.records = [
+			(float(score), int(rank), tuple(order)) for score, rank, order in records
+		]
+		self.on_block = on_block
+
+	def advance(self, n_scored: int) -> None:
+		"""
+		Record that a block of `n_scored` permutations was swept.
+		"""
+		self.blocks += 1
+		self.rank += n_scored
+		if self.on_block is not None:
+			self.on_block(self)
+
+	def state(self) -> dict:
+		"""
+		Provide the progress as a JSON-serializable dict, to be given back to `SweepProgress(…)`.
+		"""
+		return {
+			"blocks": self.blocks,
+			"rank": self.rank,
+			"records": [
+				[score, rank, list(order)] for score, rank, order in self.records
+			],
+		}
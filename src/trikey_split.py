@@ -0,0 +1,116 @@
+from typing import NamedTuple
+from local_types import NpArray, NpArray2D, NpVector
+import numpy as np
+
+
+class TrikeySplit(NamedTuple):
+	"""
+	Trikey score of layouts made of fixed keys and permuted opened keys,
+	split by the number of opened keys among the three keys of each trikey cost:\n
+	`constant + Σ_k linear[k, p_k] + Σ_{k,h} pairs[k, h, p_k, p_h]
+	+ Σ_m Σ_{k,h,l} open_costs[m, k, h, l] · open_freqs[m, p_k, p_h, p_l]`\n
+	where *p_k* is the index (within the opened characters) of the character assigned to the
+	*k*-th opened key. Only the last term requires gathering frequencies for each permutation,
+	among the *u* opened characters, rather than among all the *n* assigned ones.
+	"""
+
+	constant: float
+	"""Score of the fixed keys alone."""
+	linear: NpArray2D
+	"""Score of each opened key with each opened character, along with pairs of fixed keys."""
+	pairs: NpArray
+	"""Score of each pair of opened keys with each pair of opened characters,
+	along with a fixed key, sized *u* × *u* × *u* × *u*."""
+	open_costs: NpArray
+	"""Stacked trikey costs among opened keys."""
+	open_freqs: NpArray
+	"""Stacked trigram frequencies among opened characters."""
+
+	def score(self, orders: NpArray2D) -> NpVector:
+		"""
+		Score the layouts given by the rows of `orders` (*p* × *u*),
+		each the indices (within the opened characters) of the characters of the opened keys.
+		"""
+		n_orders, n_opened = orders.shape
+		m = self.open_costs.shape[0]
+		keys = np.arange(n_opened)
+		scores = np.full(n_orders, self.constant)
+		scores += np.sum(self.linear[keys, orders], axis=1)
+		# Flat indices of (k, h, p_k, p_h) within `pairs`, for a single gather
+		key_pairs = keys[:, np.newaxis] * n_opened + keys[np.newaxis, :]
+		char_pairs = orders[:, :, np.newaxis] * n_opened + orders[:, np.newaxis, :]
+		indices = key_pairs * n_opened**2 + char_pairs
+		scores += np.sum(
+			np.take(self.pairs, indices.reshape(n_orders, n_opened**2)), axis=1
+		)
+		triples = (
+			char_pairs[:, :, :, np.newaxis] * n_opened
+			+ orders[:, np.newaxis, np.newaxis, :]
+		)
+		gathered = np.take(
+			self.open_freqs.reshape(m, n_opened**3),
+			triples.reshape(n_orders, n_opened**3),
+			axis=1,
+		)
+		scores += np.einsum(
+			"mpk,mk->p", gathered, self.open_costs.reshape(m, n_opened**3)
+		)
+		return scores
+
+
+def split_trikey(
+	costs_3d: NpArray,
+	freqs_3d: NpArray,
+	fixed_chars: list[int],
+	opened_chars: list[int],
+) -> TrikeySplit:
+	"""
+	Split the trikey scores of the layouts assigning `fixed_chars` to the fixed keys,
+	and any permutation of `opened_chars` to the opened keys,
+	for the stacked trikey costs `costs_3d` (*m* × *n* × *n* × *n*), indexed by positions
+	(first the fixed keys, then the opened keys), and trigram frequencies `freqs_3d`
+	(*m* × *c* × *c* × *c*).
+	"""
+	n_fixed = len(fixed_chars)
+	fixed = np.array(fixed_chars, dtype=np.intp)
+	opened = np.array(opened_chars, dtype=np.intp)
+	f = slice(None, n_fixed)
+	o = slice(n_fixed, None)
+	constant = np.einsum(
+		"mabc,mabc->", costs_3d[:, f, f, f], _gather(freqs_3d, fixed, fixed, fixed)
+	)
+	linear = np.einsum(
+		"mabk,mabi->ki", costs_3d[:, f, f, o], _gather(freqs_3d, fixed, fixed, opened)
+	)
+	linear += np.einsum(
+		"makb,maib->ki", costs_3d[:, f, o, f], _gather(freqs_3d, fixed, opened, fixed)
+	)
+	linear += np.einsum(
+		"mkab,miab->ki", costs_3d[:, o, f, f], _gather(freqs_3d, opened, fixed, fixed)
+	)
+	pairs = np.einsum(
+		"mfkh,mfij->khij",
+		costs_3d[:, f, o, o],
+		_gather(freqs_3d, fixed, opened, opened),
+	)
+	pairs += np.einsum(
+		"mkfh,mifj->khij",
+		costs_3d[:, o, f, o],
+		_gather(freqs_3d, opened, fixed, opened),
+	)
+	pairs += np.einsum(
+		"mkhf,mijf->khij",
+		costs_3d[:, o, o, f],
+		_gather(freqs_3d, opened, opened, fixed),
+	)
+	return TrikeySplit(
+		float(constant),
+		linear,
+		pairs,
+		np.ascontiguousarray(costs_3d[:, o, o, o]),
+		_gather(freqs_3d, opened, opened, opened),
+	)
+
+
+def _gather(freqs_3d: NpArray, *chars: NpVector) -> NpArray:
+	return freqs_3d[np.ix_(np.arange(freqs_3d.shape[0]), *chars)]
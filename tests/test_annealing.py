@@ -0,0 +1,78 @@
+from pytest_dparam import d_parametrize
+from pytest import raises
+import numpy as np
+from scoring_stacks import stack_costs_freqs
+from swap_scorer import SwapScorer
+from annealing import SimulatedAnnealing
+
+
+def build(n: int = 10, seed: int = 0) -> SwapScorer:
+	rng = np.random.default_rng(seed)
+	stacks = stack_costs_freqs(
+		[(rng.random(n), rng.random(n))],
+		[(rng.random((n, n)), rng.random((n, n)))],
+		n,
+		n,
+	)
+	return SwapScorer(stacks, rng.permutation(n))
+
+
+class Test_run:
+	@d_parametrize(
+		{
+			"geometric": {"schedule": "geometric"},
+			"linear": {"schedule": "linear"},
+		}
+	)
+	def test_improve(self, schedule):
+		scorer = build()
+		before = scorer.score
+
+		score = SimulatedAnnealing(scorer, seed=0).run(2000, schedule=schedule)
+
+		assert score > before
+
+	def test_leave_scorer_on_best(self):
+		scorer = build()
+		annealing = SimulatedAnnealing(scorer, seed=0)
+
+		score = annealing.run(2000)
+
+		assert np.array_equal(scorer.chars, annealing.best_chars)
+		assert score == scorer.score == scorer.full_score()
+
+	def test_reproducible(self):
+		first = build()
+		second = build()
+
+		SimulatedAnnealing(first, seed=1).run(1000)
+		SimulatedAnnealing(second, seed=1).run(1000)
+
+		assert np.array_equal(first.chars, second.chars)
+
+	def test_only_given_positions(self):
+		scorer = build()
+		chars = scorer.chars.copy()
+
+		SimulatedAnnealing(scorer, positions=[0, 2, 5], seed=0).run(1000)
+
+		others = [1, 3, 4, 6, 7, 8, 9]
+		assert np.array_equal(scorer.chars[others], chars[others])
+
+	def test_max_steps(self):
+		annealing = SimulatedAnnealing(build(), seed=0)
+
+		annealing.run(1500, batch_size=100)
+
+		assert annealing.steps == 1500
+
+	def test_time_budget(self):
+		annealing = SimulatedAnnealing(build(), seed=0)
+
+		annealing.run(10**9, time_budget=0.05, batch_size=100)
+
+		assert 0 < annealing.steps < 10**9
+
+	def test_unknown_schedule(self):
+		with raises(ValueError):
+			SimulatedAnnealing(build()).run(10, schedule="exponential")
@@ -0,0 +1,73 @@
+from pytest_dparam import d_parametrize
+from itertools import permutations
+from math import factorial
+import numpy as np
+from branch_and_bound import BranchAndBound
+from fixed_open_split import split_fixed_opened
+from scoring_stacks import stack_costs_freqs
+
+
+def brute_force(costs_freqs_1d, costs_freqs_2d, fixed_chars, opened_chars):
+	best_score = -np.inf
+	best = None
+	for order in permutations(opened_chars):
+		chars = fixed_chars + list(order)
+		score = sum(np.sum(costs * freqs[chars]) for costs, freqs in costs_freqs_1d)
+		score += sum(
+			np.sum(costs * freqs[chars, :][:, chars]) for costs, freqs in costs_freqs_2d
+		)
+		if score > best_score:
+			best_score = score
+			best = order
+	return best_score, best
+
+
+def search(costs_freqs_1d, costs_freqs_2d, fixed_chars, opened_chars):
+	n = len(fixed_chars) + len(opened_chars)
+	n_chars = costs_freqs_1d[0][1].size
+	stacks = stack_costs_freqs(costs_freqs_1d, costs_freqs_2d, n, n_chars)
+	return BranchAndBound(
+		split_fixed_opened(stacks, fixed_chars, opened_chars), opened_chars
+	)
+
+
+def random_case(n_fixed: int, n_opened: int, seed: int):
+	rng = np.random.default_rng(seed)
+	n = n_fixed + n_opened
+	n_chars = n + 2
+	costs_freqs_1d = [(rng.random(n), rng.random(n_chars))]
+	costs_freqs_2d = [
+		(rng.random((n, n)), rng.random((n_chars, n_chars))),
+		(rng.random((n, n)) - 0.5, rng.random((n_chars, n_chars))),
+	]
+	chars = [int(c) for c in rng.permutation(n_chars)]
+	return costs_freqs_1d, costs_freqs_2d, chars[:n_fixed], chars[n_fixed:n]
+
+
+class Test_solve:
+	@d_parametrize(
+		{
+			"only_opened": {"n_fixed": 0, "n_opened": 6, "seed": 0},
+			"fixed_and_opened": [
+				{"n_fixed": 3, "n_opened": 6, "seed": 1},
+				{"n_fixed": 5, "n_opened": 7, "seed": 2},
+			],
+			"single_opened": {"n_fixed": 3, "n_opened": 1, "seed": 3},
+		}
+	)
+	def test_same_as_brute_force(self, n_fixed, n_opened, seed):
+		case = random_case(n_fixed, n_opened, seed)
+		expected_score, expected_order = brute_force(*case)
+
+		score, order = search(*case).solve()
+
+		assert order == expected_order
+		assert np.isclose(score, expected_score)
+
+	def test_prune(self):
+		case = random_case(4, 7, 4)
+		bnb = search(*case)
+
+		bnb.solve()
+
+		assert bnb.nodes < factorial(7)
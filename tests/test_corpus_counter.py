@@ -0,0 +1,104 @@
+from pytest_dparam import d_parametrize
+from pytest import raises
+import numpy as np
+from corpus_counter import CorpusCounter
+
+TEXT = "the cat sat on the mat, then the bat ate the rat."
+CHARS = "abcehmnorst "
+
+
+def naive_counts(text: str, chars: str, distance: int) -> np.ndarray:
+	counts = np.zeros((len(chars), len(chars)), dtype=np.int64)
+	for a, b in zip(text, text[distance:]):
+		if a in chars and b in chars:
+			counts[chars.index(a), chars.index(b)] += 1
+	return counts
+
+
+class Test_count:
+	def test_unigrams(self):
+		counter = CorpusCounter(CHARS)
+
+		counter.count(TEXT)
+
+		assert counter.unigrams.tolist() == [TEXT.count(c) for c in CHARS]
+
+	@d_parametrize({"bigrams": {"gap": 0}, "skip-1": {"gap": 1}, "skip-3": {"gap": 3}})
+	def test_pairs(self, gap):
+		counter = CorpusCounter(CHARS, gaps=(1, 3))
+
+		counter.count(TEXT)
+
+		counts = counter.bigrams if gap == 0 else counter.skipgrams[(1, 3).index(gap)]
+		assert np.array_equal(counts, naive_counts(TEXT, CHARS, gap + 1))
+
+	@d_parametrize({"1": {"chunk": 1}, "2": {"chunk": 2}, "7": {"chunk": 7}})
+	def test_chunks(self, chunk):
+		whole = CorpusCounter(CHARS, gaps=(1, 3))
+		whole.count(TEXT)
+		counter = CorpusCounter(CHARS, gaps=(1, 3))
+
+		for start in range(0, len(TEXT), chunk):
+			counter.count(TEXT[start : start + chunk])
+
+		assert np.array_equal(counter.unigrams, whole.unigrams)
+		assert np.array_equal(counter.bigrams, whole.bigrams)
+		assert np.array_equal(counter.skipgrams, whole.skipgrams)
+
+	def test_end_text(self):
+		counter = CorpusCounter("ab")
+
+		counter.count("a")
+		counter.end_text()
+		counter.count("b")
+
+		assert counter.bigrams.tolist() == [[0, 0], [0, 0]]
+
+	def test_translation_table(self):
+		counter = CorpusCounter({"a": 0, "A": 0, "b": 1, "é": 2, "€": 3})
+
+		counter.count("Abaé€x€")
+
+		assert counter.unigrams.tolist() == [2, 1, 1, 2]
+		assert counter.bigrams[0].tolist() == [0, 1, 1, 0]
+		assert counter.bigrams[2].tolist() == [0, 0, 0, 1]
+		assert counter.bigrams[3].tolist() == [0, 0, 0, 0]
+
+
+def test_invalid_gap():
+	with raises(ValueError):
+		CorpusCounter(CHARS, gaps=(0,))
+
+
+def test_frequencies():
+	counter = CorpusCounter(CHARS)
+
+	counter.count(TEXT)
+
+	assert np.isclose(counter.char_frequencies().sum(), 1)
+	assert np.isclose(counter.pair_frequencies().sum(), 1)
+	assert np.isclose(counter.pair_frequencies(1).sum(), 1)
+
+
+@d_parametrize({"sequential": {"workers": 1}, "parallel": {"workers": 2}})
+def test_count_files(tmp_path, workers):
+	paths = []
+	for i, text in enumerate(TEXT.split(",")):
+		paths.append(tmp_path / f"{i}.txt")
+		paths[-1].write_text(text, encoding="utf-8")
+	counter = CorpusCounter(CHARS)
+
+	counter.count_files([str(path) for path in paths], workers, chunk_size=5)
+
+	expected = sum(naive_counts(text, CHARS, 1) for text in TEXT.split(","))
+	assert np.array_equal(counter.bigrams, expected)
+	assert counter.unigrams.sum() == len(TEXT) - TEXT.count(",") - TEXT.count(".")
+
+
+@d_parametrize({"sequential": {"workers": 1}, "parallel": {"workers": 2}})
+def test_count_no_files(workers):
+	counter = CorpusCounter(CHARS)
+
+	counter.count_files([], workers)
+
+	assert counter.unigrams.sum() == 0 and counter.bigrams.sum() == 0
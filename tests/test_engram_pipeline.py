@@ -0,0 +1,206 @@
+from pytest import raises
+import json
+import numpy as np
+from matrix_based_builder import MatrixBasedLayoutBuilder
+from engram_pipeline import EngramPipeline
+from sweep_progress import SweepProgress
+
+
+def build_pipeline(**builder_options) -> EngramPipeline:
+	rng = np.random.default_rng(0)
+	n = 9
+	builder = MatrixBasedLayoutBuilder(**builder_options)
+	builder.add_key_costs(rng.random(n), rng.random(n))
+	builder.add_interkey_costs(rng.random((n, n)), rng.random((n, n)))
+	return EngramPipeline(
+		builder,
+		seeds=[{0: 0, 1: 1}, {0: 1, 1: 0}, {4: 0, 8: 1}],
+		fill_steps=[(3, None), (4, None)],
+		swap_groups=[[0, 1, 2, 3], [4, 5, 6, 7, 8]],
+	)
+
+
+class Test_run_seed:
+	def test_full_layout(self):
+		pipeline = build_pipeline()
+
+		result = pipeline.run_seed(1)
+
+		assert result.seed == 1
+		assert sorted(result.layout.keys()) == list(range(9))
+		assert sorted(result.layout.values()) == list(range(9))
+
+	def test_score(self):
+		pipeline = build_pipeline()
+
+		result = pipeline.run_seed(0)
+
+		builder = MatrixBasedLayoutBuilder()
+		builder.add_key_costs(*pipeline.builder._costs_freqs_1d[0])
+		builder.add_interkey_costs(*pipeline.builder._costs_freqs_2d[0])
+		builder.fix(result.layout.keys(), result.layout.values())
+		assert np.isclose(result.score, builder.score())
+
+	def test_swaps_do_not_lower_score(self):
+		pipeline = build_pipeline()
+		swap_groups = pipeline.swap_groups
+
+		pipeline.swap_groups = []
+		without_swaps = pipeline.run_seed(2)
+		pipeline.swap_groups = swap_groups
+		with_swaps = pipeline.run_seed(2)
+
+		assert with_swaps.score >= without_swaps.score - 1e-9
+
+	def test_stage_timings(self):
+		pipeline = build_pipeline()
+
+		result = pipeline.run_seed(0)
+
+		assert list(result.timings.keys()) == ["fill 1", "fill 2", "swap 1", "swap 2"]
+
+	def test_builder_untouched(self):
+		pipeline = build_pipeline()
+		pipeline.builder.fix([3], [3])
+
+		pipeline.run_seed(0)
+
+		assert pipeline.builder._fixed == {3: 3}
+
+	def test_shared_cache(self):
+		pipeline = build_pipeline(cache_size=16)
+		pipeline.run_seed(0)
+		misses = pipeline.builder.cache.misses
+
+		pipeline.run_seed(0)
+
+		assert pipeline.builder.cache.misses == misses
+		assert pipeline.builder.cache.hits == misses
+
+
+class Test_run:
+	def test_keep_best(self):
+		pipeline = build_pipeline()
+
+		best = pipeline.run()
+
+		assert len(pipeline.results) == 3
+		assert best.score == max(result.score for result in pipeline.results)
+
+	def test_parallel_same_as_sequential(self):
+		pipeline = build_pipeline()
+
+		best = pipeline.run(workers=2)
+
+		assert best[:3] == pipeline.run(workers=1)[:3]
+
+	def test_stage_timings(self):
+		pipeline = build_pipeline()
+
+		pipeline.run()
+
+		timings = pipeline.stage_timings()
+		assert list(timings.keys()) == ["fill 1", "fill 2", "swap 1", "swap 2"]
+		assert np.isclose(
+			timings["fill 1"],
+			sum(result.timings["fill 1"] for result in pipeline.results),
+		)
+
+
+class Interrupted(Exception):
+	pass
+
+
+def interrupt_after(monkeypatch, n_blocks: int):
+	# Interrupt the run after `n_blocks` swept blocks, over all stages and seeds
+	advance = SweepProgress.advance
+	counter = [0]
+
+	def interrupted_advance(progress: SweepProgress, n_scored: int):
+		advance(progress, n_scored)
+		counter[0] += 1
+		if counter[0] == n_blocks:
+			raise Interrupted()
+
+	monkeypatch.setattr(SweepProgress, "advance", interrupted_advance)
+
+
+def checkpointed_pipeline(directory) -> EngramPipeline:
+	pipeline = build_pipeline()
+	pipeline.checkpoints = str(directory)
+	pipeline.checkpoint_interval = 0.0
+	pipeline.search_options = {"block_size": 4}
+	return pipeline
+
+
+class Test_checkpoints:
+	def test_same_results(self, tmp_path):
+		pipeline = checkpointed_pipeline(tmp_path)
+
+		best = pipeline.run()
+
+		expected = build_pipeline().run()
+		assert best[:3] == expected[:3]
+		for seed in range(3):
+			state = json.loads((tmp_path / f"seed_{seed}.json").read_text())
+			assert state["stage"] == 4
+			assert dict(map(tuple, state["layout"])) == pipeline.results[seed].layout
+
+	def test_resume_completed(self, tmp_path, monkeypatch):
+		pipeline = checkpointed_pipeline(tmp_path)
+		expected = pipeline.run()
+		interrupt_after(monkeypatch, 1)
+
+		best = pipeline.run()
+
+		assert best[:3] == expected[:3]
+
+	def test_resume_interrupted(self, tmp_path, monkeypatch):
+		pipeline = checkpointed_pipeline(tmp_path)
+		with monkeypatch.context() as patch:
+			interrupt_after(patch, 40)
+			with raises(Interrupted):
+				pipeline.run()
+		state = json.loads((tmp_path / "seed_0.json").read_text())
+
+		best = pipeline.run()
+
+		assert 0 < state["stage"] < 4
+		assert state["sweep"]["blocks"] > 0
+		assert best[:3] == build_pipeline().run()[:3]
+		assert pipeline.results[0].timings.keys() == {
+			"fill 1",
+			"fill 2",
+			"swap 1",
+			"swap 2",
+		}
+
+	def test_numpy_seed(self, tmp_path):
+		pipeline = checkpointed_pipeline(tmp_path)
+		pipeline.seeds[0] = dict(zip(np.array([0, 1]), np.array([0, 1])))
+
+		result = pipeline.run_seed(0)
+
+		state = json.loads((tmp_path / "seed_0.json").read_text())
+		assert dict(map(tuple, state["layout"])) == result.layout
+		assert result[:3] == build_pipeline().run_seed(0)[:3]
+
+	def test_failed_write(self, tmp_path, monkeypatch):
+		pipeline = checkpointed_pipeline(tmp_path)
+
+		def interrupted_dump(*args, **kwargs):
+			raise Interrupted()
+
+		monkeypatch.setattr(json, "dump", interrupted_dump)
+		with raises(Interrupted):
+			pipeline.run_seed(0)
+
+		assert list(tmp_path.iterdir()) == []
+
+	def test_other_seed_raise_valueerror(self, tmp_path):
+		pipeline = checkpointed_pipeline(tmp_path)
+		pipeline.run_seed(0)
+		pipeline.seeds[0] = {0: 2, 1: 1}
+
+		with raises(ValueError):
+			pipeline.run_seed(0)
@@ -0,0 +1,57 @@
+from pytest_dparam import d_parametrize
+import numpy as np
+from fixed_interactions import FixedInteractions
+
+
+def build(n: int = 7, n_chars: int = 9, seed: int = 0) -> FixedInteractions:
+	rng = np.random.default_rng(seed)
+	costs = rng.random((2, n, n))
+	freqs = rng.random((2, n_chars, n_chars))
+	return FixedInteractions(costs, freqs), costs, freqs
+
+
+def expected(costs, freqs, fixed: dict[int, int]):
+	keys = list(fixed.keys())
+	chars = list(fixed.values())
+	constant = np.sum(costs[:, keys, :][:, :, keys] * freqs[:, chars, :][:, :, chars])
+	cross = np.zeros((costs.shape[1], freqs.shape[1]))
+	for k in range(costs.shape[1]):
+		for c in range(freqs.shape[1]):
+			for f, cf in fixed.items():
+				cross[k, c] += np.sum(costs[:, k, f] * freqs[:, c, cf])
+				cross[k, c] += np.sum(costs[:, f, k] * freqs[:, cf, c])
+	return constant, cross
+
+
+class Test_update:
+	@d_parametrize(
+		{
+			"from_nothing": {"before": {}, "after": {2: 4, 5: 0, 1: 8}},
+			"one_added": {"before": {2: 4, 5: 0}, "after": {2: 4, 5: 0, 1: 8}},
+			"one_removed": {"before": {2: 4, 5: 0, 1: 8}, "after": {2: 4, 1: 8}},
+			"one_moved": {"before": {2: 4, 5: 0, 1: 8}, "after": {2: 4, 5: 3, 1: 8}},
+			"all_changed": {"before": {2: 4, 5: 0}, "after": {0: 1, 6: 2, 3: 5}},
+		}
+	)
+	def test_match_direct_computation(self, before, after):
+		interactions, costs, freqs = build()
+		interactions.update(before)
+
+		interactions.update(after)
+
+		constant, cross = expected(costs, freqs, after)
+		assert interactions.fixed == after
+		assert np.isclose(interactions.constant, constant)
+		unfixed = [k for k in range(7) if k not in after]
+		assert np.allclose(interactions.cross[unfixed], cross[unfixed])
+
+	def test_fix_one_at_a_time(self):
+		interactions, costs, freqs = build()
+		fixed = {}
+
+		for k, c in [(3, 1), (0, 7), (6, 2), (4, 0), (1, 5)]:
+			fixed[k] = c
+			interactions.update(fixed)
+
+		constant, _ = expected(costs, freqs, fixed)
+		assert np.isclose(interactions.constant, constant)
@@ -0,0 +1,46 @@
+from itertools import permutations
+import numpy as np
+from fixed_open_split import split_fixed_opened
+from scoring_stacks import stack_costs_freqs
+
+
+def full_score(costs_freqs_1d, costs_freqs_2d, chars):
+	score = sum(np.sum(costs * freqs[chars]) for costs, freqs in costs_freqs_1d)
+	score += sum(
+		np.sum(costs * freqs[chars, :][:, chars]) for costs, freqs in costs_freqs_2d
+	)
+	return score
+
+
+def test_split_score_match_full_score():
+	rng = np.random.default_rng(0)
+	costs_freqs_1d = [(rng.random(7), rng.random(9))]
+	costs_freqs_2d = [
+		(rng.random((7, 7)), rng.random((9, 9))),
+		(rng.random((7, 7)), rng.random((9, 9))),
+	]
+	fixed_chars = [8, 2, 5]
+	opened_chars = [0, 3, 7, 1]
+
+	stacks = stack_costs_freqs(costs_freqs_1d, costs_freqs_2d, 7, 9)
+
+	split = split_fixed_opened(stacks, fixed_chars, opened_chars)
+
+	for order in permutations(range(4)):
+		chars = fixed_chars + [opened_chars[i] for i in order]
+		score = split.constant + sum(split.linear[k, p] for k, p in enumerate(order))
+		for open_costs, open_freqs in zip(split.open_costs, split.open_freqs):
+			score += np.sum(open_costs * open_freqs[order, :][:, order])
+		assert np.isclose(score, full_score(costs_freqs_1d, costs_freqs_2d, chars))
+
+
+def test_null_diagonals():
+	rng = np.random.default_rng(0)
+	costs_freqs_2d = [(rng.random((5, 5)), rng.random((5, 5)))]
+
+	stacks = stack_costs_freqs([], costs_freqs_2d, 5, 5)
+
+	split = split_fixed_opened(stacks, [1, 2], [0, 3, 4])
+
+	assert np.all(np.diagonal(split.open_costs, axis1=1, axis2=2) == 0)
+	assert np.all(np.diagonal(split.open_freqs, axis1=1, axis2=2) == 0)
@@ -0,0 +1,99 @@
+from pytest_dparam import d_parametrize
+from itertools import permutations
+import numpy as np
+from scoring_stacks import stack_costs_freqs
+from key_symmetries import (
+	is_key_automorphism,
+	key_automorphisms,
+	symmetry_representatives,
+)
+
+
+def mirrored_stacks(n: int = 6, seed: int = 0):
+	"""Costs unchanged by the mirror k ↦ n-1-k."""
+	rng = np.random.default_rng(seed)
+	costs_1d = rng.random(n)
+	costs_2d = rng.random((n, n))
+	return stack_costs_freqs(
+		[(costs_1d + costs_1d[::-1], rng.random(n))],
+		[(costs_2d + costs_2d[::-1, ::-1], rng.random((n, n)))],
+		n,
+		n,
+	)
+
+
+class Test_is_key_automorphism:
+	@d_parametrize(
+		{
+			"mirror": {
+				"n_fixed": 0,
+				"permutation": [5, 4, 3, 2, 1, 0],
+				"expected": True,
+			},
+			"identity": {"n_fixed": 0, "permutation": list(range(6)), "expected": True},
+			"swap": {
+				"n_fixed": 0,
+				"permutation": [1, 0, 2, 3, 4, 5],
+				"expected": False,
+			},
+			"inner_mirror": [
+				{"n_fixed": 1, "permutation": [3, 2, 1, 0, 4], "expected": False},
+				{"n_fixed": 2, "permutation": [1, 0, 2, 3], "expected": False},
+			],
+		}
+	)
+	def test_costs_unchanged(self, n_fixed, permutation, expected):
+		stacks = mirrored_stacks()
+
+		assert is_key_automorphism(stacks, n_fixed, permutation) == expected
+
+
+class Test_key_automorphisms:
+	def test_find_mirror(self):
+		stacks = mirrored_stacks()
+
+		automorphisms = key_automorphisms(stacks, 0)
+
+		assert [list(a) for a in automorphisms] == [[5, 4, 3, 2, 1, 0]]
+
+	def test_none_without_symmetry(self):
+		rng = np.random.default_rng(0)
+		stacks = stack_costs_freqs([], [(rng.random((5, 5)), rng.random((5, 5)))], 5, 5)
+
+		assert key_automorphisms(stacks, 1) == []
+
+	def test_limit(self):
+		stacks = stack_costs_freqs([], [(np.ones((5, 5)), np.ones((5, 5)))], 5, 5)
+
+		automorphisms = key_automorphisms(stacks, 0, limit=10)
+
+		assert len(automorphisms) == 10
+		assert all(is_key_automorphism(stacks, 0, a) for a in automorphisms)
+
+	def test_all_found(self):
+		stacks = stack_costs_freqs([], [(np.ones((4, 4)), np.ones((4, 4)))], 4, 4)
+
+		assert len(key_automorphisms(stacks, 0)) == 4 * 3 * 2 - 1
+
+
+class Test_symmetry_representatives:
+	def test_one_per_class(self):
+		table = np.array(list(permutations(range(6))))
+		mirror = np.array([5, 4, 3, 2, 1, 0])
+
+		selected = symmetry_representatives(table, [mirror])
+
+		assert np.sum(selected) == len(table) // 2
+		kept = {tuple(p) for p in table[selected]}
+		for p in table:
+			assert (tuple(p) in kept) != (tuple(p[::-1]) in kept)
+
+	def test_keep_first_best(self):
+		stacks = mirrored_stacks()
+		table = np.array(list(permutations(range(6))))
+		scores = np.array([stacks.score(p) for p in table])
+
+		selected = symmetry_representatives(table, key_automorphisms(stacks, 0))
+
+		assert selected[np.argmax(scores)]
+		assert np.max(scores[selected]) == np.max(scores)
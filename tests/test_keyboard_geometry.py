@@ -0,0 +1,158 @@
+from pytest_dparam import d_parametrize
+from pytest import raises
+import numpy as np
+from keyboard_geometry import (
+	EffortRules,
+	KeyboardGeometry,
+	geometry_costs,
+	geometry_hash,
+	interkey_costs,
+	key_costs,
+)
+from matrix_based_builder import MatrixBasedLayoutBuilder
+
+
+# Two rows of three keys per hand: little, ring and index fingers, resting on the top row
+geometry = KeyboardGeometry(
+	positions=np.array(
+		[[0, 0], [1, 0], [2, 0], [0.5, 1], [1.5, 1], [2.5, 1]]
+		+ [[5, 0], [6, 0], [7, 0], [5.5, 1], [6.5, 1], [7.5, 1]]
+	),
+	fingers=np.array([4, 3, 1, 4, 3, 1, 1, 3, 4, 1, 3, 4]),
+	hands=np.array([0] * 6 + [1] * 6),
+	homes=np.array([True] * 3 + [False] * 3 + [True] * 3 + [False] * 3),
+)
+
+rules = EffortRules(
+	finger_costs=(0, -1, -2, -3, -4),
+	distance=-1,
+	same_key=-0.5,
+	same_finger=-2,
+	same_finger_distance=-1,
+	alternation=1,
+	inward_roll=0.5,
+	outward_roll=-0.5,
+	row_jump=-0.25,
+)
+
+
+def naive_interkey_costs(geometry, rules):
+	positions, fingers, hands, _ = geometry
+	n = len(fingers)
+	costs = np.zeros((n, n))
+	for i in range(n):
+		for j in range(n):
+			if i == j:
+				costs[i, j] = rules.same_key
+			elif hands[i] != hands[j]:
+				costs[i, j] = rules.alternation
+			elif fingers[i] == fingers[j]:
+				distance = np.linalg.norm(positions[j] - positions[i])
+				costs[i, j] = rules.same_finger + rules.same_finger_distance * distance
+			else:
+				roll = (
+					rules.inward_roll if fingers[j] < fingers[i] else rules.outward_roll
+				)
+				row_jump = rules.row_jump * abs(positions[j][1] - positions[i][1])
+				costs[i, j] = roll + row_jump
+	return costs
+
+
+class Test_key_costs:
+	def test_finger_and_distance_costs(self):
+		costs = key_costs(geometry, rules)
+
+		assert np.allclose(costs[:3], [-4, -3, -1])
+		assert np.allclose(costs[3:6], [-4, -3, -1] - np.hypot(0.5, 1))
+		assert np.allclose(costs[6:], costs[[2, 1, 0, 5, 4, 3]])
+
+	def test_no_rules(self):
+		assert np.array_equal(key_costs(geometry, EffortRules()), np.zeros(12))
+
+	def test_missing_resting_key(self):
+		homeless = geometry._replace(homes=np.zeros(12, dtype=bool))
+
+		with raises(ValueError):
+			key_costs(homeless, rules)
+
+
+class Test_interkey_costs:
+	def test_as_naive(self):
+		costs = interkey_costs(geometry, rules)
+
+		assert costs.shape == (12, 12)
+		assert np.allclose(costs, naive_interkey_costs(geometry, rules))
+
+	@d_parametrize(
+		{
+			"same_finger": {"keys": (0, 3), "expected": -2 - np.hypot(0.5, 1)},
+			"inward_roll": {"keys": (0, 1), "expected": 0.5},
+			"outward_roll_row_jump": {"keys": (2, 3), "expected": -0.5 - 0.25},
+			"alternation": {"keys": (0, 6), "expected": 1},
+		}
+	)
+	def test_rules(self, keys, expected):
+		assert np.isclose(interkey_costs(geometry, rules)[keys], expected)
+
+
+class Test_geometry_hash:
+	def test_same_inputs(self):
+		copy = KeyboardGeometry(*(np.array(array).tolist() for array in geometry))
+
+		assert geometry_hash(copy, rules) == geometry_hash(geometry, rules)
+
+	@d_parametrize(
+		{
+			"positions": {"change": {"positions": geometry.positions + 0.1}},
+			"fingers": {"change": {"fingers": 4 - geometry.fingers}},
+			"hands": {"change": {"hands": 1 - geometry.hands}},
+			"homes": {"change": {"homes": ~geometry.homes}},
+		}
+	)
+	def test_other_geometry(self, change):
+		other = geometry._replace(**change)
+
+		assert geometry_hash(other, rules) != geometry_hash(geometry, rules)
+
+	def test_other_rules(self):
+		other = rules._replace(row_jump=-0.5)
+
+		assert geometry_hash(geometry, other) != geometry_hash(geometry, rules)
+
+
+class Test_geometry_costs:
+	def test_computed(self):
+		costs_1d, costs_2d = geometry_costs(geometry, rules)
+
+		assert np.array_equal(costs_1d, key_costs(geometry, rules))
+		assert np.array_equal(costs_2d, interkey_costs(geometry, rules))
+		assert not costs_1d.flags.writeable and not costs_2d.flags.writeable
+
+	def test_stored(self, tmp_path):
+		costs_1d, costs_2d = geometry_costs(geometry, rules, str(tmp_path))
+
+		assert (tmp_path / f"costs_{geometry_hash(geometry, rules)}.npz").exists()
+		assert np.array_equal(costs_1d, key_costs(geometry, rules))
+		assert np.array_equal(costs_2d, interkey_costs(geometry, rules))
+
+	def test_load_stored(self, tmp_path):
+		other = rules._replace(alternation=2)
+		np.savez(
+			tmp_path / f"costs_{geometry_hash(geometry, other)}.npz",
+			key_costs=np.zeros(12),
+			interkey_costs=np.zeros((12, 12)),
+		)
+
+		costs_1d, costs_2d = geometry_costs(geometry, other, str(tmp_path))
+
+		assert np.all(costs_1d == 0) and np.all(costs_2d == 0)
+
+	def test_builder_costs(self):
+		costs_1d, costs_2d = geometry_costs(geometry, rules)
+		builder = MatrixBasedLayoutBuilder()
+		builder.add_key_costs(costs_1d, np.full(12, 1 / 12))
+		builder.add_interkey_costs(costs_2d, np.full((12, 12), 1 / 144))
+		builder.fix(range(12), range(12))
+
+		expected = costs_1d.mean() + costs_2d.mean()
+		assert np.isclose(builder.score(), expected)
@@ -1,6 +1,46 @@
+from typing import Iterable, Sequence
 from pytest_dparam import d_parametrize
-from layout_builder import LayoutBuilder
+from layout_builder import LayoutBuilder, heap_swaps
+from itertools import permutations
 from math import factorial
+from pytest import raises
+import numpy as np
+
+
+class ProductsBuilder(LayoutBuilder):
+	"""Score = Σ key × char, so that the best layouts pair large keys with large chars."""
+
+	def score(self, open_chars_order: tuple[int, ...] = []) -> float:
+		pairs = list(self._fixed.items()) + list(
+			zip(self._opened_keys, open_chars_order)
+		)
+		return float(sum(k * c for k, c in pairs))
+
+	def key_count(self) -> int:
+		return 6
+
+	def char_count(self) -> int:
+		return 6
+
+
+class ReversedBuilder(ProductsBuilder):
+	"""Same scores, with permutations overwritten without arguments (in reverse order)."""
+
+	def opened_permutations(self) -> Iterable[tuple[int, ...]]:
+		return reversed(list(permutations(self._opened_chars)))
+
+
+class IndicesBuilder(ProductsBuilder):
+	"""Same scores, with permutations given as indices within the opened characters."""
+
+	def score(self, open_chars_order: tuple[int, ...] = []) -> float:
+		return super().score(self._chars_of(open_chars_order))
+
+	def opened_permutations(self) -> Iterable[tuple[int, ...]]:
+		return permutations(range(len(self._opened_chars)))
+
+	def _chars_of(self, order: Sequence[int]) -> tuple[int, ...]:
+		return tuple(self._opened_chars[i] for i in order)
 
 
 class Test_fix:
@@ -92,6 +132,16 @@ class Test_open:
 		assert sorted(builder._opened_keys) == [1, 2, 3, 4, 5]
 		assert sorted(builder._opened_chars) == [0, 6, 7, 8, 9]
 
+	def test_numpy_indices_beyond_63(self):
+		builder = LayoutBuilder()
+
+		builder.open(np.arange(70), np.arange(70))
+		builder.open([], np.array([65, 1]))
+		builder.open([64], [65])
+
+		assert builder._opened_keys == list(range(70))
+		assert builder._opened_chars == list(range(70))
+
 	def test_works_with_fix(self):
 		builder = LayoutBuilder()
 		builder.fix([1, 2, 3], [6, 7, 8])
@@ -124,3 +174,418 @@ def test_opened_permutations():
 		assert set(p) == chars_set
 		perm_set.add(p)
 	assert len(perm_set) == factorial(len(chars))
+
+
+def test_opened_permutations_in_heap_order():
+	builder = LayoutBuilder()
+	builder.open([0, 1, 2, 3], [3, 6, 8, 4])
+
+	permutations = list(builder.opened_permutations("heap"))
+
+	assert permutations[0] == (3, 6, 8, 4)
+	assert sorted(permutations) == sorted(builder.opened_permutations())
+	for previous, current in zip(permutations, permutations[1:]):
+		assert sum(p != c for p, c in zip(previous, current)) == 2
+
+
+def test_opened_permutations_with_prefix():
+	builder = LayoutBuilder()
+	builder.open([0, 1, 2, 3], [3, 6, 8, 4])
+
+	permutations = list(builder.opened_permutations(prefix=(8, 3)))
+
+	assert permutations == [(8, 3, 6, 4), (8, 3, 4, 6)]
+
+
+@d_parametrize(
+	{
+		"no_element": {"n": 0},
+		"single_element": {"n": 1},
+		"few_elements": {"n": 3},
+		"more_elements": {"n": 6},
+	}
+)
+def test_heap_swaps(n):
+	elements = list(range(n))
+	seen = {tuple(elements)}
+
+	for i, j in heap_swaps(n):
+		elements[i], elements[j] = elements[j], elements[i]
+		seen.add(tuple(elements))
+
+	assert len(seen) == factorial(n)
+	assert len(list(heap_swaps(n))) == factorial(n) - 1
+
+
+class Test_optimal_fill:
+	def test_fill_given_keys_with_given_chars(self):
+		builder = ProductsBuilder()
+
+		builder.optimal_fill([1, 4, 2], [5, 0, 3])
+
+		assert builder._fixed == {1: 0, 2: 3, 4: 5}
+
+	def test_fill_from_indices(self):
+		builder = IndicesBuilder()
+
+		builder.optimal_fill([1, 4, 2], [5, 0, 3])
+
+		assert builder._fixed == {1: 0, 2: 3, 4: 5}
+
+	def test_fill_first_usable_keys(self):
+		builder = ProductsBuilder()
+		builder.fix([0, 2], [1, 0])
+
+		builder.optimal_fill(3, [2, 3, 4])
+
+		assert builder._fixed == {0: 1, 2: 0, 1: 2, 3: 3, 4: 4}
+
+	def test_fill_with_first_usable_chars(self):
+		builder = ProductsBuilder()
+		builder.fix([5], [0])
+
+		builder.optimal_fill([1, 2])
+
+		assert builder._fixed == {5: 0, 1: 1, 2: 2}
+
+	def test_ignore_fixed_without_remap(self):
+		builder = ProductsBuilder()
+		builder.fix([1, 5], [4, 0])
+
+		builder.optimal_fill([1, 2, 3], [3, 4, 5])
+
+		assert builder._fixed == {1: 4, 5: 0, 2: 3, 3: 5}
+
+	def test_reassign_fixed_with_remap(self):
+		builder = ProductsBuilder()
+		builder.fix([1, 5, 0], [4, 0, 5])
+
+		builder.optimal_fill([1, 5], [4, 0], remap=True)
+
+		assert builder._fixed == {0: 5, 1: 0, 5: 4}
+
+	def test_remap_unfix_used_chars(self):
+		builder = ProductsBuilder()
+		builder.fix([0, 1], [5, 4])
+
+		builder.optimal_fill([4, 5], [4, 5], remap=True)
+
+		assert builder._fixed == {4: 4, 5: 5}
+
+	def test_close_opened(self):
+		builder = ProductsBuilder()
+		builder.open([0, 1], [0, 1])
+
+		builder.optimal_fill([2, 3], [2, 3])
+
+		assert builder._opened_keys == []
+		assert builder._opened_chars == []
+		assert builder._fixed == {2: 2, 3: 3}
+
+	def test_return_best_score(self):
+		builder = ProductsBuilder()
+
+		score = builder.optimal_fill([1, 2], [2, 1])
+
+		assert score == 1 * 1 + 2 * 2
+
+	def test_search_options_used(self):
+		builder = ProductsBuilder()
+
+		builder.optimal_fill([1, 2, 3, 4], [1, 2, 3, 4], block_size=5)
+
+		assert builder._fixed == {1: 1, 2: 2, 3: 3, 4: 4}
+
+	def test_mismatch_raise_valueerror(self):
+		builder = ProductsBuilder()
+
+		with raises(ValueError):
+			builder.optimal_fill([1, 2], [1, 2, 3])
+
+	def test_not_enough_keys_raise_valueerror(self):
+		builder = ProductsBuilder()
+		builder.fix([0, 1], [0, 1])
+
+		with raises(ValueError):
+			builder.optimal_fill(5)
+
+
+class Test_best_opened_permutation:
+	def test_find_best(self):
+		builder = ProductsBuilder()
+		builder.open([3, 1, 2], [1, 2, 3])
+
+		score, chars_order = builder.best_opened_permutation()
+
+		assert chars_order == (3, 1, 2)
+		assert score == 3 * 3 + 1 * 1 + 2 * 2
+
+	def test_first_best_kept(self):
+		builder = ProductsBuilder()
+		builder.open([0, 1], [2, 3])
+
+		_, chars_order = builder.best_opened_permutation(block_size=1)
+
+		assert chars_order == (2, 3)
+
+	def test_with_prefix(self):
+		builder = ProductsBuilder()
+		builder.open([3, 1, 2], [1, 2, 3])
+
+		score, chars_order = builder.best_opened_permutation(prefix=(2,))
+
+		assert chars_order == (2, 1, 3)
+		assert score == 3 * 2 + 1 * 1 + 2 * 3
+
+	@d_parametrize(
+		{
+			"two_workers": {"workers": 2},
+			"three_workers": {"workers": 3},
+		}
+	)
+	def test_parallel_same_as_sequential(self, workers):
+		builder = ProductsBuilder()
+		builder.open([0, 1, 2, 3, 4], [1, 2, 3, 4, 5])
+
+		result = builder.best_opened_permutation(block_size=7, workers=workers)
+
+		assert result == builder.best_opened_permutation()
+
+	@d_parametrize(
+		{
+			"sequential": {"options": {}},
+			"prefix": {"options": {"prefix": (2,)}},
+			"parallel": {"options": {"workers": 2}},
+		}
+	)
+	def test_opened_permutations_without_arguments(self, options):
+		builder = ReversedBuilder()
+		builder.open([3, 1, 2], [1, 2, 3])
+		products = ProductsBuilder()
+		products.open([3, 1, 2], [1, 2, 3])
+
+		result = builder.best_opened_permutation(**options)
+
+		assert result == products.best_opened_permutation(**options)
+
+	def test_prefix_of_indices(self):
+		builder = IndicesBuilder()
+		builder.open([3, 1, 2], [1, 2, 3])
+
+		_, order = builder.best_opened_permutation(prefix=(2,))
+
+		assert builder._chars_of(order) == (2, 1, 3)
+
+	def test_parallel_first_best_kept(self):
+		builder = ProductsBuilder()
+		builder.open([0, 1, 2], [3, 4, 5])
+
+		_, chars_order = builder.best_opened_permutation(workers=2)
+
+		assert chars_order == (3, 4, 5)
+
+
+def all_scored(builder: LayoutBuilder, prefix: tuple[int, ...] = ()):
+	scored = [(builder.score(p), p) for p in builder.opened_permutations(prefix=prefix)]
+	return sorted(scored, key=lambda record: -record[0])
+
+
+class Test_top_opened_permutations:
+	@d_parametrize(
+		{
+			"single": {"k": 1, "block_size": 4096},
+			"within_block": {"k": 10, "block_size": 4096},
+			"across_blocks": [
+				{"k": 10, "block_size": 7},
+				{"k": 25, "block_size": 3},
+			],
+			"more_than_all": {"k": 200, "block_size": 7},
+		}
+	)
+	def test_best_scores_first_ties_in_order(self, k, block_size):
+		builder = ProductsBuilder()
+		builder.open([0, 1, 2, 3, 4], [1, 2, 3, 4, 5])
+
+		top = builder.top_opened_permutations(k, block_size=block_size)
+
+		assert top == all_scored(builder)[:k]
+
+	def test_with_prefix(self):
+		builder = ProductsBuilder()
+		builder.open([0, 1, 2, 3, 4], [1, 2, 3, 4, 5])
+
+		top = builder.top_opened_permutations(5, prefix=(2, 5))
+
+		assert top == all_scored(builder, (2, 5))[:5]
+
+	@d_parametrize(
+		{
+			"two_workers": {"workers": 2},
+			"three_workers": {"workers": 3},
+		}
+	)
+	def test_parallel_same_as_sequential(self, workers):
+		builder = ProductsBuilder()
+		builder.open([0, 1, 2, 3, 4], [1, 2, 3, 4, 5])
+
+		top = builder.top_opened_permutations(12, block_size=7, workers=workers)
+
+		assert top == builder.top_opened_permutations(12)
+
+	def test_invalid_k(self):
+		builder = ProductsBuilder()
+		builder.open([0, 1], [1, 2])
+
+		with raises(ValueError):
+			builder.top_opened_permutations(0)
+
+
+class Test_cache:
+	def test_disabled_by_default(self):
+		assert ProductsBuilder().cache is None
+
+	def test_same_configuration(self):
+		builder = ProductsBuilder(cache_size=4)
+		builder.open([3, 1, 2], [1, 2, 3])
+		result = builder.best_opened_permutation()
+
+		builder.close()
+		builder.open([3, 1, 2], [1, 2, 3])
+
+		assert builder.best_opened_permutation(block_size=2) == result
+		assert (builder.cache.hits, builder.cache.misses) == (1, 1)
+
+	@d_parametrize(
+		{
+			"fixed": {"fixed": {0: 5}, "opened_keys": [3, 1, 2]},
+			"opened_keys": {"fixed": {}, "opened_keys": [3, 1, 4]},
+		}
+	)
+	def test_other_configuration(self, fixed, opened_keys):
+		builder = ProductsBuilder(cache_size=4)
+		builder.open([3, 1, 2], [1, 2, 3])
+		builder.best_opened_permutation()
+
+		builder.close()
+		builder.fix(fixed.keys(), fixed.values())
+		builder.open(opened_keys, [1, 2, 3])
+		builder.best_opened_permutation()
+
+		assert (builder.cache.hits, builder.cache.misses) == (0, 2)
+
+	def test_top_copy(self):
+		builder = ProductsBuilder(cache_size=4)
+		builder.open([3, 1, 2], [1, 2, 3])
+		top = builder.top_opened_permutations(3)
+
+		top.clear()
+
+		assert len(builder.top_opened_permutations(3)) == 3
+		assert builder.cache.hits == 1
+
+	def test_optimal_fill(self):
+		builder = ProductsBuilder(cache_size=4)
+		builder.optimal_fill([0, 1, 2], [1, 2, 3])
+		layout = builder.layout()
+
+		builder.clear()
+		builder.optimal_fill([0, 1, 2], [1, 2, 3])
+
+		assert builder.layout() == layout
+		assert builder.cache.hits == 1
+
+
+def test_opened_permutation_blocks():
+	builder = LayoutBuilder()
+	builder.open([0, 1, 2, 3], [3, 6, 8, 4])
+
+	blocks = list(builder.opened_permutation_blocks(block_size=5))
+
+	assert [len(block) for block in blocks] == [5] * 4 + [4]
+	assert sum(blocks, []) == list(builder.opened_permutations())
+
+
+def test_score_many():
+	builder = ProductsBuilder()
+	builder.open([1, 2], [3, 4])
+
+	scores = builder.score_many([(3, 4), (4, 3)])
+
+	assert np.array_equal(scores, [3 + 8, 4 + 6])
+
+
+def test_clear():
+	builder = LayoutBuilder()
+	builder.fix([1, 2], [3, 4])
+	builder.open([3], [5])
+	builder._config_changed = False
+
+	builder.clear()
+
+	assert builder._fixed == {}
+	assert builder._opened_keys == []
+	assert builder._opened_chars == []
+	assert builder._config_changed
+
+
+def test_close():
+	builder = LayoutBuilder()
+	builder.fix([1, 2], [3, 4])
+	builder.open([3], [5])
+	builder._config_changed = False
+
+	builder.close()
+
+	assert builder._fixed == {1: 3, 2: 4}
+	assert builder._opened_keys == []
+	assert builder._opened_chars == []
+	assert builder._config_changed
+
+
+class Test_fork:
+	def test_independent(self):
+		builder = LayoutBuilder()
+		builder.fix([1, 2], [3, 4])
+		builder.open([3], [5])
+
+		forked = builder.fork()
+		forked.fix([3], [5])
+		forked.open([4, 5], [6, 7])
+
+		assert builder._fixed == {1: 3, 2: 4}
+		assert builder._opened_keys == [3]
+		assert builder._opened_chars == [5]
+		assert forked._fixed == {1: 3, 2: 4, 3: 5}
+		assert forked._opened_keys == [4, 5]
+		assert forked._opened_chars == [6, 7]
+
+	def test_cache_shared(self):
+		builder = LayoutBuilder(cache_size=4)
+
+		assert builder.fork().cache is builder.cache
+
+	def test_no_instance_dict(self):
+		with raises(AttributeError):
+			LayoutBuilder().__dict__
+
+
+def test_open_after_fix_and_close():
+	builder = LayoutBuilder()
+	builder.open([1, 2], [3, 4])
+	builder.fix([2], [4])
+	builder.open([1, 2, 3], [3, 4, 5])
+	builder.close()
+	builder.open([1, 1], [3, 3])
+
+	assert builder._opened_keys == [1]
+	assert builder._opened_chars == [3]
+
+
+def test_layout():
+	builder = LayoutBuilder()
+	builder.fix([1, 2], [3, 4])
+
+	layout = builder.layout()
+	layout[1] = 0
+
+	assert builder._fixed == {1: 3, 2: 4}
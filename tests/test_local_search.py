@@ -0,0 +1,103 @@
+from pytest_dparam import d_parametrize
+from pytest import raises
+import numpy as np
+from scoring_stacks import stack_costs_freqs
+from swap_scorer import SwapScorer
+from local_search import LocalSearch
+
+
+def stacks_and_chars(n: int = 9, seed: int = 0):
+	rng = np.random.default_rng(seed)
+	stacks = stack_costs_freqs(
+		[(rng.random(n), rng.random(n + 2))],
+		[
+			(rng.random((n, n)), rng.random((n + 2, n + 2))),
+			(rng.random((n, n)) - 0.5, rng.random((n + 2, n + 2))),
+		],
+		n,
+		n + 2,
+	)
+	return stacks, rng.permutation(n + 2)[:n]
+
+
+def all_swap_deltas(scorer: SwapScorer) -> np.ndarray:
+	n = scorer.chars.size
+	return np.array([[scorer.delta(a, b) for b in range(n)] for a in range(n)])
+
+
+class Test_deltas:
+	def test_match_swap_scorer(self):
+		stacks, chars = stacks_and_chars()
+
+		deltas = LocalSearch(stacks, chars).deltas()
+
+		assert np.allclose(deltas, all_swap_deltas(SwapScorer(stacks, chars)))
+
+	def test_match_swap_scorer_after_swaps(self):
+		stacks, chars = stacks_and_chars()
+		search = LocalSearch(stacks, chars)
+		scorer = SwapScorer(stacks, chars)
+		rng = np.random.default_rng(1)
+
+		for a, b in rng.integers(0, 9, (20, 2)):
+			search.swap(a, b)
+			scorer.swap(a, b)
+
+		assert np.array_equal(search.chars, scorer.chars)
+		assert np.allclose(search.deltas(), all_swap_deltas(scorer))
+
+
+class Test_swap:
+	def test_update_score(self):
+		stacks, chars = stacks_and_chars()
+		search = LocalSearch(stacks, chars)
+
+		score = search.swap(2, 7)
+
+		chars[[2, 7]] = chars[[7, 2]]
+		assert np.array_equal(search.chars, chars)
+		assert np.isclose(score, stacks.score(chars))
+
+	def test_same_position(self):
+		stacks, chars = stacks_and_chars()
+		search = LocalSearch(stacks, chars)
+
+		assert search.swap(3, 3) == search.score
+		assert search.swaps == 0
+
+
+class Test_run:
+	@d_parametrize({"best": {"strategy": "best"}, "first": {"strategy": "first"}})
+	def test_local_optimum(self, strategy):
+		stacks, chars = stacks_and_chars()
+		search = LocalSearch(stacks, chars)
+		before = search.score
+
+		score = search.run(strategy)
+
+		assert score > before
+		assert score == stacks.score(search.chars)
+		assert np.max(all_swap_deltas(SwapScorer(stacks, search.chars))) <= 1e-9
+
+	def test_only_given_positions(self):
+		stacks, chars = stacks_and_chars()
+		search = LocalSearch(stacks, chars)
+
+		search.run(positions=[0, 3, 4, 8])
+
+		assert np.array_equal(search.chars[[1, 2, 5, 6, 7]], chars[[1, 2, 5, 6, 7]])
+		assert sorted(search.chars[[0, 3, 4, 8]]) == sorted(chars[[0, 3, 4, 8]])
+
+	def test_max_swaps(self):
+		stacks, chars = stacks_and_chars()
+		search = LocalSearch(stacks, chars)
+
+		search.run(max_swaps=1)
+
+		assert search.swaps == 1
+
+	def test_unknown_strategy(self):
+		stacks, chars = stacks_and_chars()
+
+		with raises(ValueError):
+			LocalSearch(stacks, chars).run("worst")
@@ -1,7 +1,12 @@
 from pytest_dparam import d_parametrize
 from pytest import raises
 import numpy as np
+import json
 from matrix_based_builder import MatrixBasedLayoutBuilder
+from sparse_pairs import coo_pairs, sparse_pairs
+from sweep_progress import SweepProgress
+from itertools import permutations
+from math import factorial
 
 
 class Test_add_key_costs:
@@ -550,3 +555,1051 @@ class Test_score:
 		score = builder.score([3, 2])
 
 		assert score == self.score_1d_a_0153_4132 + self.score_2d_a_0153_4132
+
+
+class Test_anticipative_score:
+	@staticmethod
+	def build(anticipative: bool, seed: int = 0) -> MatrixBasedLayoutBuilder:
+		rng = np.random.default_rng(seed)
+		builder = MatrixBasedLayoutBuilder(anticipative=anticipative)
+		builder.add_key_costs(rng.random(6), rng.random(7))
+		builder.add_interkey_costs(rng.random((6, 6)), rng.random((7, 7)))
+		builder.add_interkey_costs(rng.random((6, 6)), rng.random((7, 7)))
+		return builder
+
+	@staticmethod
+	def expected_score(
+		builder: MatrixBasedLayoutBuilder, order: tuple[int, ...]
+	) -> float:
+		"""Mean score of all full layouts completing the partial layout."""
+		keys = list(builder._fixed.keys()) + builder._opened_keys
+		chars = list(builder._fixed.values()) + list(order)
+		keys_left = [k for k in range(6) if k not in keys]
+		chars_left = [c for c in range(7) if c not in chars]
+		scores = []
+		for completion in permutations(chars_left, len(keys_left)):
+			full = MatrixBasedLayoutBuilder()
+			full._costs_freqs_1d = builder._costs_freqs_1d
+			full._costs_freqs_2d = builder._costs_freqs_2d
+			full.fix(keys + keys_left, chars + list(completion))
+			scores.append(full.score())
+		return float(np.mean(scores))
+
+	def test_differences_match_expected_scores(self):
+		builder = self.build(anticipative=True)
+		builder.fix([4], [2])
+		builder.open([0, 5], [1, 6])
+
+		difference = builder.score((1, 6)) - builder.score((6, 1))
+
+		expected = self.expected_score(builder, (1, 6)) - self.expected_score(
+			builder, (6, 1)
+		)
+		assert np.isclose(difference, expected)
+
+	def test_differ_from_restricted_score(self):
+		anticipative = self.build(anticipative=True)
+		restricted = self.build(anticipative=False)
+		for builder in [anticipative, restricted]:
+			builder.fix([4], [2])
+			builder.open([0, 5], [1, 6])
+
+		difference = anticipative.score((1, 6)) - anticipative.score((6, 1))
+
+		assert not np.isclose(
+			difference, restricted.score((1, 6)) - restricted.score((6, 1))
+		)
+
+	def test_same_as_restricted_for_full_layouts(self):
+		anticipative = self.build(anticipative=True)
+		restricted = self.build(anticipative=False)
+		for builder in [anticipative, restricted]:
+			builder.fix([0, 1, 2, 3, 4, 5], [6, 0, 2, 4, 1, 3])
+
+		assert anticipative.score() == restricted.score()
+
+	def test_changed_after_scoring(self):
+		builder = self.build(anticipative=False)
+		builder.fix([4], [2])
+		builder.open([0, 5], [1, 6])
+		builder.score((1, 6))
+		builder.score_many([(1, 6)])
+
+		builder.anticipative = True
+
+		expected = self.build(anticipative=True)
+		expected.fix([4], [2])
+		expected.open([0, 5], [1, 6])
+		assert builder.score((1, 6)) == expected.score((1, 6))
+		assert builder.score_many([(6, 1)]) == expected.score_many([(6, 1)])
+
+	def test_used_by_score_many(self):
+		builder = self.build(anticipative=True)
+		builder.fix([4], [2])
+		builder.open([0, 5, 3], [1, 6, 0])
+		orders = list(builder.opened_permutations())
+
+		scores = builder.score_many(orders)
+
+		assert np.allclose(scores, [builder.score(order) for order in orders])
+
+
+class Test_score_many:
+	costs_1d = Test_score.costs_1d_a
+	freqs_1d = Test_score.freqs_1d_a
+	costs_2d = Test_score.costs_2d_a
+	freqs_2d = Test_score.freqs_2d_a
+
+	def build(self) -> MatrixBasedLayoutBuilder:
+		builder = MatrixBasedLayoutBuilder()
+		builder.add_key_costs(self.costs_1d, self.freqs_1d)
+		builder.add_interkey_costs(self.costs_2d, self.freqs_2d)
+		builder.fix([0, 1], [4, 1])
+		builder.open([5, 3, 2], [2, 3, 5])
+		return builder
+
+	def test_match_score(self):
+		builder = self.build()
+		orders = list(builder.opened_permutations())
+
+		scores = builder.score_many(orders)
+
+		assert scores.shape == (len(orders),)
+		for order, score in zip(orders, scores):
+			assert score == builder.score(order)
+
+	@d_parametrize(
+		{
+			"single_rows": {"block_size": 1},
+			"partial_last_block": {"block_size": 4},
+			"exact_blocks": {"block_size": 6},
+			"single_block": {"block_size": 100},
+		}
+	)
+	def test_blocks_do_not_change_scores(self, block_size):
+		builder = self.build()
+		orders = np.array(list(builder.opened_permutations()))
+
+		scores = builder.score_many(orders, block_size=block_size)
+
+		assert np.array_equal(scores, builder.score_many(orders))
+
+	def test_only_fixed(self):
+		builder = MatrixBasedLayoutBuilder()
+		builder.add_key_costs(self.costs_1d, self.freqs_1d)
+		builder.add_interkey_costs(self.costs_2d, self.freqs_2d)
+		builder.fix([0, 1, 5, 3], [4, 1, 3, 2])
+
+		scores = builder.score_many(np.empty((2, 0), dtype=int))
+
+		assert np.array_equal(scores, [builder.score()] * 2)
+
+	@d_parametrize(
+		{
+			"not_2d": {"orders": [2, 3, 5]},
+			"not_all_opened": {"orders": [[2, 3]]},
+		}
+	)
+	def test_invalid_shape_raise_valueerror(self, orders):
+		builder = self.build()
+
+		with raises(ValueError):
+			builder.score_many(orders)
+
+	@d_parametrize(
+		{
+			"not_opened": {"order": [2, 3, 0]},
+			"repeated": {"order": [2, 2, 3]},
+			"negative": {"order": [2, 3, -1]},
+			"unknown": {"order": [2, 3, 6]},
+		}
+	)
+	def test_not_permutation_raise_valueerror(self, order):
+		builder = self.build()
+
+		with raises(ValueError):
+			builder.score_many([[2, 3, 5], order])
+
+	def test_updated_with_data(self):
+		builder = self.build()
+		builder.score_many([[2, 3, 5]])
+
+		builder.add_interkey_costs(np.ones((6, 6)), np.arange(36).reshape(6, 6))
+
+		assert builder.score_many([[2, 3, 5]])[0] == builder.score((2, 3, 5))
+
+	def test_updated_with_successive_fixes(self):
+		builder = random_builder()
+		builder.open([5, 6, 7], [0, 1, 2])
+		for keys, chars in [([0], [7]), ([1, 2], [6, 5]), ([0], [3]), ([2], [4])]:
+			builder.fix(keys, chars)
+			builder.score_many([[0, 1, 2]])
+
+		assert np.isclose(builder.score_many([[2, 0, 1]])[0], builder.score((2, 0, 1)))
+
+	def test_updated_with_config(self):
+		builder = self.build()
+		builder.score_many([[2, 3, 5]])
+
+		builder.fix([4], [0])
+
+		assert builder.score_many([[2, 3, 5]])[0] == builder.score((2, 3, 5))
+
+
+class Test_opened_permutation_blocks:
+	def test_all_permutations_as_arrays(self):
+		builder = MatrixBasedLayoutBuilder()
+		builder.open([0, 1, 2, 3], [3, 6, 8, 4])
+
+		blocks = list(builder.opened_permutation_blocks(block_size=7))
+
+		assert all(block.shape[1] == 4 for block in blocks)
+		assert np.array_equal(
+			np.concatenate(blocks), np.array(list(builder.opened_permutations()))
+		)
+
+	def test_nothing_opened(self):
+		builder = MatrixBasedLayoutBuilder()
+
+		blocks = list(builder.opened_permutation_blocks())
+
+		assert len(blocks) == 1
+		assert blocks[0].shape == (1, 0)
+
+	def test_prefix(self):
+		builder = MatrixBasedLayoutBuilder()
+		builder.open([0, 1, 2, 3, 4], [3, 6, 8, 4, 1])
+
+		blocks = list(builder.opened_permutation_blocks(block_size=5, prefix=(8, 3)))
+
+		assert np.array_equal(
+			np.concatenate(blocks),
+			np.array(list(builder.opened_permutations(prefix=(8, 3)))),
+		)
+
+	def test_cached_tables(self, tmp_path):
+		builder = MatrixBasedLayoutBuilder(permutation_tables=str(tmp_path))
+		builder.open([0, 1, 2, 3], [3, 6, 8, 4])
+
+		blocks = list(builder.opened_permutation_blocks(block_size=7))
+
+		assert (tmp_path / "permutations_4.npy").exists()
+		assert np.array_equal(
+			np.concatenate(blocks), np.array(list(builder.opened_permutations()))
+		)
+
+
+def random_builder(n: int = 8, seed: int = 0, **options) -> MatrixBasedLayoutBuilder:
+	rng = np.random.default_rng(seed)
+	builder = MatrixBasedLayoutBuilder(**options)
+	builder.add_key_costs(rng.random(n), rng.random(n))
+	builder.add_interkey_costs(rng.random((n, n)), rng.random((n, n)))
+	builder.add_interkey_costs(rng.random((n, n)), rng.random((n, n)))
+	return builder
+
+
+class Interrupted(Exception):
+	pass
+
+
+def interrupt_after(n_blocks: int):
+	def on_block(progress: SweepProgress):
+		if progress.blocks == n_blocks:
+			raise Interrupted()
+
+	return on_block
+
+
+class Test_scored_opened_permutations:
+	def test_heap_order(self):
+		builder = random_builder()
+		builder.fix([0, 1], [7, 2])
+		builder.open([5, 2, 4, 6], [0, 1, 3, 4])
+
+		scored = list(builder.scored_opened_permutations())
+
+		assert [p for _, p in scored] == list(builder.opened_permutations("heap"))
+
+	def test_match_score(self):
+		builder = random_builder()
+		builder.fix([0, 1], [7, 2])
+		builder.open([5, 2, 4, 6], [0, 1, 3, 4])
+
+		for score, permutation in builder.scored_opened_permutations():
+			assert np.isclose(score, builder.score(permutation))
+
+
+class Test_best_opened_permutation:
+	def test_heap_same_as_blocks(self):
+		builder = random_builder()
+		builder.fix([0, 1], [7, 2])
+		builder.open([5, 2, 4, 6, 3], [0, 1, 3, 4, 6])
+
+		score, permutation = builder.best_opened_permutation(method="heap")
+
+		best_score, best_permutation = builder.best_opened_permutation(method="blocks")
+		assert permutation == best_permutation
+		assert np.isclose(score, best_score)
+
+	def test_branch_and_bound_same_as_blocks(self):
+		builder = random_builder()
+		builder.fix([0, 1], [7, 2])
+		builder.open([5, 2, 4, 6, 3], [0, 1, 3, 4, 6])
+
+		score, permutation = builder.best_opened_permutation(method="branch_and_bound")
+
+		best_score, best_permutation = builder.best_opened_permutation(method="blocks")
+		assert permutation == best_permutation
+		assert np.isclose(score, best_score)
+
+	def test_parallel_same_as_sequential(self):
+		builder = random_builder()
+		builder.fix([0, 1], [7, 2])
+		builder.open([5, 2, 4, 6, 3], [0, 1, 3, 4, 6])
+
+		result = builder.best_opened_permutation(block_size=16, workers=2)
+
+		assert result == builder.best_opened_permutation()
+
+	@d_parametrize(
+		{
+			"float64": {"options": {}},
+			"rescored": {"options": {"precision": "float32", "rescore": 4}},
+		}
+	)
+	def test_resume_interrupted(self, options):
+		builder = random_builder(**options)
+		builder.fix([0, 1], [7, 2])
+		builder.open([5, 2, 4, 6, 3], [0, 1, 3, 4, 6])
+		progress = SweepProgress(on_block=interrupt_after(3))
+
+		with raises(Interrupted):
+			builder.best_opened_permutation(block_size=16, progress=progress)
+		resumed = SweepProgress(**progress.state())
+		result = builder.best_opened_permutation(block_size=16, progress=resumed)
+
+		assert progress.blocks == 3
+		assert resumed.blocks == 8
+		assert result == builder.best_opened_permutation(block_size=16)
+
+	def test_unknown_method_raise_valueerror(self):
+		builder = random_builder()
+		builder.open([0, 1], [0, 1])
+
+		with raises(ValueError):
+			builder.best_opened_permutation(method="unknown")
+
+
+class Test_top_opened_permutations:
+	def test_match_sorted_scores(self):
+		builder = random_builder()
+		builder.fix([0, 1], [7, 2])
+		builder.open([5, 2, 4, 6, 3], [0, 1, 3, 4, 6])
+		orders = list(builder.opened_permutations())
+		scores = builder.score_many(orders)
+
+		top = builder.top_opened_permutations(8, block_size=16)
+
+		expected = np.argsort(-scores, kind="stable")[:8]
+		assert [order for _, order in top] == [orders[i] for i in expected]
+		assert np.allclose([score for score, _ in top], scores[expected])
+
+	def test_resume_interrupted(self):
+		builder = random_builder()
+		builder.fix([0, 1], [7, 2])
+		builder.open([5, 2, 4, 6, 3], [0, 1, 3, 4, 6])
+		progress = SweepProgress(on_block=interrupt_after(2))
+
+		with raises(Interrupted):
+			builder.top_opened_permutations(8, block_size=16, progress=progress)
+		resumed = SweepProgress(**progress.state())
+		top = builder.top_opened_permutations(8, block_size=16, progress=resumed)
+
+		assert resumed.rank == 120
+		assert top == builder.top_opened_permutations(8, block_size=16)
+
+	def test_first_is_best(self):
+		builder = random_builder()
+		builder.open([5, 2, 4, 6, 3], [0, 1, 3, 4, 6])
+
+		top = builder.top_opened_permutations(3)
+
+		assert top[0] == builder.best_opened_permutation()
+
+
+def mirrored_builder(n: int = 8, seed: int = 0, **options) -> MatrixBasedLayoutBuilder:
+	rng = np.random.default_rng(seed)
+	builder = MatrixBasedLayoutBuilder(**options)
+	costs_1d = rng.random(n)
+	costs_2d = rng.random((n, n))
+	builder.add_key_costs(costs_1d + costs_1d[::-1], rng.random(n))
+	builder.add_interkey_costs(costs_2d + costs_2d[::-1, ::-1], rng.random((n, n)))
+	return builder
+
+
+class Test_key_symmetries:
+	@d_parametrize(
+		{
+			"detect": {"key_symmetries": "detect"},
+			"declared": {"key_symmetries": [{k: 7 - k for k in range(8)}]},
+		}
+	)
+	def test_half_permutations(self, key_symmetries):
+		builder = mirrored_builder(key_symmetries=key_symmetries)
+		builder.open([1, 2, 5, 6], [0, 1, 2, 3])
+
+		blocks = list(builder.opened_permutation_blocks(block_size=5))
+
+		assert sum(block.shape[0] for block in blocks) == 12
+
+	def test_changed_after_sweep(self):
+		builder = mirrored_builder(key_symmetries="detect")
+		builder.open([1, 2, 5, 6], [0, 1, 2, 3])
+		list(builder.opened_permutation_blocks(block_size=5))
+
+		builder.key_symmetries = []
+		blocks = list(builder.opened_permutation_blocks(block_size=5))
+
+		assert sum(block.shape[0] for block in blocks) == 24
+
+	@d_parametrize(
+		{
+			"detect": {"key_symmetries": "detect"},
+			"declared": {"key_symmetries": [{k: 7 - k for k in range(8)}]},
+		}
+	)
+	def test_same_best(self, key_symmetries):
+		builder = mirrored_builder(key_symmetries=key_symmetries)
+		builder.fix([0, 7], [4, 5])
+		builder.open([1, 2, 3, 4, 5, 6], [0, 1, 2, 3, 6, 7])
+
+		result = builder.best_opened_permutation(block_size=64)
+
+		builder.key_symmetries = None
+		assert result == builder.best_opened_permutation(block_size=64)
+
+	def test_broken_by_fixed_keys(self):
+		builder = mirrored_builder(key_symmetries=[{k: 7 - k for k in range(8)}])
+		builder.fix([0], [4])
+		builder.open([1, 2, 5, 6], [0, 1, 2, 3])
+
+		blocks = list(builder.opened_permutation_blocks())
+
+		assert sum(block.shape[0] for block in blocks) == 24
+
+	def test_declared_not_matching_costs(self):
+		builder = random_builder(key_symmetries=[{1: 2, 2: 1}])
+		builder.open([1, 2, 5, 6], [0, 1, 2, 3])
+
+		blocks = list(builder.opened_permutation_blocks())
+
+		assert sum(block.shape[0] for block in blocks) == 24
+
+
+class Test_improve_by_swaps:
+	@d_parametrize({"best": {"strategy": "best"}, "first": {"strategy": "first"}})
+	def test_local_optimum(self, strategy):
+		builder = random_builder()
+		builder.fix(range(8), [3, 6, 0, 7, 1, 5, 2, 4])
+		before = builder.score()
+
+		score = builder.improve_by_swaps(strategy=strategy)
+
+		assert score > before
+		assert np.isclose(score, builder.score())
+		assert np.max(builder.local_search().deltas()) <= 1e-9
+
+	def test_only_given_keys(self):
+		builder = random_builder()
+		builder.fix(range(8), [3, 6, 0, 7, 1, 5, 2, 4])
+
+		builder.improve_by_swaps(keys=[1, 4, 6, 7])
+
+		layout = builder.layout()
+		assert [layout[k] for k in [0, 2, 3, 5]] == [3, 0, 7, 5]
+		assert sorted(layout[k] for k in [1, 4, 6, 7]) == [1, 2, 4, 6]
+
+	def test_close_opened(self):
+		builder = random_builder()
+		builder.fix(range(6), range(6))
+		builder.open([6, 7], [6, 7])
+
+		builder.improve_by_swaps()
+
+		assert builder._opened_keys == []
+		assert sorted(builder.layout()) == list(range(6))
+
+
+class Test_anneal:
+	def test_improve(self):
+		builder = random_builder()
+		builder.fix(range(8), [3, 6, 0, 7, 1, 5, 2, 4])
+		before = builder.score()
+
+		score = builder.anneal(max_steps=2000, seed=0)
+
+		assert score > before
+		assert np.isclose(score, builder.score())
+
+	def test_reproducible(self):
+		builder = random_builder()
+		builder.fix(range(8), [3, 6, 0, 7, 1, 5, 2, 4])
+		other = random_builder()
+		other.fix(range(8), [3, 6, 0, 7, 1, 5, 2, 4])
+
+		builder.anneal(max_steps=500, seed=3)
+		other.anneal(max_steps=500, seed=3)
+
+		assert builder.layout() == other.layout()
+
+	def test_only_given_keys(self):
+		builder = random_builder()
+		builder.fix(range(8), [3, 6, 0, 7, 1, 5, 2, 4])
+
+		builder.anneal(keys=[1, 4, 6, 7], max_steps=500, seed=0)
+
+		layout = builder.layout()
+		assert [layout[k] for k in [0, 2, 3, 5]] == [3, 0, 7, 5]
+
+
+class Test_cache:
+	def test_cleared_by_new_costs(self):
+		builder = random_builder(cache_size=4)
+		builder.open([5, 2, 4, 6], [0, 1, 3, 4])
+		builder.best_opened_permutation()
+
+		builder.add_key_costs(np.ones(8), np.arange(8))
+
+		assert len(builder.cache) == 0
+		score, order = builder.best_opened_permutation()
+		assert np.isclose(score, builder.score(order))
+
+	@d_parametrize(
+		{
+			"method": {"first": {}, "second": {"method": "heap"}},
+			"prefix": {"first": {}, "second": {"prefix": (1,)}},
+		}
+	)
+	def test_distinct_searches(self, first, second):
+		builder = random_builder(cache_size=4)
+		builder.open([5, 2, 4, 6], [0, 1, 3, 4])
+
+		builder.best_opened_permutation(**first)
+		builder.best_opened_permutation(**second)
+
+		assert builder.cache.misses == 2
+
+	def test_distinct_scoring(self):
+		builder = random_builder(cache_size=4)
+		builder.fix([0], [7])
+		builder.open([5, 2, 4, 6], [0, 1, 3, 4])
+		builder.best_opened_permutation()
+
+		builder.anticipative = True
+		builder.best_opened_permutation()
+
+		assert builder.cache.misses == 2
+
+
+class Test_precision:
+	@d_parametrize(
+		{"float32": {"precision": "float32"}, "int32": {"precision": "int32"}}
+	)
+	def test_score_many(self, precision):
+		builder = random_builder()
+		builder.fix([0, 1], [7, 2])
+		builder.open([5, 2, 4, 6], [0, 1, 3, 4])
+		orders = list(builder.opened_permutations())
+		expected = builder.score_many(orders)
+
+		builder.precision = precision
+		builder.close()
+		builder.open([5, 2, 4, 6], [0, 1, 3, 4])
+
+		assert np.allclose(builder.score_many(orders), expected, rtol=1e-5)
+
+	def test_changed_after_sweep(self):
+		builder = random_builder()
+		builder.fix([0, 1], [7, 2])
+		builder.open([5, 2, 4, 6], [0, 1, 3, 4])
+		orders = list(builder.opened_permutations())
+		builder.score_many(orders)
+		reduced = random_builder(precision="int32")
+		reduced.fix([0, 1], [7, 2])
+		reduced.open([5, 2, 4, 6], [0, 1, 3, 4])
+
+		builder.precision = "int32"
+
+		assert np.array_equal(builder.score_many(orders), reduced.score_many(orders))
+
+	def test_top_rescored(self):
+		builder = random_builder(precision="int32")
+		builder.fix([0, 1], [7, 2])
+		builder.open([5, 2, 4, 6], [0, 1, 3, 4])
+
+		records = builder.top_opened_permutations(3)
+
+		assert [score for score, _ in records] == sorted(
+			[builder.score(order) for _, order in records], reverse=True
+		)
+
+	def test_best_rescored(self):
+		builder = random_builder(precision="float32", rescore=5)
+		builder.fix([0, 1], [7, 2])
+		builder.open([5, 2, 4, 6], [0, 1, 3, 4])
+		exact = random_builder()
+		exact.fix([0, 1], [7, 2])
+		exact.open([5, 2, 4, 6], [0, 1, 3, 4])
+
+		score, order = builder.best_opened_permutation()
+
+		exact_score, exact_order = exact.best_opened_permutation()
+		assert order == exact_order
+		assert np.isclose(score, exact_score)
+
+	def test_distinct_cache_entries(self):
+		builder = random_builder(cache_size=4)
+		builder.open([5, 2, 4, 6], [0, 1, 3, 4])
+		builder.best_opened_permutation()
+
+		builder.precision = "float32"
+		builder.best_opened_permutation()
+
+		assert builder.cache.misses == 2
+
+
+class Test_sparse_scoring:
+	def test_same_score(self):
+		builder = random_builder()
+		builder.fix([0, 1, 3, 5], [7, 2, 4, 1])
+		expected = builder.score()
+
+		builder.sparse_threshold = 0.0
+
+		assert np.isclose(builder.score(), expected)
+
+	def test_threshold(self):
+		builder = MatrixBasedLayoutBuilder(sparse_threshold=0.1)
+		builder.add_interkey_costs(
+			np.ones((3, 3)), [[0, 0.05, 1], [0, 0, 0], [2, 0, 0]]
+		)
+		builder.fix([0, 1, 2], [0, 1, 2])
+
+		assert builder.score() == 3
+
+	def test_sparse_frequencies(self):
+		builder = MatrixBasedLayoutBuilder()
+		builder.add_interkey_costs(
+			[[1, 2, 3], [4, 5, 6], [7, 8, 9]],
+			coo_pairs([0, 2, 0], [1, 0, 1], [1.0, 2.0, 0.5], 3),
+		)
+		builder.fix([0, 1, 2], [0, 1, 2])
+
+		assert builder.score() == 2 * 1.5 + 7 * 2
+
+	def test_several_components(self):
+		builder = MatrixBasedLayoutBuilder()
+
+		with raises(ValueError):
+			builder.add_interkey_costs(
+				np.ones((3, 3)), sparse_pairs(np.ones((2, 3, 3)))
+			)
+
+
+def corpora_builders(n: int = 6, seed: int = 0, **options):
+	rng = np.random.default_rng(seed)
+	key_costs = rng.random(n)
+	interkey_costs = rng.random((n, n))
+	corpora = {name: (rng.random(n), rng.random((n, n))) for name in ("en", "fr")}
+	builders = {}
+	for name, (freqs_1d, freqs_2d) in corpora.items():
+		builders[name] = MatrixBasedLayoutBuilder(**options)
+		builders[name].add_key_costs(key_costs, freqs_1d)
+		builders[name].add_interkey_costs(interkey_costs, freqs_2d)
+	combined = MatrixBasedLayoutBuilder(**options)
+	for name, (freqs_1d, freqs_2d) in corpora.items():
+		combined.add_key_costs(key_costs, freqs_1d, corpus=name)
+		combined.add_interkey_costs(interkey_costs, freqs_2d, corpus=name)
+	return combined, builders
+
+
+class Test_corpora:
+	def test_not_merged(self):
+		combined, _ = corpora_builders()
+
+		assert len(combined._costs_freqs_1d) == 2
+		assert combined._corpora_2d == ["en", "fr"]
+
+	def test_corpus_scores(self):
+		combined, builders = corpora_builders()
+		for builder in [combined, *builders.values()]:
+			builder.fix([0, 1, 2], [5, 3, 1])
+			builder.open([3, 4, 5], [0, 2, 4])
+
+		total, scores = combined.corpus_scores((2, 0, 4))
+
+		assert scores.keys() == {"en", "fr"}
+		for name, builder in builders.items():
+			assert np.isclose(scores[name], builder.score((2, 0, 4)))
+		assert np.isclose(total, combined.score((2, 0, 4)))
+
+	@d_parametrize(
+		{"restricted": {"anticipative": False}, "anticipative": {"anticipative": True}}
+	)
+	def test_weights(self, anticipative):
+		combined, builders = corpora_builders(anticipative=anticipative)
+		for builder in [combined, *builders.values()]:
+			builder.fix([0, 1], [5, 3])
+
+		combined.set_corpus_weights({"en": 0.25, "fr": 2.0})
+
+		expected = 0.25 * builders["en"].score() + 2.0 * builders["fr"].score()
+		assert np.isclose(combined.score(), expected)
+
+	def test_null_weight(self):
+		combined, builders = corpora_builders()
+		combined.open(range(6), range(6))
+		builders["fr"].open(range(6), range(6))
+
+		combined.set_corpus_weights({"en": 0.0})
+
+		score, order = combined.best_opened_permutation()
+		expected_score, expected_order = builders["fr"].best_opened_permutation()
+		assert order == expected_order
+		assert np.isclose(score, expected_score)
+		total, scores = combined.corpus_scores(order)
+		assert np.isclose(total, scores["fr"])
+		assert scores["en"] > 0
+
+	def test_reweighting_clears_cache(self):
+		combined, _ = corpora_builders(cache_size=4)
+		combined.open([0, 1, 2], [0, 1, 2])
+		combined.best_opened_permutation()
+
+		combined.set_corpus_weights({"fr": 3.0})
+
+		assert len(combined.cache) == 0
+
+
+def trikey_builder(n: int = 6, seed: int = 0, **options) -> MatrixBasedLayoutBuilder:
+	builder = random_builder(n, seed, **options)
+	rng = np.random.default_rng(seed + 1)
+	builder.add_trikey_costs(rng.random((n, n, n)), rng.random((n, n, n)))
+	return builder
+
+
+def trikey_full_score(builder: MatrixBasedLayoutBuilder, layout: dict[int, int]):
+	keys = list(layout.keys())
+	chars = list(layout.values())
+	score = 0.0
+	for costs, freqs in builder._costs_freqs_1d:
+		score += np.sum(costs[keys] * freqs[chars])
+	for costs, freqs in builder._costs_freqs_2d:
+		score += np.sum(costs[np.ix_(keys, keys)] * freqs[np.ix_(chars, chars)])
+	for costs, freqs in builder._costs_freqs_3d:
+		score += np.sum(
+			costs[np.ix_(keys, keys, keys)] * freqs[np.ix_(chars, chars, chars)]
+		)
+	return score
+
+
+class Test_add_trikey_costs:
+	def test_score(self):
+		builder = trikey_builder()
+		builder.fix([0, 2, 3], [5, 1, 4])
+		builder.open([1, 5], [0, 3])
+
+		score = builder.score((3, 0))
+
+		expected = trikey_full_score(builder, {0: 5, 2: 1, 3: 4, 1: 3, 5: 0})
+		assert np.isclose(score, expected)
+
+	def test_score_many(self):
+		builder = trikey_builder()
+		builder.fix([0, 2], [5, 1])
+		builder.open([1, 3, 4, 5], [0, 2, 3, 4])
+		orders = list(builder.opened_permutations())
+
+		scores = builder.score_many(orders, block_size=7)
+
+		assert np.allclose(scores, [builder.score(order) for order in orders])
+
+	def test_best_opened_permutation(self):
+		builder = trikey_builder()
+		builder.fix([0, 2], [5, 1])
+		builder.open([1, 3, 4, 5], [0, 2, 3, 4])
+
+		score, order = builder.best_opened_permutation()
+
+		expected = max(
+			trikey_full_score(builder, {0: 5, 2: 1, **dict(zip([1, 3, 4, 5], chars))})
+			for chars in permutations([0, 2, 3, 4])
+		)
+		assert np.isclose(score, expected)
+
+	def test_updated_on_fix(self):
+		builder = trikey_builder()
+		builder.fix([0, 2], [5, 1])
+		builder.score()
+
+		builder.fix([1], [0])
+
+		assert np.isclose(
+			builder.score(), trikey_full_score(builder, {0: 5, 2: 1, 1: 0})
+		)
+
+	def test_corpus_weights(self):
+		builder = trikey_builder()
+		rng = np.random.default_rng(2)
+		builder.add_trikey_costs(
+			rng.random((6, 6, 6)), rng.random((6, 6, 6)), corpus="fr"
+		)
+		builder.fix([0, 2, 1], [5, 1, 0])
+		total, scores = builder.corpus_scores()
+
+		builder.set_corpus_weights({"fr": 0.5})
+
+		expected = scores[None] + 0.5 * scores["fr"]
+		assert np.isclose(builder.score(), expected)
+		assert np.isclose(builder.corpus_scores()[0], expected)
+		assert np.isclose(total, scores[None] + scores["fr"])
+
+	def test_mismatched_sizes(self):
+		builder = random_builder(6)
+
+		with raises(ValueError):
+			builder.add_trikey_costs(np.ones((5, 5, 5)), np.ones((6, 6, 6)))
+
+	@d_parametrize(
+		{
+			"heap": {
+				"search": lambda builder: builder.best_opened_permutation(method="heap")
+			},
+			"branch and bound": {
+				"search": lambda builder: builder.best_opened_permutation(
+					method="branch_and_bound"
+				)
+			},
+			"swaps": {"search": lambda builder: builder.improve_by_swaps()},
+		}
+	)
+	def test_swap_searches_unsupported(self, search):
+		builder = trikey_builder()
+		builder.fix([0, 2], [5, 1])
+		builder.open([1, 3], [0, 2])
+
+		with raises(ValueError):
+			search(builder)
+
+	def test_asymmetric_trikey_costs(self):
+		builder = mirrored_builder(key_symmetries="detect")
+		builder.add_trikey_costs(
+			np.random.default_rng(0).random((8, 8, 8)), np.ones((8, 8, 8))
+		)
+		builder.open(range(8), range(8))
+
+		n_blocks = sum(block.shape[0] for block in builder.opened_permutation_blocks())
+
+		assert n_blocks == factorial(8)
+
+	def test_symmetric_trikey_costs(self):
+		builder = mirrored_builder(key_symmetries="detect")
+		costs = np.random.default_rng(0).random((8, 8, 8))
+		builder.add_trikey_costs(costs + costs[::-1, ::-1, ::-1], np.ones((8, 8, 8)))
+		builder.open(range(8), range(8))
+
+		n_blocks = sum(block.shape[0] for block in builder.opened_permutation_blocks())
+
+		assert n_blocks == factorial(8) // 2
+
+
+class Test_fork:
+	def test_data_shared(self):
+		builder = random_builder()
+
+		forked = builder.fork()
+
+		assert forked._costs_freqs_2d[0][0] is builder._costs_freqs_2d[0][0]
+
+	def test_add_costs_independent(self):
+		builder = random_builder()
+		builder.fix(range(8), range(8))
+		score = builder.score()
+		forked = builder.fork()
+
+		forked.add_interkey_costs(np.ones((8, 8)), builder._costs_freqs_2d[0][1])
+		forked.add_key_costs(np.ones(8), np.ones(8))
+
+		assert builder.score() == score
+		assert len(builder._costs_freqs_1d) == 1
+		assert forked.score() != score
+
+	@d_parametrize(
+		{
+			"weights": {"change": lambda b: b.set_corpus_weights({None: -1.0})},
+			"costs": {"change": lambda b: b.add_key_costs(np.ones(8), np.arange(8))},
+		}
+	)
+	def test_shared_cache_distinct_data(self, change):
+		builder = random_builder(cache_size=4)
+		builder.open([0, 1, 2, 3], [0, 1, 2, 3])
+		forked = builder.fork()
+		change(forked)
+		fresh = random_builder()
+		change(fresh)
+		fresh.open([0, 1, 2, 3], [0, 1, 2, 3])
+
+		builder.best_opened_permutation()
+		result = forked.best_opened_permutation()
+
+		assert result == fresh.best_opened_permutation()
+		assert builder.best_opened_permutation() != result
+
+	def test_fix_independent(self):
+		builder = random_builder()
+		builder.fix([0, 1], [7, 2])
+		builder.open([2, 3, 4], [0, 1, 3])
+		expected = builder.best_opened_permutation()
+		forked = builder.fork()
+
+		forked.clear()
+		forked.fix([5, 6], [0, 1])
+		forked.open([2, 3], [4, 5])
+		forked.best_opened_permutation()
+
+		fresh = random_builder()
+		fresh.fix([5, 6], [0, 1])
+		fresh.open([2, 3], [4, 5])
+		assert builder.best_opened_permutation() == expected
+		assert forked.best_opened_permutation() == fresh.best_opened_permutation()
+		assert forked.score((4, 5)) == fresh.score((4, 5))
+
+
+class Test_save:
+	def test_load_same_state(self, tmp_path):
+		builder = trikey_builder(cache_size=4, precision="float32", rescore=3)
+		builder.add_key_costs(np.ones(6), np.arange(6), corpus="fr")
+		builder.set_corpus_weights({"fr": 0.5})
+		builder.fix([0, 1], [5, 2])
+		builder.open([4, 2, 3], [0, 3, 1])
+
+		builder.save(str(tmp_path))
+		loaded = MatrixBasedLayoutBuilder.load(str(tmp_path))
+
+		assert loaded.layout() == builder.layout()
+		assert loaded._opened_keys == builder._opened_keys
+		assert loaded._opened_chars == builder._opened_chars
+		assert loaded._corpora_1d == builder._corpora_1d
+		assert loaded.corpus_weights == builder.corpus_weights
+		assert (loaded.precision, loaded.rescore) == ("float32", 3)
+		assert loaded.cache.size == 4
+		for name in ("_costs_freqs_1d", "_costs_freqs_2d", "_costs_freqs_3d"):
+			for (costs, freqs), (l_costs, l_freqs) in zip(
+				getattr(builder, name), getattr(loaded, name)
+			):
+				assert np.array_equal(l_costs, costs)
+				assert np.array_equal(l_freqs, freqs)
+		assert loaded.score((3, 0, 1)) == builder.score((3, 0, 1))
+		assert loaded.best_opened_permutation() == builder.best_opened_permutation()
+
+	def test_key_symmetries(self, tmp_path):
+		builder = mirrored_builder(key_symmetries=[{0: 7, 7: 0}])
+
+		builder.save(str(tmp_path))
+		loaded = MatrixBasedLayoutBuilder.load(str(tmp_path))
+
+		assert loaded.key_symmetries == [{0: 7, 7: 0}]
+
+	def test_memory_mapped(self, tmp_path):
+		builder = random_builder()
+		builder.fix(range(8), range(8))
+		builder.save(str(tmp_path))
+
+		loaded = MatrixBasedLayoutBuilder.load(str(tmp_path), mmap=True)
+
+		assert isinstance(loaded._costs_freqs_2d[0][0], np.memmap)
+		assert loaded.score() == builder.score()
+		loaded.add_interkey_costs(np.ones((8, 8)), builder._costs_freqs_2d[0][1])
+		builder.add_interkey_costs(np.ones((8, 8)), builder._costs_freqs_2d[0][1])
+		assert loaded.score() == builder.score()
+
+	def test_saved_over(self, tmp_path):
+		random_builder().save(str(tmp_path))
+		builder = mirrored_builder()
+		builder.fix(range(8), range(8))
+
+		builder.save(str(tmp_path))
+		loaded = MatrixBasedLayoutBuilder.load(str(tmp_path))
+
+		assert len(list(tmp_path.glob("*.npy"))) == 4
+		assert loaded.score() == builder.score()
+
+	def test_interrupted(self, tmp_path, monkeypatch):
+		builder = random_builder()
+		builder.fix(range(8), range(8))
+		builder.save(str(tmp_path))
+		files = sorted(path.name for path in tmp_path.iterdir())
+		other = random_builder(seed=1)
+		other.fix(range(8), range(8))
+
+		def interrupted_dump(*args, **kwargs):
+			raise Interrupted()
+
+		with monkeypatch.context() as patch:
+			patch.setattr(json, "dump", interrupted_dump)
+			with raises(Interrupted):
+				other.save(str(tmp_path))
+		loaded = MatrixBasedLayoutBuilder.load(str(tmp_path))
+
+		assert sorted(path.name for path in tmp_path.iterdir()) == files
+		assert loaded.score() == builder.score()
+
+	def test_numpy_assignment(self, tmp_path):
+		builder = random_builder()
+		builder.fix(np.array([0, 1]), np.array([2, 3]))
+		builder.open(np.array([4, 5]), np.array([4, 5]))
+
+		builder.save(str(tmp_path))
+		loaded = MatrixBasedLayoutBuilder.load(str(tmp_path))
+
+		assert loaded.layout() == {0: 2, 1: 3}
+		assert (loaded._opened_keys, loaded._opened_chars) == ([4, 5], [4, 5])
+
+	def test_unknown_format(self, tmp_path):
+		random_builder().save(str(tmp_path))
+		manifest = (tmp_path / "manifest.json").read_text()
+		(tmp_path / "manifest.json").write_text(
+			manifest.replace('"format": 1', '"format": 0')
+		)
+
+		with raises(ValueError):
+			MatrixBasedLayoutBuilder.load(str(tmp_path))
+
+
+class Test_optimal_fill:
+	def test_same_as_brute_force(self):
+		builder = random_builder()
+		builder.fix([0, 1], [7, 2])
+		builder.open([5, 2, 4, 6], [0, 1, 3, 4])
+		best = max(builder.opened_permutations(), key=builder.score)
+
+		score = builder.optimal_fill([5, 2, 4, 6], [0, 1, 3, 4], block_size=7)
+
+		assert builder._fixed == {
+			0: 7,
+			1: 2,
+			5: best[0],
+			2: best[1],
+			4: best[2],
+			6: best[3],
+		}
+		assert np.isclose(score, builder.score())
+
+	def test_fill_first_usable_keys_and_chars(self):
+		builder = random_builder()
+		builder.fix([0, 1], [7, 2])
+
+		builder.optimal_fill(3)
+
+		assert sorted(builder._fixed.keys()) == [0, 1, 2, 3, 4]
+		assert sorted(builder._fixed.values()) == [0, 1, 2, 3, 7]
@@ -0,0 +1,93 @@
+from pytest_dparam import d_parametrize
+from pytest import raises
+from itertools import permutations
+import numpy as np
+from fixed_open_split import split_fixed_opened
+from pair_sweep import pair_sweep
+from scoring_stacks import stack_costs_freqs
+
+
+def build_split(n_2d: int = 2, seed: int = 0):
+	rng = np.random.default_rng(seed)
+	costs_freqs_2d = [
+		(rng.random((7, 7)) * 10**i, rng.random((9, 9))) for i in range(n_2d)
+	]
+	stacks = stack_costs_freqs([], costs_freqs_2d, 7, 9)
+	return split_fixed_opened(stacks, [8, 2, 5], [0, 3, 7, 1])
+
+
+def all_pairs(n: int) -> np.ndarray:
+	orders = np.array(list(permutations(range(n))))
+	return (orders[:, :, np.newaxis] * n + orders[:, np.newaxis, :]).reshape(
+		orders.shape[0], n * n
+	)
+
+
+def expected_scores(split) -> np.ndarray:
+	orders = np.array(list(permutations(range(4))))
+	return np.array(
+		[
+			np.sum(split.open_costs * split.open_freqs[:, order, :][:, :, order])
+			for order in orders
+		]
+	)
+
+
+@d_parametrize(
+	{
+		"float64": {"precision": "float64", "rtol": 1e-12},
+		"float32": {"precision": "float32", "rtol": 1e-6},
+		"int32": {"precision": "int32", "rtol": 1e-5},
+	}
+)
+def test_scores(precision, rtol):
+	split = build_split()
+
+	sweep = pair_sweep(split, precision)
+
+	scores = sweep.score(all_pairs(4))
+	assert np.allclose(scores, expected_scores(split), rtol=rtol)
+
+
+@d_parametrize(
+	{
+		"float32": {"precision": "float32", "dtype": np.float32},
+		"int32": {"precision": "int32", "dtype": np.int32},
+	}
+)
+def test_dtype(precision, dtype):
+	sweep = pair_sweep(build_split(), precision)
+
+	assert sweep.costs.dtype == dtype
+	assert sweep.freqs.dtype == dtype
+
+
+def test_fixed_point_range():
+	sweep = pair_sweep(build_split(), "int32", bits=10)
+
+	assert np.max(np.abs(sweep.costs), axis=1).tolist() == [1023, 1023]
+
+
+def test_null_component():
+	rng = np.random.default_rng(0)
+	costs_freqs_2d = [(np.zeros((4, 4)), rng.random((5, 5)))]
+	stacks = stack_costs_freqs([], costs_freqs_2d, 4, 5)
+	split = split_fixed_opened(stacks, [0], [1, 2, 3])
+
+	sweep = pair_sweep(split, "int32")
+
+	assert sweep.score(all_pairs(3)).tolist() == [0.0] * 6
+
+
+def test_no_component():
+	stacks = stack_costs_freqs([], [], 4, 5)
+	split = split_fixed_opened(stacks, [0], [1, 2, 3])
+
+	sweep = pair_sweep(split, "int32")
+
+	assert sweep.score(all_pairs(3)).tolist() == [0.0] * 6
+
+
+def test_unknown_precision():
+	with raises(ValueError):
+		pair_sweep(build_split(), "float16")
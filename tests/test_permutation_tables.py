@@ -0,0 +1,51 @@
+from pytest_dparam import d_parametrize
+from itertools import permutations
+import numpy as np
+from permutation_tables import permutation_table, prefix_range
+
+
+class Test_permutation_table:
+	@d_parametrize({"empty": {"k": 0}, "single": {"k": 1}, "any": [{"k": 4}, {"k": 6}]})
+	def test_lexicographic_permutations(self, k):
+		table = permutation_table(k)
+
+		assert table.dtype == np.uint8
+		assert table.shape == (len(list(permutations(range(k)))), k)
+		assert np.array_equal(table.reshape(-1), np.ravel(list(permutations(range(k)))))
+
+	def test_read_only(self):
+		table = permutation_table(3)
+
+		assert not table.flags.writeable
+
+	def test_stored_then_mapped(self, tmp_path):
+		table = permutation_table(5, str(tmp_path))
+
+		assert (tmp_path / "permutations_5.npy").exists()
+		assert isinstance(table, np.memmap)
+		assert np.array_equal(table, permutation_table(5))
+
+	def test_load_stored(self, tmp_path):
+		np.save(tmp_path / "permutations_3.npy", np.zeros((6, 3), dtype=np.uint8))
+
+		table = permutation_table(3, str(tmp_path))
+
+		assert np.all(table == 0)
+
+
+class Test_prefix_range:
+	@d_parametrize(
+		{
+			"no_prefix": {"prefix": ()},
+			"first": {"prefix": (2,)},
+			"longer": [{"prefix": (3, 0)}, {"prefix": (4, 1, 3)}],
+			"full": {"prefix": (1, 0, 4, 2, 3)},
+		}
+	)
+	def test_rows_with_prefix(self, prefix):
+		table = permutation_table(5)
+
+		start, stop = prefix_range(5, prefix)
+
+		rows = [i for i, p in enumerate(table) if tuple(p[: len(prefix)]) == prefix]
+		assert (start, stop) == (rows[0], rows[-1] + 1)
@@ -0,0 +1,50 @@
+from pytest_dparam import d_parametrize
+import numpy as np
+from scoring_stacks import stack_costs_freqs
+
+
+def pairs(m_1d: int, m_2d: int, seed: int = 0):
+	rng = np.random.default_rng(seed)
+	costs_freqs_1d = [(rng.random(5), rng.random(7)) for _ in range(m_1d)]
+	costs_freqs_2d = [(rng.random((5, 5)), rng.random((7, 7))) for _ in range(m_2d)]
+	return costs_freqs_1d, costs_freqs_2d
+
+
+class Test_stack_costs_freqs:
+	def test_shapes(self):
+		stacks = stack_costs_freqs(*pairs(2, 3), 5, 7)
+
+		assert stacks.costs_1d.shape == (2, 5)
+		assert stacks.freqs_1d.shape == (2, 7)
+		assert stacks.costs_2d.shape == (3, 5, 5)
+		assert stacks.freqs_2d.shape == (3, 7, 7)
+
+	def test_empty_shapes(self):
+		stacks = stack_costs_freqs([], [], 5, 7)
+
+		assert stacks.costs_1d.shape == (0, 5)
+		assert stacks.freqs_1d.shape == (0, 7)
+		assert stacks.costs_2d.shape == (0, 5, 5)
+		assert stacks.freqs_2d.shape == (0, 7, 7)
+
+
+class Test_score:
+	@d_parametrize(
+		{
+			"both": {"m_1d": 2, "m_2d": 3},
+			"only_1d": {"m_1d": 2, "m_2d": 0},
+			"only_2d": {"m_1d": 0, "m_2d": 3},
+			"none": {"m_1d": 0, "m_2d": 0},
+		}
+	)
+	def test_sum_of_pairs(self, m_1d, m_2d):
+		costs_freqs_1d, costs_freqs_2d = pairs(m_1d, m_2d)
+		chars = [6, 0, 3, 2, 5]
+
+		score = stack_costs_freqs(costs_freqs_1d, costs_freqs_2d, 5, 7).score(chars)
+
+		expected = sum(np.sum(costs * freqs[chars]) for costs, freqs in costs_freqs_1d)
+		expected += sum(
+			np.sum(costs * freqs[chars, :][:, chars]) for costs, freqs in costs_freqs_2d
+		)
+		assert np.isclose(score, expected)
@@ -0,0 +1,37 @@
+from search_cache import SearchCache
+
+
+class Test_get:
+	def test_compute_once(self):
+		cache = SearchCache()
+		calls = []
+
+		first = cache.get("a", lambda: calls.append(1) or 10)
+		second = cache.get("a", lambda: calls.append(1) or 20)
+
+		assert first == second == 10
+		assert len(calls) == 1
+		assert (cache.hits, cache.misses) == (1, 1)
+
+	def test_evict_least_recently_used(self):
+		cache = SearchCache(2)
+		cache.get("a", lambda: 1)
+		cache.get("b", lambda: 2)
+		cache.get("a", lambda: 1)
+
+		cache.get("c", lambda: 3)
+
+		assert len(cache) == 2
+		assert cache.get("a", lambda: -1) == 1
+		assert cache.get("b", lambda: -2) == -2
+
+
+def test_clear():
+	cache = SearchCache()
+	cache.get("a", lambda: 1)
+
+	cache.clear()
+
+	assert len(cache) == 0
+	assert cache.get("a", lambda: 2) == 2
+	assert cache.misses == 2
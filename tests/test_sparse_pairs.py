@@ -0,0 +1,64 @@
+from pytest_dparam import d_parametrize
+import numpy as np
+from sparse_pairs import coo_pairs, sparse_pairs
+
+
+def sparse_frequencies(shape: tuple[int, ...], seed: int = 0) -> np.ndarray:
+	rng = np.random.default_rng(seed)
+	return rng.random(shape) * (rng.random(shape) < 0.2)
+
+
+class Test_sparse_pairs:
+	def test_dense_roundtrip(self):
+		frequencies = sparse_frequencies((3, 9, 9))
+
+		pairs = sparse_pairs(frequencies)
+
+		assert pairs.values.size == np.count_nonzero(frequencies)
+		assert np.array_equal(pairs.dense(), frequencies)
+
+	def test_single_component(self):
+		frequencies = sparse_frequencies((9, 9))
+
+		pairs = sparse_pairs(frequencies)
+
+		assert pairs.shape == (1, 9, 9)
+		assert np.array_equal(pairs.dense()[0], frequencies)
+
+	def test_threshold(self):
+		frequencies = np.array([[0.0, 0.5, -0.01], [0.02, 0.0, -2.0], [0, 0, 0]])
+
+		pairs = sparse_pairs(frequencies, threshold=0.02)
+
+		assert pairs.firsts.tolist() == [0, 1]
+		assert pairs.seconds.tolist() == [1, 2]
+		assert pairs.values.tolist() == [0.5, -2.0]
+
+
+def test_coo_pairs():
+	pairs = coo_pairs([0, 2, 0], [1, 1, 1], [1.0, 2.0, 3.0], 3)
+
+	assert pairs.dense()[0].tolist() == [[0, 4, 0], [0, 0, 0], [0, 2, 0]]
+
+
+class Test_score:
+	@d_parametrize(
+		{
+			"full layout": {"chars": [4, 0, 8, 2, 6, 1, 7, 3, 5]},
+			"partial layout": {"chars": [4, 0, 8, 2, 6]},
+		}
+	)
+	def test_match_dense(self, chars):
+		rng = np.random.default_rng(1)
+		frequencies = sparse_frequencies((2, 9, 9))
+		costs = rng.random((2, len(chars), len(chars)))
+
+		score = sparse_pairs(frequencies).score(costs, chars)
+
+		expected = np.sum(costs * frequencies[:, chars, :][:, :, chars])
+		assert np.isclose(score, expected)
+
+	def test_no_pair(self):
+		pairs = sparse_pairs(np.zeros((4, 4)))
+
+		assert pairs.score(np.ones((1, 2, 2)), [3, 1]) == 0.0
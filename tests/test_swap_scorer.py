@@ -0,0 +1,94 @@
+from pytest_dparam import d_parametrize
+import numpy as np
+from swap_scorer import SwapScorer
+from scoring_stacks import stack_costs_freqs
+
+
+def build(n: int = 7, seed: int = 0) -> SwapScorer:
+	rng = np.random.default_rng(seed)
+	costs_freqs_1d = [(rng.random(n), rng.random(n + 2))]
+	costs_freqs_2d = [
+		(rng.random((n, n)), rng.random((n + 2, n + 2))),
+		(rng.random((n, n)), rng.random((n + 2, n + 2))),
+	]
+	chars = rng.permutation(n + 2)[:n]
+	stacks = stack_costs_freqs(costs_freqs_1d, costs_freqs_2d, n, n + 2)
+	return SwapScorer(stacks, chars)
+
+
+def test_initial_score():
+	stacks = stack_costs_freqs(
+		[(np.array([1, 2]), np.array([10, 20, 30]))],
+		[(np.array([[1, 2], [3, 4]]), np.array([[1, 2, 3], [4, 5, 6], [7, 8, 9]]))],
+		2,
+		3,
+	)
+
+	scorer = SwapScorer(stacks, [2, 0])
+
+	assert scorer.score == (1 * 30 + 2 * 10) + (1 * 9 + 2 * 7 + 3 * 3 + 4 * 1)
+
+
+class Test_delta:
+	@d_parametrize(
+		{
+			"first_positions": {"a": 0, "b": 1},
+			"any_positions": {"a": 2, "b": 5},
+			"reversed_positions": {"a": 5, "b": 2},
+			"last_positions": {"a": 0, "b": 6},
+		}
+	)
+	def test_match_full_score(self, a, b):
+		scorer = build()
+		before = scorer.full_score()
+
+		delta = scorer.delta(a, b)
+
+		scorer.chars[[a, b]] = scorer.chars[[b, a]]
+		assert np.isclose(delta, scorer.full_score() - before)
+
+	def test_same_position(self):
+		scorer = build()
+
+		assert scorer.delta(3, 3) == 0
+
+
+class Test_swap:
+	def test_update_chars(self):
+		scorer = build()
+		chars = scorer.chars.copy()
+
+		scorer.swap(1, 4)
+
+		chars[[1, 4]] = chars[[4, 1]]
+		assert np.array_equal(scorer.chars, chars)
+
+	def test_update_score(self):
+		scorer = build()
+		rng = np.random.default_rng(1)
+
+		for a, b in rng.integers(0, 7, (50, 2)):
+			score = scorer.swap(a, b)
+
+		assert score == scorer.score
+		assert np.isclose(scorer.score, scorer.full_score())
+
+
+class Test_set_chars:
+	def test_rescore(self):
+		scorer = build()
+		chars = scorer.chars[::-1].copy()
+
+		scorer.set_chars(chars)
+
+		assert np.array_equal(scorer.chars, chars)
+		assert scorer.score == scorer.full_score()
+
+	def test_swaps_from_new_chars(self):
+		scorer = build()
+		scorer.swap(0, 3)
+		scorer.set_chars(scorer.chars[::-1].copy())
+
+		scorer.swap(1, 5)
+
+		assert np.isclose(scorer.score, scorer.full_score())
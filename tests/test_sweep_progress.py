@@ -0,0 +1,32 @@
+import json
+from sweep_progress import SweepProgress
+
+
+class Test_advance:
+	def test_count_blocks_and_permutations(self):
+		progress = SweepProgress()
+
+		progress.advance(16)
+		progress.advance(4)
+
+		assert (progress.blocks, progress.rank) == (2, 20)
+
+	def test_on_block(self):
+		reported = []
+		progress = SweepProgress(on_block=lambda p: reported.append(p.rank))
+
+		progress.advance(16)
+		progress.advance(16)
+
+		assert reported == [16, 32]
+
+
+class Test_state:
+	def test_json_round_trip(self):
+		progress = SweepProgress(3, 48, [(0.5, -7, (2, 0, 1)), (0.75, -12, (1, 2, 0))])
+
+		restored = SweepProgress(**json.loads(json.dumps(progress.state())))
+
+		assert (restored.blocks, restored.rank) == (3, 48)
+		assert restored.records == progress.records
+		assert restored.on_block is None
@@ -0,0 +1,42 @@
+from pytest_dparam import d_parametrize
+from itertools import permutations
+import numpy as np
+from trikey_split import split_trikey
+
+
+def full_score(costs, freqs, chars):
+	layers = np.arange(costs.shape[0])
+	return np.sum(costs * freqs[np.ix_(layers, chars, chars, chars)])
+
+
+@d_parametrize(
+	{
+		"fixed and opened": {"fixed_chars": [7, 2], "opened_chars": [0, 3, 5, 1]},
+		"no fixed": {"fixed_chars": [], "opened_chars": [0, 3, 5, 1]},
+		"single opened": {"fixed_chars": [7, 2, 4], "opened_chars": [6]},
+	}
+)
+def test_split_score_match_full_score(fixed_chars, opened_chars):
+	rng = np.random.default_rng(0)
+	n_keys = len(fixed_chars) + len(opened_chars)
+	costs = rng.random((2, n_keys, n_keys, n_keys))
+	freqs = rng.random((2, 8, 8, 8))
+
+	split = split_trikey(costs, freqs, fixed_chars, opened_chars)
+
+	orders = np.array(list(permutations(range(len(opened_chars)))))
+	for order, score in zip(orders, split.score(orders)):
+		chars = fixed_chars + [opened_chars[i] for i in order]
+		assert np.isclose(score, full_score(costs, freqs, chars))
+
+
+def test_no_opened():
+	rng = np.random.default_rng(0)
+	costs = rng.random((1, 3, 3, 3))
+	freqs = rng.random((1, 5, 5, 5))
+
+	split = split_trikey(costs, freqs, [4, 0, 2], [])
+
+	scores = split.score(np.zeros((1, 0), dtype=np.intp))
+	assert np.isclose(split.constant, full_score(costs, freqs, [4, 0, 2]))
+	assert scores.tolist() == [split.constant]